@@ -1,7 +1,13 @@
-from flask import Flask, request, jsonify
+# Import-time profiling has to start before the imports it measures
+from services import import_profile
+import_profile.start_if_enabled()
+
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
+from pymongo.errors import ConnectionFailure
 from dotenv import load_dotenv
+import hmac
 import os
 from datetime import datetime, timedelta
 
@@ -13,9 +19,30 @@ from routes.activities import activities_bp
 from routes.social import social_bp
 from routes.music import music_bp
 from routes.profile import profile_bp
+from routes.admin import admin_bp
+from routes.errors import error_response
 
 # Import database
-from models.database import init_db
+from models.database import init_db, get_db, db_status, when_ready
+
+# Import Mongo command metrics
+from services.db_metrics import route_metrics
+
+# Import request metrics
+from services.request_metrics import request_metrics
+
+# Import the JSON provider for MongoDB documents
+from services.json_provider import MongoJSONProvider
+
+# Import response compression and ETags
+from services import http_cache
+
+# Import background job queues
+from services.job_queue import job_queue
+from services.journal_ai import journal_ai_queue, recover_pending_responses
+
+# Import lazily loaded SDK providers
+from services.providers import warm_up_providers, provider_status
 
 # Load environment variables
 load_dotenv()
@@ -28,6 +55,7 @@ print(f"  Current working directory: {os.getcwd()}")
 print(f"  .env file exists: {os.path.exists('.env')}")
 
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)
 
 # Production Configuration
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', 'fallback-secret-key')
@@ -52,6 +80,10 @@ CORS(app,
      allow_headers=['Content-Type', 'Authorization', 'Access-Control-Allow-Credentials'],
      resources={r"/api/*": {"origins": FRONTEND_URLS}})
 jwt = JWTManager(app)
+route_metrics.init_app(app)
+request_metrics.init_app(app)
+# Registered after the metrics hooks so they record the compressed size
+http_cache.init_app(app)
 
 # Initialize database
 init_db(app)
@@ -64,6 +96,28 @@ app.register_blueprint(activities_bp, url_prefix='/api/activities')
 app.register_blueprint(social_bp, url_prefix='/api/social')
 app.register_blueprint(music_bp, url_prefix='/api/music')
 app.register_blueprint(profile_bp, url_prefix='/api/profile')
+app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+# Startup diagnostics: slowest imports (IMPORT_PROFILE=true)
+import_profile.print_report()
+
+def start_background_workers():
+    """Start background job workers (handlers are registered by the blueprints).
+    
+    Called once per serving process - from gunicorn's post_worker_init hook or
+    below when run directly - so nothing connects to MongoDB before a fork.
+    Spotify and Gemini SDKs load in a background thread meanwhile.
+    """
+    warm_up_providers()
+    request_metrics.start_flusher()
+    # Returns without network I/O; the workers start once the first ping succeeds
+    if get_db() is not None:
+        when_ready(_start_job_workers)
+
+def _start_job_workers():
+    job_queue.start()
+    journal_ai_queue.start()
+    recover_pending_responses()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -71,13 +125,46 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.utcnow().isoformat(),
-        'message': 'Mindful Harmony API is running'
+        'message': 'Mindful Harmony API is running',
+        'database': db_status()['state']
     })
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: the process is up and serving requests, whatever the database state"""
+    return jsonify({'status': 'alive', 'pid': os.getpid()})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: the database (when configured) answered the last background ping"""
+    database = db_status()
+    ready = database['state'] in ('ready', 'not_configured')
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'database': database,
+        'services': provider_status(),
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200 if ready else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    metrics_token = os.getenv('METRICS_TOKEN')
+    # Like the admin endpoints, metrics do not exist unless a token is configured
+    if not metrics_token:
+        return jsonify({'error': 'Endpoint not found'}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization, f'Bearer {metrics_token}'):
+        return jsonify({'error': 'Invalid metrics token'}), 403
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+# Database errors a view did not catch itself
+app.register_error_handler(ConnectionFailure, error_response)
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -85,4 +172,5 @@ def internal_error(error):
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
     debug_mode = os.getenv('FLASK_ENV', 'production') == 'development'
+    start_background_workers()
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
@@ -0,0 +1,25 @@
+"""
+Run every micro-benchmark in this package.
+
+Run from the backend directory:
+    python -m benchmarks
+"""
+
+from benchmarks import bench_clean_response, bench_crisis, bench_list_json, bench_models
+
+BENCHMARKS = [
+    ('Crisis keyword matching', bench_crisis),
+    ('Response cleaning', bench_clean_response),
+    ('Slotted model memory', bench_models),
+    ('List endpoint JSON', bench_list_json),
+]
+
+
+def main():
+    for title, module in BENCHMARKS:
+        print(f"\n== {title} ==")
+        module.main()
+
+
+if __name__ == '__main__':
+    main()
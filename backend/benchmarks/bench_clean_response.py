@@ -0,0 +1,94 @@
+"""
+clean_response benchmark.
+
+Compares the original five-pass regex implementation with the single-pass
+cleaner on typical model responses, markdown-heavy text and long responses,
+and measures streaming throughput through ResponseCleaner. Every case first
+checks that both implementations produce identical output.
+
+Run from the backend directory:
+    python -m benchmarks.bench_clean_response
+"""
+
+import random
+import re
+import timeit
+
+from services.response_cleaner import clean_response, ResponseCleaner
+
+WORDS = [
+    'it', 'sounds', 'like', 'today', 'was', 'really', 'hard', 'and', 'that', 'is',
+    'okay', 'you', 'are', 'not', 'alone', 'try', 'a', 'short', 'walk', 'or',
+    'some', 'deep', 'breathing', 'your', 'feelings', 'matter'
+]
+
+
+def legacy_clean_response(response_text):
+    """The original clean_response: one re.sub pass per pattern"""
+    cleaned = re.sub(r'\*\*(.*?)\*\*', r'\1', response_text)
+    cleaned = re.sub(r'\*(.*?)\*', r'\1', cleaned)
+    cleaned = re.sub(r'`(.*?)`', r'\1', cleaned)
+    cleaned = re.sub(r'\n+', ' ', cleaned)
+    cleaned = re.sub(r'\s+', ' ', cleaned)
+    return cleaned.strip()
+
+
+def make_response(words, markdown_rate, rng):
+    """Build a response with paragraphs and the given share of marked-up words"""
+    pieces = []
+    for i in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < markdown_rate / 3:
+            word = f'**{word}**'
+        elif roll < markdown_rate * 2 / 3:
+            word = f'*{word}*'
+        elif roll < markdown_rate:
+            word = f'`{word}`'
+        pieces.append(word)
+        if i % 40 == 39:
+            pieces.append('\n\n')
+    return ' '.join(pieces)
+
+
+def stream(text, chunk_size):
+    cleaner = ResponseCleaner()
+    pieces = [cleaner.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size)]
+    pieces.append(cleaner.finish())
+    return ''.join(pieces)
+
+
+def bench(label, responses, number):
+    for response in responses:
+        assert clean_response(response) == legacy_clean_response(response)
+        assert stream(response, 24) == legacy_clean_response(response)
+
+    legacy = min(timeit.repeat(
+        lambda: [legacy_clean_response(response) for response in responses],
+        number=number, repeat=3
+    ))
+    single_pass = min(timeit.repeat(
+        lambda: [clean_response(response) for response in responses],
+        number=number, repeat=3
+    ))
+    streamed = min(timeit.repeat(
+        lambda: [stream(response, 24) for response in responses],
+        number=number, repeat=3
+    ))
+    total_bytes = sum(len(response) for response in responses) * number
+    print(f"{label:<28} legacy={total_bytes / legacy / 1e6:7.2f} MB/s  "
+          f"single-pass={total_bytes / single_pass / 1e6:7.2f} MB/s  "
+          f"speedup={legacy / single_pass:5.2f}x  "
+          f"streamed(24B chunks)={total_bytes / streamed / 1e6:6.2f} MB/s")
+
+
+def main():
+    rng = random.Random(7)
+    bench('plain, 120 words', [make_response(120, 0.0, rng) for _ in range(200)], 20)
+    bench('typical, 120 words', [make_response(120, 0.05, rng) for _ in range(200)], 20)
+    bench('markdown-heavy, 120 words', [make_response(120, 0.3, rng) for _ in range(200)], 20)
+    bench('long, 2000 words', [make_response(2000, 0.05, rng) for _ in range(20)], 10)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Crisis keyword matching benchmark.
+
+Compares the Aho-Corasick matcher used by detect_crisis against the previous
+per-keyword substring scan, on long journal entries, for the current keyword
+list and for a grown list of several hundred phrases.
+
+Run from the backend directory:
+    python -m benchmarks.bench_crisis
+"""
+
+import random
+import timeit
+
+from services.ai_service import CRISIS_KEYWORDS
+from services.crisis_matcher import KeywordMatcher
+
+FILLER_WORDS = [
+    'today', 'i', 'went', 'to', 'work', 'and', 'felt', 'tired', 'but', 'the',
+    'walk', 'home', 'was', 'nice', 'my', 'friend', 'called', 'we', 'talked',
+    'about', 'music', 'sleep', 'dinner', 'really', 'anxious', 'calm', 'again'
+]
+
+
+def legacy_detect_crisis(content, keywords):
+    """The original detect_crisis implementation: one substring scan per keyword"""
+    content_lower = content.lower()
+    for keyword in keywords:
+        if keyword in content_lower:
+            return True
+    return False
+
+
+def make_entry(words, rng):
+    return ' '.join(rng.choice(FILLER_WORDS) for _ in range(words)) + '.'
+
+
+def grown_keywords(count, rng):
+    """Synthesize extra multi-word phrases that never occur in the filler text"""
+    alphabet = 'bcdfghjklmnpqrstvwxz'
+    phrases = list(CRISIS_KEYWORDS)
+    while len(phrases) < count:
+        phrase = ' '.join(
+            ''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 9)))
+            for _ in range(rng.randint(1, 3))
+        )
+        phrases.append(phrase)
+    return phrases
+
+
+# Inflected forms the substring scan always flagged; the matcher must too
+INFLECTED_ENTRIES = [
+    'I feel hopelessness every morning',
+    'I am such a burdens to them',
+    'I overdosed last night',
+    'thinking about self harming again',
+    'my worthlessness is all I see',
+    'the cuttings from the garden',
+    'I want to die.',
+    'nothing here at all to worry about',
+    'Burdened and helplessly stuck',
+]
+
+
+def check_inflections(keywords):
+    matcher = KeywordMatcher(keywords)
+    for entry in INFLECTED_ENTRIES:
+        assert matcher.contains_any(entry) == legacy_detect_crisis(entry, keywords), entry
+    print(f"inflected forms agree with the substring scan on {len(INFLECTED_ENTRIES)} entries")
+
+
+def bench(label, keywords, entries, number):
+    matcher = KeywordMatcher(keywords)
+    for entry in entries:
+        assert matcher.contains_any(entry) == legacy_detect_crisis(entry, keywords)
+
+    legacy = min(timeit.repeat(
+        lambda: [legacy_detect_crisis(entry, keywords) for entry in entries],
+        number=number, repeat=3
+    ))
+    automaton = min(timeit.repeat(
+        lambda: [matcher.contains_any(entry) for entry in entries],
+        number=number, repeat=3
+    ))
+    total_bytes = sum(len(entry) for entry in entries) * number
+    print(f"{label:<32} keywords={len(keywords):<5} "
+          f"legacy={total_bytes / legacy / 1e6:8.2f} MB/s  "
+          f"automaton={total_bytes / automaton / 1e6:8.2f} MB/s  "
+          f"speedup={legacy / automaton:5.2f}x")
+
+
+def main():
+    rng = random.Random(42)
+    # Worst case for both: no keyword present, so every keyword is scanned
+    entries = [make_entry(2000, rng) for _ in range(20)]
+    number = 5
+
+    check_inflections(CRISIS_KEYWORDS)
+    bench('current keyword list', CRISIS_KEYWORDS, entries, number)
+    for count in (100, 300, 1000):
+        bench(f'{count} keywords', grown_keywords(count, rng), entries, number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+List endpoint decode/encode benchmark.
+
+Times the client side of a page of list results three ways:
+  dicts   - documents decoded to dicts, ``_id`` renamed, encoded by the JSON provider
+  models  - documents decoded into the slotted models (models.entries)
+  server  - documents already converted by ``find_json``'s pipeline, so
+            ObjectIds and dates arrive as strings and orjson needs no callbacks
+Each case first checks that all three produce the same JSON.
+
+Playlists stay on the dict path in routes/music.py: their nested tracks
+dominate the page, and on the client ``server`` is no faster than ``dicts``
+for them. The row is kept so a change in that balance shows up here.
+
+The server's share of the conversion needs a real MongoDB; with --uri the
+benchmark also loads a scratch collection and times ``find`` plus models
+against ``find_json`` end to end.
+
+Run from the backend directory:
+    python -m benchmarks.bench_list_json
+    python -m benchmarks.bench_list_json --uri mongodb://localhost:27017
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from flask import Flask
+
+from benchmarks.bench_models import activity_document, journal_document, mood_document
+from models.entries import ActivityEntry, JournalEntry, MoodEntry, Playlist
+from services.json_provider import MongoJSONProvider
+
+PAGE = 50
+
+
+def playlist_document(rng, user_id, when):
+    tracks = [{'id': f'track{i}', 'name': f'Song {i}', 'artist': 'Artist', 'album': 'Album',
+               'preview_url': None, 'external_url': f'https://open.spotify.com/track/{i}'} for i in range(20)]
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'mood': 'calm', 'intensity': rng.randint(1, 10),
+        'playlist': {'name': 'Calm mix', 'tracks': tracks}, 'timestamp': when, 'tracks_count': 20
+    }
+
+
+CASES = [
+    ('mood history', MoodEntry, mood_document),
+    ('activity history', ActivityEntry, activity_document),
+    ('journal entries', JournalEntry, journal_document),
+    ('playlists', Playlist, playlist_document),
+]
+
+
+def server_converted(model, document):
+    """What find_json's pipeline returns for ``document``"""
+    converted = {key: value for key, value in document.items() if key != '_id'}
+    for field in model.OBJECT_ID_FIELDS:
+        if isinstance(converted.get(field), ObjectId):
+            converted[field] = str(converted[field])
+    for field in model.DATE_FIELDS:
+        if isinstance(converted.get(field), datetime):
+            converted[field] = converted[field].isoformat()
+    converted['id'] = str(document['_id'])
+    return converted
+
+
+def legacy(raw, provider):
+    entries = bson.decode_all(raw)
+    for entry in entries:
+        entry['id'] = entry.pop('_id')
+    return provider.dumps(entries)
+
+
+def with_models(model, raw, provider):
+    return provider.dumps([model.from_document(document) for document in bson.decode_all(raw)])
+
+
+def server(raw, provider):
+    return provider.dumps(bson.decode_all(raw))
+
+
+def run_offline(provider, number):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    print(f"Client side, {PAGE} documents per page, best of 5 x {number} pages")
+    print(f"{'endpoint':<18} {'dicts':>10} {'models':>10} {'server':>10} {'vs dicts':>9} {'vs models':>10} {'bytes':>9}")
+    for name, model, make in CASES:
+        user_id = ObjectId()
+        documents = [make(rng, user_id, now - timedelta(minutes=i, milliseconds=i % 3)) for i in range(PAGE)]
+        raw = b''.join(bson.encode(document) for document in documents)
+        # Dates round-trip through BSON at millisecond precision, as they would through Mongo
+        converted = b''.join(bson.encode(server_converted(model, document)) for document in bson.decode_all(raw))
+
+        expected = provider.loads(legacy(raw, provider))
+        assert provider.loads(with_models(model, raw, provider)) == expected, name
+        assert provider.loads(server(converted, provider)) == expected, name
+
+        timings = []
+        for fn in (lambda: legacy(raw, provider), lambda: with_models(model, raw, provider),
+                   lambda: server(converted, provider)):
+            timings.append(min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6)
+        print(f"{name:<18} {timings[0]:8.0f}us {timings[1]:8.0f}us {timings[2]:8.0f}us "
+              f"{timings[0] / timings[2]:8.1f}x {timings[1] / timings[2]:9.1f}x {len(converted) - len(raw):+9d}")
+
+
+def run_live(uri, provider, number):
+    from pymongo import MongoClient
+    client = MongoClient(uri)
+    db = client.get_database('mindful_harmony_benchmark')
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    print(f"\nEnd to end against {uri}, {PAGE} documents per page, best of 5 x {number} pages")
+    print(f"{'endpoint':<18} {'find+models':>12} {'find_json':>10} {'speedup':>8}")
+    try:
+        for name, model, make in CASES:
+            collection = db[f'bench_{model.__name__.lower()}']
+            collection.drop()
+            user_id = ObjectId()
+            collection.insert_many([make(rng, user_id, now - timedelta(minutes=i)) for i in range(PAGE * 4)])
+            collection.create_index([('user_id', 1), ('timestamp', -1)])
+            query, sort = {'user_id': user_id}, [('timestamp', -1)]
+
+            def find_models():
+                return provider.dumps(model.from_cursor(collection.find(query).sort(sort).limit(PAGE)))
+
+            def find_json():
+                return provider.dumps(model.find_json(collection, query, sort=sort, limit=PAGE))
+
+            assert provider.loads(find_models()) == provider.loads(find_json()), name
+            slow = min(timeit.repeat(find_models, number=number, repeat=5)) / number * 1e3
+            fast = min(timeit.repeat(find_json, number=number, repeat=5)) / number * 1e3
+            print(f"{name:<18} {slow:10.2f}ms {fast:8.2f}ms {slow / fast:7.2f}x")
+    finally:
+        client.drop_database('mindful_harmony_benchmark')
+        client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List endpoint decode/encode benchmark')
+    parser.add_argument('--uri', help='MongoDB to run the end-to-end comparison against')
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    provider = MongoJSONProvider(Flask(__name__))
+    run_offline(provider, args.number)
+    if args.uri:
+        run_live(args.uri, provider, max(args.number // 10, 1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Slotted model memory benchmark.
+
+Loads large lists of typical mood, journal, activity and vent documents both
+as the dicts pymongo returns and as the slotted models in models.entries /
+models.user, and reports the memory held per object (tracemalloc, excluding
+the field values both share) plus decode and JSON encode times. Every case
+first checks that a model encodes to the same JSON as the dict it came from.
+
+Run from the backend directory:
+    python -m benchmarks.bench_models
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from flask import Flask
+
+from models.entries import ActivityEntry, JournalEntry, MoodEntry, VentPost
+from models.user import User
+from services.json_provider import MongoJSONProvider
+
+MOODS = ['happy', 'calm', 'anxious', 'sad', 'energetic', 'stressed']
+
+
+def mood_document(rng, user_id, when):
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'mood': rng.choice(MOODS), 'intensity': rng.randint(1, 10),
+        'notes': 'Felt okay after a walk', 'timestamp': when, 'activities': ['walk'], 'weather': 'sunny',
+        'location': ''
+    }
+
+
+def journal_document(rng, user_id, when):
+    content = ' '.join(rng.choice(MOODS) for _ in range(80))
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'title': 'Evening notes', 'content': content,
+        'mood': rng.choice(MOODS), 'tags': ['evening'], 'timestamp': when, 'word_count': 80,
+        'ai_response': None, 'is_private': True
+    }
+
+
+def activity_document(rng, user_id, when):
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'activity_name': 'Breathing exercise',
+        'duration': rng.randint(5, 30), 'mood_before': 'anxious', 'mood_after': 'calm', 'notes': '',
+        'timestamp': when, 'completed': True
+    }
+
+
+def vent_document(rng, user_id, when):
+    return {
+        '_id': ObjectId(), 'user_id': user_id, 'content': 'Long day, but I made it through.',
+        'mood': rng.choice(MOODS), 'tags': ['work'], 'timestamp': when,
+        'reactions': {str(ObjectId()): 'hug'}, 'is_active': True
+    }
+
+
+def user_document(rng, user_id, when):
+    return {
+        '_id': user_id, 'username': f'user{rng.randint(0, 10 ** 6)}', 'email': 'someone@example.com',
+        'password_hash': b'$2b$12$' + b'x' * 53, 'name': 'Someone', 'profile_pic': None,
+        'friend_code': 'ABCD1234', 'favorite_genres': [], 'biometrics': {'heart_rate': None},
+        'profile_data': {'onboarding_completed': True}, 'created_at': when, 'last_login': when, 'is_active': True
+    }
+
+
+CASES = [
+    ('MoodEntry', mood_document, MoodEntry.from_document),
+    ('JournalEntry', journal_document, JournalEntry.from_document),
+    ('ActivityEntry', activity_document, ActivityEntry.from_document),
+    ('VentPost', vent_document, VentPost.from_document),
+    ('User', user_document, User.from_document),
+]
+
+
+def held_bytes(build):
+    """Bytes still allocated after ``build()``, with the result kept alive"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main(count=20000):
+    rng = random.Random(42)
+    provider = MongoJSONProvider(Flask(__name__))
+    now = datetime.utcnow()
+    print(f"{count} objects per list; bytes per object exclude the field values both forms share")
+    print(f"{'model':<14} {'dict B/obj':>11} {'model B/obj':>12} {'saved':>7} {'decode dict':>12} {'decode model':>13} {'encode dict':>12} {'encode model':>13}")
+    for name, make, from_document in CASES:
+        user_id = ObjectId()
+        documents = [make(rng, user_id, now - timedelta(minutes=i)) for i in range(count)]
+        raw = [bson.encode(document) for document in documents]
+
+        # Copies of the dicts cost what pymongo's own dicts cost; the values are shared with the models
+        dict_bytes, dicts = held_bytes(lambda: [dict(document) for document in documents])
+        model_bytes, models = held_bytes(lambda: [from_document(document) for document in documents])
+
+        if name != 'User':
+            sample = dict(documents[0])
+            sample['id'] = sample.pop('_id')
+            assert provider.loads(provider.dumps(models[0])) == provider.loads(provider.dumps(sample)), name
+
+        start = time.perf_counter()
+        decoded = [bson.decode(data) for data in raw]
+        decode_dict = time.perf_counter() - start
+        start = time.perf_counter()
+        [from_document(document) for document in decoded]
+        decode_model = time.perf_counter() - start + decode_dict
+
+        # Users are never encoded as a whole (User.to_dict picks the public fields)
+        encode = f"{'n/a':>12} {'n/a':>13}"
+        if name != 'User':
+            start = time.perf_counter()
+            provider.dumps(dicts)
+            encode_dict = time.perf_counter() - start
+            start = time.perf_counter()
+            provider.dumps(models)
+            encode_model = time.perf_counter() - start
+            encode = f"{encode_dict * 1000:10.1f}ms {encode_model * 1000:11.1f}ms"
+
+        per_dict = dict_bytes / count
+        per_model = model_bytes / count
+        print(f"{name:<14} {per_dict:11.0f} {per_model:12.0f} {1 - per_model / per_dict:7.0%} "
+              f"{decode_dict * 1000:10.1f}ms {decode_model * 1000:11.1f}ms {encode}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+The real WSGI app wired to stub Spotify and Gemini APIs, for the load tests.
+
+STUB_SPOTIFY_URL points spotipy's token and API endpoints at the stub server
+started by the load test. The Gemini model is replaced by a stub that answers
+after STUB_GEMINI_LATENCY seconds (default 0.2). Without MONGODB_URI the
+database is an in-memory mongomock instance (pip install mongomock).
+"""
+
+import os
+import time
+from types import SimpleNamespace
+
+import spotipy.oauth2
+
+STUB_SPOTIFY_URL = os.environ['STUB_SPOTIFY_URL']
+STUB_GEMINI_LATENCY = float(os.getenv('STUB_GEMINI_LATENCY', 0.2))
+
+STUB_GEMINI_TEXT = (
+    "Thank you for sharing this. It sounds like a lot to carry, and it makes sense "
+    "that you feel this way. Try to be gentle with yourself today."
+)
+
+spotipy.oauth2.SpotifyClientCredentials.OAUTH_TOKEN_URL = f"{STUB_SPOTIFY_URL}/api/token"
+
+if not os.getenv('MONGODB_URI'):
+    import mongomock
+
+    from models.database import set_db
+    set_db(mongomock.MongoClient().load_test)
+
+
+class StubGeminiModel:
+    """Answers generate_content like the Gemini SDK, after a fixed delay"""
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(STUB_GEMINI_LATENCY)
+        if stream:
+            return [SimpleNamespace(text=word + ' ') for word in STUB_GEMINI_TEXT.split()]
+        return SimpleNamespace(text=STUB_GEMINI_TEXT)
+
+
+from wsgi import app  # noqa: E402
+from routes import music  # noqa: E402
+from services import ai_service  # noqa: E402
+from services.providers import LazyProvider  # noqa: E402
+
+music.spotify_service.sp.prefix = f"{STUB_SPOTIFY_URL}/v1/"
+ai_service.gemini_model = LazyProvider('Gemini model (stub)', StubGeminiModel)
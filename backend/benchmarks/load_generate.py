@@ -0,0 +1,221 @@
+"""
+Load test for POST /api/music/generate.
+
+Against a running server (the token is any valid access token for it):
+    python -m benchmarks.load_generate --url http://127.0.0.1:5001 --token <jwt>
+
+Comparing serving modes locally: starts gunicorn once per SERVER_MODE, with
+Spotify replaced by a local stub that answers each search after
+--upstream-latency seconds, and prints throughput and latency for each:
+    python -m benchmarks.load_generate --compare sync,gthread,gevent --concurrency 50
+
+Run from the backend directory.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOAD_TEST_JWT_SECRET = 'load-test-secret-key-not-for-production'
+
+
+def make_stub_track(index):
+    return {
+        'id': f'stub{index}',
+        'name': f'Stub Track {index}',
+        'artists': [{'name': 'Stub Artist'}],
+        'album': {'name': 'Stub Album', 'images': []},
+        'duration_ms': 180000,
+        'popularity': 50,
+        'preview_url': None,
+        'external_urls': {'spotify': f'https://open.spotify.com/track/stub{index}'}
+    }
+
+
+def start_stub_spotify(latency):
+    """Serve the Spotify token and search endpoints, delaying each search by ``latency``"""
+
+    class StubSpotifyHandler(BaseHTTPRequestHandler):
+        def _send_json(self, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._send_json({'access_token': 'stub', 'token_type': 'Bearer', 'expires_in': 3600})
+
+        def do_GET(self):
+            time.sleep(latency)
+            self._send_json({'tracks': {'items': [make_stub_track(i) for i in range(4)]}})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSpotifyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_token(user_id='000000000000000000000001'):
+    """Create an access token the spawned servers accept"""
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = LOAD_TEST_JWT_SECRET
+    JWTManager(app)
+    with app.app_context():
+        return create_access_token(identity=user_id)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, token, concurrency, duration, mood):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        session = requests.Session()
+        session.headers['Authorization'] = f'Bearer {token}'
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                response = session.post(f'{url}/api/music/generate', json={'mood': mood, 'limit': 20}, timeout=120)
+                ok = response.status_code == 201
+                error = None if ok else f'HTTP {response.status_code}'
+            except requests.RequestException as e:
+                ok, error = False, type(e).__name__
+            elapsed = time.monotonic() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(error)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / wall,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'first_error': errors[0] if errors else None
+    }
+
+
+def print_result(label, result):
+    line = (f"{label:<10} rps={result['rps']:8.1f}  p50={result['p50_ms']:8.1f}ms  "
+            f"p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+            f"ok={result['requests']}  errors={result['errors']}")
+    if result['first_error']:
+        line += f"  ({result['first_error']})"
+    print(line)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_healthy(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            if requests.get(f'{url}/api/health', timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError('gunicorn did not become healthy in time')
+
+
+def compare_modes(modes, args):
+    stub_server, stub_url = start_stub_spotify(args.upstream_latency)
+    token = make_token()
+    print(f"Stub Spotify latency {args.upstream_latency * 1000:.0f}ms per search, "
+          f"concurrency {args.concurrency}, {args.duration}s per mode")
+    try:
+        for mode in modes:
+            port = free_port()
+            env = dict(
+                os.environ,
+                SERVER_MODE=mode,
+                PORT=str(port),
+                JWT_SECRET=LOAD_TEST_JWT_SECRET,
+                SPOTIFY_CLIENT_ID='load-test',
+                SPOTIFY_CLIENT_SECRET='load-test',
+                STUB_SPOTIFY_URL=stub_url
+            )
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.load_app:app'],
+                cwd=BACKEND_DIR, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            url = f'http://127.0.0.1:{port}'
+            try:
+                wait_until_healthy(url, process)
+                print_result(mode, run_load(url, token, args.concurrency, args.duration, args.mood))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        stub_server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test POST /api/music/generate')
+    parser.add_argument('--url', default='http://127.0.0.1:5001')
+    parser.add_argument('--token', help='Access token for --url')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--mood', default='calm')
+    parser.add_argument('--compare', help='Comma-separated SERVER_MODE values to start and compare')
+    parser.add_argument('--upstream-latency', type=float, default=0.1,
+                        help='Seconds the stub Spotify API takes per search (with --compare)')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_modes([mode.strip() for mode in args.compare.split(',')], args)
+        return
+
+    if not args.token:
+        parser.error('--token is required unless --compare is used')
+    print_result('server', run_load(args.url, args.token, args.concurrency, args.duration, args.mood))
+
+
+if __name__ == '__main__':
+    main()
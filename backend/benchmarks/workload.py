@@ -0,0 +1,265 @@
+"""
+Scripted user-journey load test with per-endpoint latency and saved baselines.
+
+Each virtual user repeats one journey until the time is up: register, log in,
+submit a mood, load the dashboard stats, the friends list and the vent feed,
+and generate a playlist. The report gives requests per second and
+p50/p95/p99 latency for each step.
+
+By default the real app is started under gunicorn (benchmarks.load_app) with
+stub Spotify and Gemini APIs and, without MONGODB_URI, an in-memory mongomock
+database. mongomock lives inside one process, so a single worker is used
+unless MONGODB_URI is set:
+    python -m benchmarks.workload --concurrency 8 --duration 20
+
+Against a running server instead:
+    python -m benchmarks.workload --url http://127.0.0.1:5001
+
+--save writes the results to a baseline file (JSON, one metric per line, so
+a regression shows up in ``git diff``); --baseline compares a run with a saved
+file and exits with status 1 when a step got slower than --tolerance allows.
+
+Run from the backend directory.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+from benchmarks.load_generate import (
+    BACKEND_DIR, LOAD_TEST_JWT_SECRET, free_port, percentile, start_stub_spotify, wait_until_healthy
+)
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+MOODS = ('happy', 'calm', 'anxious', 'sad', 'energetic')
+
+# (step, method, path, expected status)
+JOURNEY = [
+    ('register', 'POST', '/api/auth/register', 201),
+    ('login', 'POST', '/api/auth/login', 200),
+    ('submit_mood', 'POST', '/api/mood/submit', 201),
+    ('dashboard_stats', 'GET', '/api/profile/stats', 200),
+    ('friends', 'GET', '/api/social/friends', 200),
+    ('vent_feed', 'GET', '/api/social/vent', 200),
+    ('generate_playlist', 'POST', '/api/music/generate', 201),
+]
+
+
+def _request_body(step, user, iteration):
+    mood = MOODS[iteration % len(MOODS)]
+    if step == 'register':
+        return {'username': user['username'], 'email': user['email'], 'password': user['password']}
+    if step == 'login':
+        return {'email': user['email'], 'password': user['password']}
+    if step == 'submit_mood':
+        return {'mood': mood, 'intensity': 1 + iteration % 10, 'notes': 'benchmark entry'}
+    if step == 'generate_playlist':
+        return {'mood': mood, 'limit': 20}
+    return None
+
+
+def run_workload(url, concurrency, duration):
+    """Run ``concurrency`` virtual users for ``duration`` seconds, returning per-step samples"""
+    run_id = uuid.uuid4().hex[:8]
+    latencies = {step: [] for step, _, _, _ in JOURNEY}
+    errors = {step: [] for step, _, _, _ in JOURNEY}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def record(step, elapsed, error):
+        with lock:
+            if error is None:
+                latencies[step].append(elapsed)
+            else:
+                errors[step].append(error)
+
+    def virtual_user(index):
+        session = requests.Session()
+        iteration = 0
+        while time.monotonic() < deadline:
+            name = f'bench_{run_id}_{index}_{iteration}'
+            user = {'username': name, 'email': f'{name}@bench.local', 'password': 'bench-password'}
+            session.headers.pop('Authorization', None)
+            for step, method, path, expected in JOURNEY:
+                started = time.monotonic()
+                try:
+                    response = session.request(method, url + path, json=_request_body(step, user, iteration), timeout=120)
+                    error = None if response.status_code == expected else f'HTTP {response.status_code}'
+                except requests.RequestException as e:
+                    response, error = None, type(e).__name__
+                record(step, time.monotonic() - started, error)
+                if response is not None and response.status_code == 503:
+                    # Shed by the server: back off like a real client instead of retrying at once
+                    time.sleep(float(response.headers.get('Retry-After', 1)))
+                if error is not None:
+                    # The rest of the journey needs a logged-in user
+                    break
+                if step in ('register', 'login'):
+                    session.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+            iteration += 1
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    results = {}
+    for step, _, _, _ in JOURNEY:
+        samples = sorted(latencies[step])
+        results[step] = {
+            'requests': len(samples),
+            'errors': len(errors[step]),
+            'rps': round(len(samples) / wall, 2),
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+            'first_error': errors[step][0] if errors[step] else None
+        }
+    return results
+
+
+def start_server(args, stub_url):
+    """Start gunicorn on the stubbed app, returning (process, url)"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        SERVER_MODE=args.mode,
+        PORT=str(port),
+        JWT_SECRET=LOAD_TEST_JWT_SECRET,
+        SPOTIFY_CLIENT_ID='load-test',
+        SPOTIFY_CLIENT_SECRET='load-test',
+        STUB_SPOTIFY_URL=stub_url,
+        STUB_GEMINI_LATENCY=str(args.gemini_latency),
+        BCRYPT_ROUNDS=str(args.bcrypt_rounds)
+    )
+    if not os.getenv('MONGODB_URI'):
+        env['GUNICORN_WORKERS'] = '1'
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.load_app:app'],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_healthy(url, process)
+    except Exception:
+        process.terminate()
+        raise
+    return process, url
+
+
+def print_results(results, baseline=None):
+    print(f"{'step':<18} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ok':>6} {'errors':>6}")
+    for step, result in results.items():
+        line = (f"{step:<18} {result['rps']:8.1f} {result['p50_ms']:9.1f} {result['p95_ms']:9.1f} "
+                f"{result['p99_ms']:9.1f} {result['requests']:6d} {result['errors']:6d}")
+        previous = (baseline or {}).get(step)
+        if previous and previous['p95_ms']:
+            change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+            line += f"  p95 {change:+.0f}% vs baseline"
+        if result['first_error']:
+            line += f"  ({result['first_error']})"
+        print(line)
+
+
+def regressions(results, baseline, tolerance, min_delta_ms):
+    """Steps whose p95 latency or throughput is worse than the baseline by more than ``tolerance``.
+
+    p95 changes smaller than ``min_delta_ms`` are ignored: a few milliseconds
+    of scheduling noise is a large fraction of a fast step.
+    """
+    found = []
+    for step, previous in baseline.items():
+        current = results.get(step)
+        if current is None:
+            continue
+        slower_ms = current['p95_ms'] - previous['p95_ms']
+        if previous['p95_ms'] and slower_ms > max(previous['p95_ms'] * tolerance, min_delta_ms):
+            found.append(f"{step}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous['rps'] and current['rps'] < previous['rps'] * (1 - tolerance):
+            found.append(f"{step}: rps {previous['rps']} -> {current['rps']}")
+    return found
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scripted user-journey load test')
+    parser.add_argument('--url', help='Test a running server instead of starting one')
+    parser.add_argument('--mode', default='gthread', help='SERVER_MODE for the started server')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--upstream-latency', type=float, default=0.1, help='Seconds per stub Spotify search')
+    parser.add_argument('--gemini-latency', type=float, default=0.2, help='Seconds per stub Gemini call')
+    parser.add_argument('--bcrypt-rounds', type=int, default=int(os.getenv('BCRYPT_ROUNDS', 12)))
+    parser.add_argument('--baseline', help='Baseline name (benchmarks/baselines/<name>.json) or path to compare with')
+    parser.add_argument('--save', action='store_true', help='Write the results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before a step counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=10, help='Ignore p95 slowdowns smaller than this')
+    args = parser.parse_args()
+
+    config = {
+        'mode': args.mode if not args.url else 'external',
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'upstream_latency': args.upstream_latency,
+        'gemini_latency': args.gemini_latency,
+        'bcrypt_rounds': args.bcrypt_rounds,
+        'cpus': os.cpu_count()
+    }
+    print('Workload: ' + ', '.join(f'{key}={value}' for key, value in config.items()))
+
+    if args.url:
+        results = run_workload(args.url, args.concurrency, args.duration)
+    else:
+        stub_server, stub_url = start_stub_spotify(args.upstream_latency)
+        try:
+            process, url = start_server(args, stub_url)
+            try:
+                results = run_workload(url, args.concurrency, args.duration)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        finally:
+            stub_server.shutdown()
+
+    baseline = None
+    if args.baseline and not args.save:
+        with open(baseline_path(args.baseline)) as f:
+            baseline = json.load(f)['endpoints']
+    print_results(results, baseline)
+
+    if args.baseline and args.save:
+        path = baseline_path(args.baseline)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        saved = {step: {key: value for key, value in result.items() if key != 'first_error'}
+                 for step, result in results.items()}
+        with open(path, 'w') as f:
+            json.dump({'config': config, 'endpoints': saved}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {path}")
+    elif baseline is not None:
+        found = regressions(results, baseline, args.tolerance, args.min_delta_ms)
+        if found:
+            print(f"Regressions beyond {args.tolerance:.0%}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Gunicorn configuration.
+
+SERVER_MODE selects the worker model:
+    sync     one request at a time per worker (the original setup)
+    gthread  GUNICORN_THREADS request threads per worker
+    gevent   GUNICORN_WORKER_CONNECTIONS greenlets per worker; blocking Mongo,
+             Spotify and Gemini calls yield instead of stalling the worker
+
+Workers default to the number of usable CPUs (2 x CPUs + 1 for sync and
+gthread, whose workers spend most of their time blocked), capped at
+GUNICORN_MAX_WORKERS (8). Usable CPUs honour the container's cgroup CPU quota
+(cpu.max), not just the host cores visible to sched_getaffinity, which on a
+shared host like Railway would be far more than the container may use.
+
+Every worker is a full copy of the app, so per worker it costs:
+    MongoDB connections  MONGO_MAX_POOL_SIZE (+ monitoring connections per server)
+    job threads          JOB_WORKERS + JOURNAL_AI_WORKERS, each polling MongoDB
+                         every JOB_POLL_INTERVAL seconds while idle
+With the defaults (10 connections, 2 + 2 threads, 1s) 8 workers hold up to
+80 connections and make ~32 idle findAndModify polls per second; check that
+against the cluster's connection limit before raising GUNICORN_WORKERS.
+
+Run from the backend directory:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import math
+import os
+import shutil
+import tempfile
+
+server_mode = os.getenv('SERVER_MODE', 'sync')
+
+
+def _cgroup_cpu_limit():
+    """CPUs allowed by the cgroup CPU quota, or None when unlimited or unknown"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        quota, period = int(quota), int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            return None
+        if quota <= 0:
+            return None
+    if period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def _usable_cpus():
+    # Respects CPU affinity (e.g. container cpusets) where the platform supports it
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+def _default_workers():
+    cpus = _usable_cpus()
+    workers = cpus if server_mode == 'gevent' else cpus * 2 + 1
+    return min(workers, int(os.getenv('GUNICORN_MAX_WORKERS', 8)))
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('GUNICORN_WORKERS') or 0) or _default_workers()
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+
+if server_mode == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+elif server_mode == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 8))
+elif server_mode == 'sync':
+    worker_class = 'sync'
+else:
+    raise RuntimeError(f"Unknown SERVER_MODE '{server_mode}' (expected sync, gthread or gevent)")
+
+# Importing the app once in the master shares its memory between workers. Not
+# with gevent: modules imported before the worker monkey-patches keep the
+# unpatched socket and threading functions.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true' and server_mode != 'gevent'
+
+
+# Workers flush request metrics here so any of them can answer a scrape with
+# server-wide totals (services/request_metrics.py); set before workers fork
+os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f'mindful-harmony-metrics-{os.getpid()}')
+)
+
+
+def on_starting(server):
+    """Start each server with empty metrics"""
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['METRICS_DIR'], exist_ok=True)
+
+
+def worker_exit(server, worker):
+    """Keep the exiting worker's final counts in the server-wide totals"""
+    from services.request_metrics import request_metrics
+    request_metrics.flush()
+
+
+def post_worker_init(worker):
+    """Start the background job workers inside each worker process"""
+    from app import start_background_workers
+    start_background_workers()
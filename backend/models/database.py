@@ -1,97 +1,276 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, IndexModel
 import os
+import threading
+import time
 
-# Global database connection
+from services.db_metrics import event_listeners
+
+# Per-process database handle, created on first use by get_db()
 db = None
 
+# Connection settings recorded by init_db
+_mongodb_uri = None
+_db_pid = None
+_retry_at = 0.0
+_lock = threading.Lock()
+
+# Pool settings apply to each worker process: total connections = workers x MONGO_MAX_POOL_SIZE
+POOL_OPTIONS = {
+    'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 10)),
+    'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+    'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 0)) or None,
+    # How long a request may wait for a free connection before failing
+    'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None,
+    'maxConnecting': int(os.getenv('MONGO_MAX_CONNECTING', 2)),
+    'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)),
+    'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000)),
+    'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 10000))
+}
+
+# After a failed connection attempt, demo mode is served this long before retrying
+CONNECT_RETRY_SECONDS = int(os.getenv('MONGO_CONNECT_RETRY_SECONDS', 30))
+
+# Seconds between background pings of the database
+HEALTH_CHECK_SECONDS = int(os.getenv('MONGO_HEALTH_CHECK_SECONDS', 15))
+
+# Result of the last background check in this process (see db_status)
+_status = {'state': 'not_configured'}
+_ready_callbacks = []
+
+# (collection, keys, options) for every index the app relies on
+INDEXES = [
+    ('users', [('email', 1)], {'unique': True}),
+    ('users', [('username', 1)], {'unique': True}),
+    ('users', [('friend_code', 1)], {'unique': True}),
+    ('mood_entries', [('user_id', 1), ('timestamp', -1)], {}),
+    ('mood_entries', [('timestamp', 1)], {}),
+    ('journal_entries', [('user_id', 1), ('timestamp', -1)], {}),
+    # Per-user full-text search (/api/journal/search); one text index per collection
+    ('journal_entries', [('user_id', 1), ('title', 'text'), ('content', 'text'), ('tags', 'text')], {
+        'name': 'journal_text_search',
+        'weights': {'title': 5, 'tags': 3, 'content': 1},
+        'default_language': 'english',
+        'language_override': 'search_language'
+    }),
+    ('activities', [('user_id', 1), ('timestamp', -1)], {}),
+    ('biometrics', [('user_id', 1), ('timestamp', -1)], {}),
+    # Per-user _id order for the resumable data export
+    ('mood_entries', [('user_id', 1), ('_id', 1)], {}),
+    ('journal_entries', [('user_id', 1), ('_id', 1)], {}),
+    ('activities', [('user_id', 1), ('_id', 1)], {}),
+    ('biometrics', [('user_id', 1), ('_id', 1)], {}),
+    ('playlists', [('user_id', 1), ('_id', 1)], {}),
+    ('friend_connections', [('user_id', 1), ('friend_id', 1)], {'unique': True}),
+    ('vent_posts', [('timestamp', -1)], {}),
+    ('vent_posts', [('is_active', 1), ('timestamp', -1)], {}),
+    ('vent_posts', [('mood', 1), ('timestamp', -1)], {}),
+    ('vent_posts', [('tags', 1), ('timestamp', -1)], {}),
+    ('vent_comments', [('post_id', 1), ('timestamp', 1)], {}),
+    ('vent_comments', [('is_active', 1), ('timestamp', 1)], {}),
+    ('vent_comments', [('user_id', 1), ('timestamp', -1)], {}),
+    ('spotify_tokens', [('user_id', 1)], {'unique': True}),
+    ('spotify_tokens', [('updated_at', -1)], {})
+]
+
+def _reset_after_fork():
+    # Another thread may have held the lock at fork time; the child gets a fresh one
+    global _lock, _retry_at, _status, _ready_callbacks
+    _lock = threading.Lock()
+    _retry_at = 0.0
+    # The monitor thread does not survive the fork; the child starts its own on connect
+    _status = {'state': 'connecting' if _mongodb_uri else 'not_configured'}
+    _ready_callbacks = []
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 def init_db(app):
-    """Initialize database connection"""
-    global db
+    """Record database settings; each process connects on its first get_db() call.
+    
+    MongoClient is not fork-safe, so no client is created here: with
+    ``gunicorn --preload`` the app is imported once in the master and every
+    worker must open its own connections after the fork.
+    """
+    global _mongodb_uri, db, _db_pid, _status
     
     # Check if MongoDB URI is provided
     mongodb_uri = app.config.get('MONGODB_URI')
     if not mongodb_uri:
         print("❌ MONGODB_URI environment variable not set")
         print("⚠️  Running in demo mode without database. Some features will be limited.")
-        db = None
+        _mongodb_uri = None
         return
     
+    _mongodb_uri = mongodb_uri
+    db = None
+    _db_pid = None
+    _status = {'state': 'connecting'}
+
+def set_db(database):
+    """Use an existing database object (e.g. a mongomock database) instead of connecting"""
+    global db, _db_pid, _status
+    db = database
+    _db_pid = None
+    _status = {'state': 'ready' if database is not None else 'not_configured'}
+
+def _connect():
+    """Create this process's client, returning the database or None (demo mode).
+    
+    Creating a MongoClient does no network I/O, so this returns at once; the
+    monitor thread pings the server, creates missing indexes and keeps
+    db_status() current.
+    """
+    global db, _db_pid, _retry_at, _status
+    
     try:
         # Production-ready MongoDB connection with retry logic
         client = MongoClient(
-            mongodb_uri,
-            serverSelectionTimeoutMS=10000,  # 10 second timeout for production
-            connectTimeoutMS=10000,
-            socketTimeoutMS=10000,
-            maxPoolSize=10,  # Connection pooling
-            retryWrites=True
+            _mongodb_uri,
+            retryWrites=True,
+            event_listeners=event_listeners(),
+            **POOL_OPTIONS
         )
         
-        # Test the connection
-        client.admin.command('ping')
-        
         # Extract database name from URI or use default
-        if 'mindful_harmony' in mongodb_uri:
-            db = client.mindful_harmony
+        if 'mindful_harmony' in _mongodb_uri:
+            database = client.mindful_harmony
         else:
-            db = client.get_default_database()
-            
-        print(f"✅ Successfully connected to MongoDB: {db.name}")
-        
-        # Create indexes for better performance
-        create_indexes()
+            database = client.get_default_database()
         
-    except ConnectionFailure as e:
-        print(f"❌ MongoDB connection failed: {e}")
-        print("⚠️  Database connection timeout. Check your connection string.")
-        db = None
     except Exception as e:
+        # Invalid URI or failed SRV lookup; pings could not fix these
         print(f"❌ Failed to connect to MongoDB: {e}")
         print("⚠️  Running in demo mode without database. Some features will be limited.")
-        db = None
-
-def create_indexes():
-    """Create database indexes for better performance"""
-    if db is None:
-        print("⚠️  Skipping index creation - database not available")
-        return
-        
-    # Users collection indexes
-    db.users.create_index("email", unique=True)
-    db.users.create_index("username", unique=True)
-    db.users.create_index("friend_code", unique=True)
-    
-    # Mood entries indexes
-    db.mood_entries.create_index([("user_id", 1), ("timestamp", -1)])
-    db.mood_entries.create_index("timestamp")
+        _status = {'state': 'unreachable', 'error': str(e)}
+        _retry_at = time.monotonic() + CONNECT_RETRY_SECONDS
+        return None
     
-    # Journal entries indexes
-    db.journal_entries.create_index([("user_id", 1), ("timestamp", -1)])
+    db = database
+    _db_pid = os.getpid()
+    _status = {'state': 'connecting'}
     
-    # Activities indexes
-    db.activities.create_index([("user_id", 1), ("timestamp", -1)])
+    thread = threading.Thread(target=_monitor, args=(database,), name='mongo-monitor', daemon=True)
+    thread.start()
+    return db
+
+def _monitor(database):
+    """Ping the server every HEALTH_CHECK_SECONDS for as long as ``database`` is this process's handle"""
+    global _status
+    pid = os.getpid()
+    indexes_ready = False
     
-    # Friend connections indexes
-    db.friend_connections.create_index([("user_id", 1), ("friend_id", 1)], unique=True)
+    while db is database and _db_pid == pid:
+        start = time.perf_counter()
+        try:
+            database.client.admin.command('ping')
+        except Exception as e:
+            if _status['state'] != 'unreachable':
+                print(f"❌ MongoDB ping failed: {e}")
+                print("⚠️  Database unreachable. Check your connection string.")
+            _status = {'state': 'unreachable', 'error': str(e), 'checked_at': time.time()}
+            time.sleep(HEALTH_CHECK_SECONDS)
+            continue
+        
+        ping_ms = round((time.perf_counter() - start) * 1000, 1)
+        if _status['state'] != 'ready':
+            print(f"✅ Successfully connected to MongoDB: {database.name} (pid {pid})")
+        
+        if not indexes_ready:
+            try:
+                create_indexes(database)
+                indexes_ready = True
+            except Exception as e:
+                print(f"⚠️  Index creation failed, will retry: {e}")
+        
+        _status = {
+            'state': 'ready',
+            'ping_ms': ping_ms,
+            'indexes_ready': indexes_ready,
+            'checked_at': time.time()
+        }
+        _run_ready_callbacks()
+        time.sleep(HEALTH_CHECK_SECONDS)
+
+def _run_ready_callbacks():
+    with _lock:
+        callbacks = list(_ready_callbacks)
+        del _ready_callbacks[:]
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            print(f"⚠️  Database ready callback failed: {e}")
+
+def when_ready(callback):
+    """Call ``callback`` once this process's database has answered a ping (at once if it already has)"""
+    with _lock:
+        if _status['state'] != 'ready':
+            _ready_callbacks.append(callback)
+            return
+    callback()
+
+def db_status():
+    """Database state for health checks: not_configured (demo mode), connecting, ready or unreachable"""
+    # A status inherited across a fork describes the parent's client
+    if _mongodb_uri and _db_pid is not None and _db_pid != os.getpid():
+        return {'state': 'connecting'}
+    return dict(_status)
+
+def _key_pattern(keys):
+    """Key pattern as index_information() reports it: text fields become _fts/_ftsx"""
+    pattern = []
+    for field, direction in keys:
+        if direction == 'text':
+            if ('_fts', 'text') not in pattern:
+                pattern += [('_fts', 'text'), ('_ftsx', 1)]
+        else:
+            pattern.append((field, direction))
+    return tuple(pattern)
+
+def ensure_indexes(collection, specs):
+    """Create the ``(keys, options)`` indexes missing from ``collection``, returning how many were created.
     
-    # Vent posts indexes
-    db.vent_posts.create_index([("timestamp", -1)])
-    db.vent_posts.create_index([("is_active", 1), ("timestamp", -1)])
-    db.vent_posts.create_index([("mood", 1), ("timestamp", -1)])
-    db.vent_posts.create_index([("tags", 1), ("timestamp", -1)])
+    Existing indexes are matched by key pattern, so indexes built under another
+    name are not duplicated.
+    """
+    existing = {
+        tuple((field, direction) for field, direction in info['key'])
+        for info in collection.index_information().values()
+    }
+    missing = [IndexModel(keys, **options) for keys, options in specs if _key_pattern(keys) not in existing]
+    if missing:
+        collection.create_indexes(missing)
+    return len(missing)
+
+def create_indexes(database=None):
+    """Create any of INDEXES that do not exist yet"""
+    database = db if database is None else database
+    if database is None:
+        print("⚠️  Skipping index creation - database not available")
+        return 0
     
-    # Vent comments indexes
-    db.vent_comments.create_index([("post_id", 1), ("timestamp", 1)])
-    db.vent_comments.create_index([("is_active", 1), ("timestamp", 1)])
-    db.vent_comments.create_index([("user_id", 1), ("timestamp", -1)])
+    by_collection = {}
+    for name, keys, options in INDEXES:
+        by_collection.setdefault(name, []).append((keys, options))
     
-    # Spotify tokens indexes
-    db.spotify_tokens.create_index([("user_id", 1)], unique=True)
-    db.spotify_tokens.create_index([("updated_at", -1)])
+    created = 0
+    for name, specs in by_collection.items():
+        created += ensure_indexes(database[name], specs)
     
-    print("✅ Database indexes created successfully")
+    print(f"✅ Database indexes verified ({created} created)")
+    return created
 
 def get_db():
-    """Get database instance"""
-    return db
+    """Get database instance, connecting on first use in each process"""
+    database = db
+    # A client inherited across a fork belongs to the parent; _db_pid is None for set_db()
+    if database is not None and (_db_pid is None or _db_pid == os.getpid()):
+        # Returned even while the monitor cannot reach the server: queries then
+        # raise, and routes answer 503 (routes.errors) instead of demo data
+        return database
+    if _mongodb_uri is None or time.monotonic() < _retry_at:
+        return None
+    
+    with _lock:
+        if db is not None and _db_pid == os.getpid():
+            return db
+        return _connect()
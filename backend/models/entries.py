@@ -0,0 +1,219 @@
+"""
+Slotted models for the entry collections.
+
+A list endpoint can hold hundreds of documents at once; as plain dicts each
+one carries a hash table sized for its keys. These classes keep the known
+fields in ``__slots__`` and only fall back to a dict (``extra``) for fields a
+document carries that the model does not list, so nothing stored in Mongo is
+lost on the way to the client.
+
+Models read like the documents they come from (``entry['mood']``,
+``entry.get('notes')``), so the stats helpers take either, and the app's JSON
+provider encodes them with ``to_dict``. Fields missing from a document are
+left unset, as they would be absent from the dict.
+
+Memory is bought with CPU: a model is built from the dict pymongo already
+decoded and turned back into one for JSON, about a microsecond each way per
+document (see benchmarks/bench_models.py). ``from_document`` is generated per
+class, like a dataclass ``__init__``, so it assigns slots directly, and it
+records which fields were present so ``to_dict`` reads them all in one call.
+Use models where many documents are held at once; a route that reshapes each
+document into a new dict anyway is better off with the dicts themselves.
+
+Read-only list endpoints can skip the Python objects altogether with
+``find_json``: the server turns ObjectIds and dates into the strings the JSON
+provider would have produced, so pymongo only decodes plain values and orjson
+encodes them without calling back into Python.
+"""
+
+from operator import attrgetter
+
+from pymongo.errors import OperationFailure
+
+_MISSING = object()
+_new = object.__new__
+
+# Cleared when the server rejects the conversion pipeline (MongoDB < 4.0, mongomock)
+_server_conversion = True
+
+
+def _object_id_string(field):
+    value = '$' + field
+    return {'$cond': [{'$eq': [{'$type': value}, 'objectId']}, {'$toString': value}, value]}
+
+
+def _iso_date_string(field):
+    # Same text as datetime.isoformat(): six fraction digits, or none for a whole second
+    value = '$' + field
+    return {'$cond': [
+        {'$eq': [{'$type': value}, 'date']},
+        {'$cond': [
+            {'$eq': [{'$millisecond': value}, 0]},
+            {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S', 'date': value}},
+            {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S.%L000', 'date': value}}
+        ]},
+        value
+    ]}
+
+
+def _build_from_document(cls):
+    """Source of ``from_document`` for ``cls``, unrolled over its FIELDS"""
+    lines = [
+        'def from_document(cls, document):',
+        '    obj = _new(cls)',
+        '    get = document.get',
+        '    obj.id = get("_id")',
+        '    count = 0 if obj.id is None else 1',
+        '    present = 0',
+    ]
+    for index, name in enumerate(cls.FIELDS):
+        lines += [
+            f'    value = get({name!r}, _MISSING)',
+            '    if value is not _MISSING:',
+            f'        obj.{name} = value',
+            f'        present |= {1 << index}',
+            '        count += 1',
+        ]
+    lines += [
+        '    layout = cls._layouts.get(present)',
+        '    obj._layout = layout if layout is not None else cls._layout_for(present)',
+        '    # Only build the overflow dict when the document has fields the model does not list',
+        '    obj.extra = None if len(document) == count else {',
+        '        key: value for key, value in document.items() if key != "_id" and key not in cls._field_set',
+        '    }',
+        '    return obj',
+    ]
+    namespace = {}
+    exec('\n'.join(lines), {'_new': _new, '_MISSING': _MISSING}, namespace)
+    return namespace['from_document']
+
+
+class Document:
+    """Base for the slotted document models"""
+
+    __slots__ = ('id', 'extra', '_layout')
+    FIELDS = ()
+    OBJECT_ID_FIELDS = ('user_id',)
+    DATE_FIELDS = ('timestamp',)
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        # Present-field bitmask -> (names, getter), shared by every model with that set of fields
+        cls._layouts = {}
+        cls.from_document = classmethod(_build_from_document(cls))
+        # A field that is missing or of another type is left as it is
+        conversions = {'id': {'$toString': '$_id'}}
+        conversions.update((field, _object_id_string(field)) for field in cls.OBJECT_ID_FIELDS)
+        conversions.update((field, _iso_date_string(field)) for field in cls.DATE_FIELDS)
+        cls._json_stage = {'$addFields': conversions}
+
+    @classmethod
+    def from_document(cls, document):
+        """Build a model from a document as returned by pymongo (generated per subclass)"""
+        raise NotImplementedError
+
+    @classmethod
+    def _layout_for(cls, present):
+        names = ('id',) + tuple(name for index, name in enumerate(cls.FIELDS) if present >> index & 1)
+        # attrgetter of a single name returns the value itself, not a 1-tuple
+        get_values = attrgetter(*names) if len(names) > 1 else (lambda obj: (obj.id,))
+        layout = cls._layouts[present] = (names, get_values)
+        return layout
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        return [cls.from_document(document) for document in cursor]
+
+    @classmethod
+    def find_json(cls, collection, query, sort=None, skip=0, limit=0):
+        """Documents matching ``query`` as JSON-ready dicts, converted by the server.
+
+        Falls back to ``find`` and models on servers without ``$toString``.
+        """
+        global _server_conversion
+        if _server_conversion:
+            pipeline = [{'$match': query}]
+            if sort:
+                pipeline.append({'$sort': dict(sort)})
+            if skip:
+                pipeline.append({'$skip': skip})
+            if limit:
+                pipeline.append({'$limit': limit})
+            pipeline += [cls._json_stage, {'$project': {'_id': 0}}]
+            try:
+                return list(collection.aggregate(pipeline))
+            except OperationFailure as e:
+                # 168 is InvalidPipelineOperator; anything else is left for find() to report
+                if e.code in (168, None):
+                    _server_conversion = False
+                    print(f"⚠️  Server-side JSON conversion unavailable, decoding list endpoints in Python: {e}")
+
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        return cls.from_cursor(cursor.skip(skip).limit(limit))
+
+    def to_dict(self):
+        """JSON-ready dict, with ``_id`` as ``id``"""
+        names, get_values = self._layout
+        data = dict(zip(names, get_values(self)))
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, key, default=None):
+        if key == '_id':
+            key = 'id'
+        value = getattr(self, key, _MISSING) if key in self._field_set or key == 'id' else _MISSING
+        if value is _MISSING and self.extra:
+            value = self.extra.get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class MoodEntry(Document):
+    FIELDS = ('user_id', 'mood', 'intensity', 'notes', 'timestamp', 'activities', 'weather', 'location', 'imported')
+    __slots__ = FIELDS
+
+
+class JournalEntry(Document):
+    FIELDS = (
+        'user_id', 'title', 'content', 'mood', 'tags', 'timestamp', 'updated_at', 'word_count', 'is_private',
+        'ai_response', 'ai_response_status', 'ai_response_job_id', 'ai_response_requested_at',
+        'ai_response_completed_at', 'ai_response_error', 'sentiment', 'sentiment_analyzed_at'
+    )
+    OBJECT_ID_FIELDS = ('user_id', 'ai_response_job_id')
+    DATE_FIELDS = ('timestamp', 'updated_at', 'ai_response_requested_at', 'ai_response_completed_at',
+                   'sentiment_analyzed_at')
+    __slots__ = FIELDS
+
+
+class ActivityEntry(Document):
+    FIELDS = ('user_id', 'activity_name', 'duration', 'mood_before', 'mood_after', 'notes', 'timestamp', 'completed')
+    __slots__ = FIELDS
+
+
+class VentPost(Document):
+    FIELDS = ('user_id', 'content', 'mood', 'tags', 'timestamp', 'reactions', 'is_active',
+              'sentiment', 'sentiment_analyzed_at')
+    DATE_FIELDS = ('timestamp', 'sentiment_analyzed_at')
+    __slots__ = FIELDS
+
+
+class Playlist(Document):
+    FIELDS = ('user_id', 'mood', 'intensity', 'playlist', 'playlist_name', 'spotify_playlist_id',
+              'spotify_playlist_url', 'tracks', 'tracks_count', 'timestamp', 'created_in_spotify')
+    __slots__ = FIELDS
@@ -1,8 +1,8 @@
 from datetime import datetime
-import bcrypt
 import secrets
 import string
 from models.database import get_db
+from services.password_hasher import password_hasher
 
 # Demo account credentials for everyone to use
 DEMO_ACCOUNT = {
@@ -14,7 +14,15 @@ DEMO_ACCOUNT = {
 }
 
 class User:
+    # Fields stored on a user document; any others a document carries are kept in ``extra``
+    FIELDS = (
+        '_id', 'username', 'email', 'password_hash', 'name', 'profile_pic', 'friend_code', 'favorite_genres',
+        'biometrics', 'profile_data', 'created_at', 'last_login', 'is_active'
+    )
+    __slots__ = FIELDS + ('extra',)
+
     def __init__(self, username, email, password, name=None, profile_pic=None):
+        self.extra = None
         self.username = username
         self.email = email
         self.password_hash = self._hash_password(password)
@@ -60,9 +68,31 @@ class User:
         self.last_login = datetime.utcnow()
         self.is_active = True
 
+    @classmethod
+    def from_document(cls, document):
+        """Build a user from a users document; fields it lacks stay unset, as before"""
+        user = cls.__new__(cls)
+        user.extra = None
+        for key, value in document.items():
+            if key in _USER_FIELDS:
+                setattr(user, key, value)
+            else:
+                if user.extra is None:
+                    user.extra = {}
+                user.extra[key] = value
+        return user
+
+    def to_document(self):
+        """The fields to store in the users collection"""
+        document = dict(self.extra or {})
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                document[name] = getattr(self, name)
+        return document
+
     def _hash_password(self, password):
-        """Hash password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        """Hash password using bcrypt (on the hashing pool; raises PasswordHasherOverloaded when busy)"""
+        return password_hasher.hash(password)
 
     def _generate_friend_code(self):
         """Generate unique 8-character friend code"""
@@ -70,8 +100,28 @@ class User:
         return ''.join(secrets.choice(alphabet) for _ in range(8))
 
     def verify_password(self, password):
-        """Verify password against hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash)
+        """Verify password against hash, upgrading the hash if BCRYPT_ROUNDS has changed"""
+        if not password_hasher.verify(password, self.password_hash):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self._rehash_password(password)
+        return True
+
+    def _rehash_password(self, password):
+        """Store a hash at the configured cost in the background, after the login has been answered"""
+        db = get_db()
+        if db is None or not hasattr(self, '_id'):
+            return
+        old_hash = self.password_hash
+        
+        def store(new_hash):
+            # Only replace the hash this login verified, in case the password changed meanwhile
+            db.users.update_one(
+                {"_id": self._id, "password_hash": old_hash},
+                {"$set": {"password_hash": new_hash}}
+            )
+        
+        password_hasher.rehash_async(password, store)
 
     def to_dict(self):
         """Convert user to dictionary for JSON serialization"""
@@ -143,7 +193,7 @@ class User:
             return None, "User already exists"
         
         user = User(username, email, password, name, profile_pic)
-        result = db.users.insert_one(user.__dict__)
+        result = db.users.insert_one(user.to_document())
         user._id = result.inserted_id
         
         return user, None
@@ -168,8 +218,7 @@ class User:
             
         user_data = db.users.find_one({"email": email})
         if user_data:
-            user = User.__new__(User)
-            user.__dict__.update(user_data)
+            user = User.from_document(user_data)
             return user
         return None
 
@@ -179,8 +228,7 @@ class User:
         db = get_db()
         user_data = db.users.find_one({"username": username})
         if user_data:
-            user = User.__new__(User)
-            user.__dict__.update(user_data)
+            user = User.from_document(user_data)
             return user
         return None
 
@@ -207,8 +255,7 @@ class User:
         from bson import ObjectId
         user_data = db.users.find_one({"_id": ObjectId(user_id)})
         if user_data:
-            user = User.__new__(User)
-            user.__dict__.update(user_data)
+            user = User.from_document(user_data)
             return user
         return None
 
@@ -218,8 +265,7 @@ class User:
         db = get_db()
         user_data = db.users.find_one({"friend_code": friend_code})
         if user_data:
-            user = User.__new__(User)
-            user.__dict__.update(user_data)
+            user = User.from_document(user_data)
             
             # Ensure profile_data exists for backwards compatibility
             if not hasattr(user, 'profile_data') or user.profile_data is None:
@@ -351,3 +397,6 @@ class User:
         except Exception as e:
             print(f"Error updating profile data: {e}")
             return False
+
+
+_USER_FIELDS = frozenset(User.FIELDS)
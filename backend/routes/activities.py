@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
-from services.ai_service import generate_activity_suggestions
+from models.entries import ActivityEntry
+from services.suggestion_cache import suggestion_cache
+from services.http_cache import bumps_data_version, etag_from_data_version
+from routes.errors import error_response
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -29,8 +32,8 @@ def get_activity_recommendations():
                 mood = recent_mood.get('mood', 'neutral')
                 intensity = recent_mood.get('intensity', 5)
         
-        # Generate AI-powered activity suggestions
-        activities = generate_activity_suggestions(mood, intensity)
+        # AI-powered activity suggestions, served from the (mood, intensity) cache
+        activities = suggestion_cache.get(mood, intensity)
         
         # Add some predefined activities based on mood
         predefined_activities = get_predefined_activities(mood, intensity)
@@ -44,10 +47,11 @@ def get_activity_recommendations():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @activities_bp.route('/log', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def log_activity():
     """Log a completed activity"""
     try:
@@ -90,10 +94,11 @@ def log_activity():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @activities_bp.route('/history', methods=['GET'])
 @jwt_required()
+@etag_from_data_version(refresh_seconds=300)
 def get_activity_history():
     """Get user's activity history"""
     try:
@@ -107,17 +112,11 @@ def get_activity_history():
         # Calculate date range
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get activity entries
-        entries = list(db.activities.find({
+        # Get activity entries, already converted to JSON types by the server
+        entries = ActivityEntry.find_json(db.activities, {
             'user_id': ObjectId(user_id),
             'timestamp': {'$gte': start_date}
-        }).sort('timestamp', -1).limit(limit))
-        
-        # Convert ObjectId to string for JSON serialization
-        for entry in entries:
-            entry['id'] = str(entry['_id'])
-            entry['timestamp'] = entry['timestamp'].isoformat()
-            del entry['_id']
+        }, sort=[('timestamp', -1)], limit=limit)
         
         # Calculate activity statistics
         stats = calculate_activity_stats(entries)
@@ -128,7 +127,7 @@ def get_activity_history():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @activities_bp.route('/stats', methods=['GET'])
 @jwt_required()
@@ -157,7 +156,7 @@ def get_activity_stats():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 def get_predefined_activities(mood, intensity):
     """Get predefined activities based on mood"""
@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify
+from functools import wraps
+from models.database import POOL_OPTIONS
+from services.db_metrics import pool_metrics, command_metrics, route_metrics, ROUTE_METRICS_ENABLED, SLOW_QUERY_MS
+from routes.errors import error_response
+import hmac
+import os
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(view):
+    """Allow the request only with the X-Admin-Token header matching ADMIN_TOKEN"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admin_token = os.getenv('ADMIN_TOKEN')
+        # Admin endpoints do not exist unless a token is configured
+        if not admin_token:
+            return jsonify({'error': 'Endpoint not found'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return jsonify({'error': 'Invalid admin token'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/db-metrics', methods=['GET'])
+@admin_required
+def get_db_metrics():
+    """MongoDB pool and command metrics for this worker process"""
+    try:
+        return jsonify({
+            'pid': os.getpid(),
+            'pool_options': POOL_OPTIONS,
+            'pool': pool_metrics.snapshot(),
+            'commands': command_metrics.snapshot()
+        }), 200
+        
+    except Exception as e:
+        return error_response(e)
+
+@admin_bp.route('/db-routes', methods=['GET'])
+@admin_required
+def get_db_route_metrics():
+    """Mongo commands per Flask route for this worker process, most DB time first"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({
+            'pid': os.getpid(),
+            'enabled': ROUTE_METRICS_ENABLED,
+            'routes': route_metrics.snapshot()[:limit]
+        }), 200
+        
+    except Exception as e:
+        return error_response(e)
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """Most recent slow Mongo commands with their filter shapes, newest first"""
+    try:
+        return jsonify({
+            'pid': os.getpid(),
+            'threshold_ms': SLOW_QUERY_MS,
+            'slow_queries': list(reversed(route_metrics.slow_queries))
+        }), 200
+        
+    except Exception as e:
+        return error_response(e)
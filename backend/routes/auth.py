@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models.user import User
+from services.password_hasher import PasswordHasherOverloaded
+from services.http_cache import bumps_data_version
+from routes.errors import error_response
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -36,6 +39,12 @@ def friend_code_options():
     """Handle CORS preflight for friend code"""
     return '', 200
 
+def _busy_response():
+    """503 for a login or registration shed by the password hashing pool"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -78,8 +87,10 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHasherOverloaded:
+        return _busy_response()
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
@@ -120,8 +131,10 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except PasswordHasherOverloaded:
+        return _busy_response()
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
@@ -139,10 +152,11 @@ def get_profile():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
+@bumps_data_version
 def update_profile():
     """Update user profile"""
     try:
@@ -171,7 +185,7 @@ def update_profile():
             return jsonify({'error': 'Failed to update profile'}), 500
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/friend-code', methods=['GET'])
 @jwt_required()
@@ -187,7 +201,7 @@ def get_friend_code():
         # Debug logging
         print(f"User found: {user.username}")
         print(f"User friend_code: {getattr(user, 'friend_code', 'NOT_FOUND')}")
-        print(f"User dict: {user.__dict__}")
+        print(f"User dict: {user.to_dict()}")
         
         # If friend_code is missing, generate one and save it
         if not hasattr(user, 'friend_code') or not user.friend_code:
@@ -213,10 +227,11 @@ def get_friend_code():
         
     except Exception as e:
         print(f"Error in get_friend_code: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/onboarding', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def complete_onboarding():
     """Complete user onboarding with extended profile data"""
     try:
@@ -306,10 +321,11 @@ def complete_onboarding():
         print(f"Onboarding error: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @auth_bp.route('/profile/photo', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def update_profile_photo():
     """Update user profile photo immediately"""
     try:
@@ -364,4 +380,4 @@ def update_profile_photo():
             return jsonify({'error': 'Failed to update profile photo'}), 500
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
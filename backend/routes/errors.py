@@ -0,0 +1,14 @@
+from flask import jsonify
+from pymongo.errors import ConnectionFailure
+
+
+def error_response(error, message=None):
+    """JSON response for an exception a route caught.
+
+    503 when MongoDB could not be reached (server selection timed out, the
+    connection dropped, the pool wait ran out), so clients and the load
+    balancer can tell an outage from a bug; 500 for anything else.
+    """
+    if isinstance(error, ConnectionFailure):
+        return jsonify({'error': 'Database unavailable, please try again shortly'}), 503
+    return jsonify({'error': f'{message}: {error}' if message else str(error)}), 500
@@ -1,11 +1,21 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
+from models.entries import JournalEntry
+from services.http_cache import bump_data_version, bumps_data_version, etag_from_data_version
+from services.journal_search import SearchError, parse_date, search_entries
+from routes.errors import error_response
 from datetime import datetime, timedelta
+import os
+import time
 
 # Temporarily disable AI service for deployment
 try:
-    from services.ai_service import get_ai_response
+    from services.ai_service import get_ai_response, detect_crisis, stream_ai_response
+    from services.journal_ai import (
+        request_ai_response, wait_for_ai_response,
+        AI_RESPONSE_PENDING, AI_RESPONSE_READY
+    )
 except ImportError:
     print("⚠️  AI service not available")
     def get_ai_response(content, mood='', user_id=None):
@@ -15,12 +25,22 @@ except ImportError:
             'ai_available': False,
             'timestamp': datetime.utcnow().isoformat()
         }
+    def detect_crisis(content):
+        return False
+    def stream_ai_response(content, mood='', user_id=None):
+        yield 'done', get_ai_response(content, mood, user_id)
+    request_ai_response = wait_for_ai_response = None
+    AI_RESPONSE_PENDING, AI_RESPONSE_READY = 'pending', 'ready'
 from bson import ObjectId
 
 journal_bp = Blueprint('journal', __name__)
 
+# Longest an SSE client waits for a pending AI response before reconnecting
+AI_RESPONSE_STREAM_TIMEOUT = int(os.getenv('JOURNAL_AI_STREAM_TIMEOUT', 60))
+
 @journal_bp.route('/entry', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def create_journal_entry():
     """Create a new journal entry"""
     try:
@@ -64,10 +84,11 @@ def create_journal_entry():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @journal_bp.route('/entries', methods=['GET'])
 @jwt_required()
+@etag_from_data_version()
 def get_journal_entries():
     """Get user's journal entries"""
     try:
@@ -123,16 +144,10 @@ def get_journal_entries():
         limit = request.args.get('limit', 10, type=int)
         skip = (page - 1) * limit
         
-        # Get journal entries
-        entries = list(db.journal_entries.find({
+        # Get journal entries, already converted to JSON types by the server
+        entries = JournalEntry.find_json(db.journal_entries, {
             'user_id': ObjectId(user_id)
-        }).sort('timestamp', -1).skip(skip).limit(limit))
-        
-        # Convert ObjectId to string for JSON serialization
-        for entry in entries:
-            entry['id'] = str(entry['_id'])
-            entry['timestamp'] = entry['timestamp'].isoformat()
-            del entry['_id']
+        }, sort=[('timestamp', -1)], skip=skip, limit=limit)
         
         # Get total count
         total_count = db.journal_entries.count_documents({'user_id': ObjectId(user_id)})
@@ -148,10 +163,60 @@ def get_journal_entries():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@journal_bp.route('/search', methods=['GET'])
+@jwt_required()
+@etag_from_data_version()
+def search_journal_entries():
+    """Search the user's journal entries by text, with optional tag, mood and date filters"""
+    try:
+        user_id = get_jwt_identity()
+        db = get_db()
+        
+        query = request.args.get('q', '')
+        page = max(request.args.get('page', 1, type=int), 1)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+        
+        # Demo mode - nothing to search
+        if db is None:
+            return jsonify({
+                'query': query,
+                'results': [],
+                'ranked': False,
+                'pagination': {'page': 1, 'limit': limit, 'total': 0, 'pages': 0}
+            }), 200
+        
+        total, results, ranked = search_entries(
+            db, user_id, query,
+            tag=request.args.get('tag'),
+            mood=request.args.get('mood'),
+            date_from=parse_date(request.args.get('from'), 'from'),
+            date_to=parse_date(request.args.get('to'), 'to'),
+            skip=(page - 1) * limit,
+            limit=limit
+        )
+        
+        return jsonify({
+            'query': query,
+            'results': results,
+            'ranked': ranked,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total,
+                'pages': (total + limit - 1) // limit
+            }
+        }), 200
+        
+    except SearchError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return error_response(e)
 
 @journal_bp.route('/entry/<entry_id>', methods=['GET'])
 @jwt_required()
+@etag_from_data_version()
 def get_journal_entry(entry_id):
     """Get a specific journal entry"""
     try:
@@ -167,19 +232,18 @@ def get_journal_entry(entry_id):
         if not entry:
             return jsonify({'error': 'Journal entry not found'}), 404
         
-        entry['id'] = str(entry['_id'])
-        entry['timestamp'] = entry['timestamp'].isoformat()
-        del entry['_id']
+        entry['id'] = entry.pop('_id')
         
         return jsonify({
             'entry': entry
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @journal_bp.route('/entry/<entry_id>', methods=['PUT'])
 @jwt_required()
+@bumps_data_version
 def update_journal_entry(entry_id):
     """Update a journal entry"""
     try:
@@ -222,10 +286,11 @@ def update_journal_entry(entry_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @journal_bp.route('/entry/<entry_id>', methods=['DELETE'])
 @jwt_required()
+@bumps_data_version
 def delete_journal_entry(entry_id):
     """Delete a journal entry"""
     try:
@@ -249,23 +314,33 @@ def delete_journal_entry(entry_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @journal_bp.route('/ai-response', methods=['POST'])
 @jwt_required()
 def get_ai_therapy_response():
-    """Get AI therapy response for journal entry"""
+    """Get AI therapy response for journal entry.
+    
+    With ``async: true`` (or ``?async=1``) and an ``entry_id`` the response is
+    generated in the background: the entry is marked pending and the request
+    returns 202 immediately. Fetch the result from the entry or listen on
+    ``/entry/<entry_id>/ai-response/events``.
+    """
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
         
-        # Validate required fields
-        if not data.get('content'):
-            return jsonify({'error': 'Journal content is required'}), 400
-        
-        content = data['content']
+        content = data.get('content')
         mood = data.get('mood', '')
         entry_id = data.get('entry_id')
+        async_mode = data.get('async') or request.args.get('async', type=int) == 1
+        
+        if async_mode:
+            return _queue_ai_response(user_id, entry_id, content, mood)
+        
+        # Validate required fields
+        if not content:
+            return jsonify({'error': 'Journal content is required'}), 400
         
         # Generate AI response
         ai_response = get_ai_response(content, mood, user_id)
@@ -275,15 +350,160 @@ def get_ai_therapy_response():
             db = get_db()
             db.journal_entries.update_one(
                 {'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)},
-                {'$set': {'ai_response': ai_response}}
+                {'$set': {'ai_response': ai_response, 'ai_response_status': AI_RESPONSE_READY}}
             )
+            bump_data_version(user_id)
         
         return jsonify({
             'ai_response': ai_response
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@journal_bp.route('/ai-response/stream', methods=['POST'])
+@jwt_required()
+def stream_ai_therapy_response():
+    """Stream the AI therapy response as server-sent events.
+    
+    Sends ``chunk`` events with pieces of the cleaned response as the model
+    produces them, then one ``ai_response`` event with the full response.
+    With an ``entry_id`` the final response is saved to the entry.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+        
+        content = data.get('content')
+        mood = data.get('mood', '')
+        entry_id = data.get('entry_id')
+        
+        if not content:
+            return jsonify({'error': 'Journal content is required'}), 400
+        
+        db = get_db()
+        if entry_id and db is not None:
+            entry = db.journal_entries.find_one(
+                {'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)},
+                {'_id': 1}
+            )
+            if not entry:
+                return jsonify({'error': 'Journal entry not found'}), 404
+        
+        def generate():
+            for event, payload in stream_ai_response(content, mood, user_id):
+                if event == 'chunk':
+                    yield _sse('chunk', {'text': payload})
+                    continue
+                
+                # Save before the final event so a client that reloads sees it
+                if entry_id and db is not None:
+                    db.journal_entries.update_one(
+                        {'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)},
+                        {'$set': {'ai_response': payload, 'ai_response_status': AI_RESPONSE_READY}}
+                    )
+                    bump_data_version(user_id)
+                yield _sse('ai_response', {'ai_response': payload})
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        return error_response(e)
+
+def _queue_ai_response(user_id, entry_id, content, mood):
+    """Queue background generation of an entry's AI response"""
+    if not entry_id:
+        return jsonify({'error': 'entry_id is required for async AI responses'}), 400
+    
+    if request_ai_response is None:
+        return jsonify({'error': 'Async AI responses are not available'}), 503
+    
+    db = get_db()
+    if db is None:
+        return jsonify({'error': 'Database not available'}), 500
+    
+    entry = db.journal_entries.find_one(
+        {'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)},
+        {'content': 1, 'ai_response_status': 1, 'ai_response_job_id': 1}
+    )
+    if not entry:
+        return jsonify({'error': 'Journal entry not found'}), 404
+    
+    # Crisis resources are returned right away, never queued behind the model
+    if detect_crisis(content or entry['content']):
+        ai_response = get_ai_response(content or entry['content'], mood, user_id)
+        db.journal_entries.update_one(
+            {'_id': entry['_id']},
+            {'$set': {'ai_response': ai_response, 'ai_response_status': AI_RESPONSE_READY}}
+        )
+        bump_data_version(user_id)
+        return jsonify({
+            'ai_response': ai_response
+        }), 200
+    
+    # Reuse the job already working on this entry
+    if entry.get('ai_response_status') == AI_RESPONSE_PENDING:
+        job_id = entry.get('ai_response_job_id')
+    else:
+        job = request_ai_response(entry['_id'], user_id, mood)
+        if job is None:
+            return jsonify({'error': 'Journal entry not found'}), 404
+        job_id = job['_id']
+        bump_data_version(user_id)
+    
+    return jsonify({
+        'message': 'AI response queued',
+        'entry_id': entry_id,
+        'ai_response_status': AI_RESPONSE_PENDING,
+        'job_id': str(job_id),
+        'events_url': f"/api/journal/entry/{entry_id}/ai-response/events"
+    }), 202
+
+@journal_bp.route('/entry/<entry_id>/ai-response/events', methods=['GET'])
+@jwt_required()
+def stream_ai_response_events(entry_id):
+    """Push the entry's AI response as a server-sent event once it is ready"""
+    user_id = get_jwt_identity()
+    
+    if wait_for_ai_response is None:
+        return jsonify({'error': 'Async AI responses are not available'}), 503
+    
+    def generate():
+        deadline = time.monotonic() + AI_RESPONSE_STREAM_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            entry = wait_for_ai_response(entry_id, user_id, timeout=min(15, max(remaining, 0)))
+            if entry is None:
+                yield _sse('error', {'error': 'Journal entry not found'})
+                return
+            status = entry.get('ai_response_status')
+            if status != AI_RESPONSE_PENDING:
+                yield _sse('ai_response', {
+                    'entry_id': entry_id,
+                    'ai_response_status': status,
+                    'ai_response': entry.get('ai_response'),
+                    'error': entry.get('ai_response_error')
+                })
+                return
+            if remaining <= 0:
+                yield _sse('timeout', {'entry_id': entry_id, 'ai_response_status': status})
+                return
+            # Keep intermediaries from closing the idle connection
+            yield ': keepalive\n\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _sse(event, data):
+    """Format a server-sent event (encoded like jsonify, so bson values are allowed)"""
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
 
 @journal_bp.route('/stats', methods=['GET'])
 @jwt_required()
@@ -340,4 +560,4 @@ def get_journal_stats():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
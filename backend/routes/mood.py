@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
 from models.user import User
+from models.entries import MoodEntry
+from services.http_cache import bumps_data_version, etag_from_data_version
+from services.bulk_import import ImportFormatError, detect_format, iter_rows, import_rows, validate_mood
+from routes.errors import error_response
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -9,6 +13,7 @@ mood_bp = Blueprint('mood', __name__)
 
 @mood_bp.route('/submit', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def submit_mood():
     """Submit a new mood entry"""
     try:
@@ -57,10 +62,35 @@ def submit_mood():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@mood_bp.route('/import', methods=['POST'])
+@jwt_required()
+@bumps_data_version
+def import_moods():
+    """Bulk import mood entries from an NDJSON or CSV upload"""
+    try:
+        user_id = get_jwt_identity()
+        db = get_db()
+        
+        if db is None:
+            return jsonify({'error': 'Importing requires a database connection'}), 503
+        
+        upload_format = detect_format(request.mimetype, request.args.get('format'))
+        result = import_rows(db.mood_entries, iter_rows(request.stream, upload_format), validate_mood, user_id)
+        
+        if result.rows == 0:
+            return jsonify({'error': 'No rows to import'}), 400
+        return jsonify(result.to_dict()), 201 if result.inserted else 400
+        
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 415
+    except Exception as e:
+        return error_response(e)
 
 @mood_bp.route('/history', methods=['GET'])
 @jwt_required()
+@etag_from_data_version(refresh_seconds=300)
 def get_mood_history():
     """Get user's mood history"""
     try:
@@ -74,17 +104,11 @@ def get_mood_history():
         # Calculate date range
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get mood entries
-        entries = list(db.mood_entries.find({
+        # Get mood entries, already converted to JSON types by the server
+        entries = MoodEntry.find_json(db.mood_entries, {
             'user_id': ObjectId(user_id),
             'timestamp': {'$gte': start_date}
-        }).sort('timestamp', -1).limit(limit))
-        
-        # Convert ObjectId to string for JSON serialization
-        for entry in entries:
-            entry['id'] = str(entry['_id'])
-            entry['timestamp'] = entry['timestamp'].isoformat()
-            del entry['_id']
+        }, sort=[('timestamp', -1)], limit=limit)
         
         # Calculate mood statistics
         stats = calculate_mood_stats(entries)
@@ -95,7 +119,7 @@ def get_mood_history():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @mood_bp.route('/current', methods=['GET'])
 @jwt_required()
@@ -130,19 +154,18 @@ def get_current_mood():
         if not entry:
             return jsonify({'message': 'No mood entries found'}), 404
         
-        entry['id'] = str(entry['_id'])
-        entry['timestamp'] = entry['timestamp'].isoformat()
-        del entry['_id']
+        entry['id'] = entry.pop('_id')
         
         return jsonify({
             'current_mood': entry
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @mood_bp.route('/trends', methods=['GET'])
 @jwt_required()
+@etag_from_data_version(refresh_seconds=300)
 def get_mood_trends():
     """Get mood trends and patterns"""
     try:
@@ -167,7 +190,7 @@ def get_mood_trends():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 def get_mood_insights(user_id, mood, intensity):
     """Generate insights based on mood submission"""
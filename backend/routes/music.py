@@ -1,18 +1,32 @@
 from flask import Blueprint, request, jsonify, redirect, session
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
-from services.spotify_service import SpotifyService
+from services.spotify_service import SpotifyService, SpotifyRateLimitError
+from services.job_queue import job_queue, serialize_job, RetryableJobError
+from services.providers import LazyProvider
+from services.http_cache import etag_from_data_version, bump_data_version, bumps_data_version
+from routes.errors import error_response
 from datetime import datetime
 from bson import ObjectId
+import hashlib
+import json
+import os
 import secrets
+import time
 
 music_bp = Blueprint('music', __name__)
 
-# Initialize Spotify service
-spotify_service = SpotifyService()
+PLAYLIST_EXPORT_JOB = 'spotify_playlist_export'
+
+# Identical export requests inside this window are treated as the same job
+PLAYLIST_EXPORT_DEDUPE_SECONDS = int(os.getenv('PLAYLIST_EXPORT_DEDUPE_SECONDS', 300))
+
+# Spotify service, created (and spotipy imported) on first use or by the warm-up thread
+spotify_service = LazyProvider('Spotify service', SpotifyService)
 
 @music_bp.route('/generate', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def generate_mood_playlist():
     """Generate a mood-based playlist using Spotify API"""
     try:
@@ -55,7 +69,7 @@ def generate_mood_playlist():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/spotify/auth', methods=['GET'])
 @jwt_required()
@@ -79,7 +93,7 @@ def spotify_auth():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/spotify/callback', methods=['GET'])
 def spotify_callback():
@@ -129,17 +143,108 @@ def spotify_callback():
         print(f"Callback error: {e}")
         return redirect(f'http://localhost:3000/music?error=callback_error')
 
+def _get_spotify_access_token(db, user_id):
+    """Return a valid Spotify access token for the user, refreshing it if expired"""
+    token_doc = db.spotify_tokens.find_one({'user_id': ObjectId(user_id)})
+    if not token_doc:
+        return None
+    
+    access_token = token_doc['access_token']
+    
+    # Check if token is expired and refresh if needed
+    if datetime.utcnow().timestamp() >= token_doc['expires_at']:
+        new_token_info = spotify_service.refresh_token(token_doc['refresh_token'])
+        
+        if not new_token_info:
+            return None
+        
+        # Update token in database
+        db.spotify_tokens.update_one(
+            {'user_id': ObjectId(user_id)},
+            {
+                '$set': {
+                    'access_token': new_token_info['access_token'],
+                    'expires_at': new_token_info['expires_at'],
+                    'updated_at': datetime.utcnow()
+                }
+            }
+        )
+        access_token = new_token_info['access_token']
+    
+    return access_token
+
+def _run_playlist_export_job(job):
+    """Job handler: generate tracks and create the playlist in the user's Spotify account"""
+    payload = job.payload
+    user_id = str(job.job['user_id'])
+    mood = payload['mood']
+    intensity = payload['intensity']
+    db = get_db()
+    
+    job.report_progress('refreshing_token', 5)
+    access_token = _get_spotify_access_token(db, user_id)
+    if not access_token:
+        raise Exception('Failed to refresh Spotify token. Please re-authenticate.')
+    
+    # Keep the generated tracks so a retry exports the same playlist
+    if 'tracks' not in job.state:
+        job.report_progress('generating_tracks', 10)
+        playlist_data = spotify_service.generate_mood_playlist(mood, intensity, payload['limit'], access_token)
+        job.save_state(tracks=playlist_data.get('tracks', []))
+    tracks = job.state['tracks']
+    
+    def on_progress(step, percent, **state_updates):
+        job.save_state(**state_updates)
+        job.report_progress(step, percent)
+    
+    try:
+        result = spotify_service.export_playlist(
+            access_token, mood, intensity, tracks,
+            state=job.state, on_progress=on_progress
+        )
+    except SpotifyRateLimitError as e:
+        raise RetryableJobError(str(e), retry_after=e.retry_after)
+    
+    # Save playlist info to database (once per job)
+    if not job.state.get('playlist_entry_id'):
+        playlist_entry = {
+            'user_id': ObjectId(user_id),
+            'mood': mood,
+            'intensity': intensity,
+            'spotify_playlist_id': result['playlist_id'],
+            'spotify_playlist_url': result['playlist_url'],
+            'playlist_name': result['playlist_name'],
+            'tracks': tracks,
+            'tracks_count': result['tracks_added'],
+            'timestamp': datetime.utcnow(),
+            'created_in_spotify': True
+        }
+        db_result = db.playlists.insert_one(playlist_entry)
+        job.save_state(playlist_entry_id=str(db_result.inserted_id))
+        bump_data_version(user_id)
+    
+    return {
+        'playlist': {
+            'id': job.state['playlist_entry_id'],
+            'spotify_id': result['playlist_id'],
+            'name': result['playlist_name'],
+            'url': result['playlist_url'],
+            'tracks_added': result['tracks_added'],
+            'mood': mood,
+            'intensity': intensity
+        }
+    }
+
+job_queue.register_handler(PLAYLIST_EXPORT_JOB, _run_playlist_export_job)
+
 @music_bp.route('/create-spotify-playlist', methods=['POST'])
 @jwt_required()
 def create_spotify_playlist():
-    """Create a playlist in user's Spotify account"""
+    """Queue creation of a playlist in user's Spotify account"""
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
         
-        print(f"Creating Spotify playlist for user: {user_id}")
-        print(f"Request data: {data}")
-        
         # Validate required fields
         if not data.get('mood'):
             return jsonify({'error': 'Mood is required'}), 400
@@ -148,8 +253,6 @@ def create_spotify_playlist():
         intensity = data.get('intensity', 5)
         limit = data.get('limit', 20)
         
-        print(f"Mood: {mood}, Intensity: {intensity}, Limit: {limit}")
-        
         # Check if Spotify service is available
         if not spotify_service.spotify_available:
             # Demo mode - simulate successful playlist creation
@@ -174,95 +277,69 @@ def create_spotify_playlist():
                 }
             }), 201
         
-        # Get user's Spotify token
         db = get_db()
         if db is None:
             return jsonify({'error': 'Database not available'}), 500
         
-        try:
-            token_doc = db.spotify_tokens.find_one({'user_id': ObjectId(user_id)})
-            print(f"Token document found: {token_doc is not None}")
-        except Exception as e:
-            print(f"Database query error: {e}")
-            return jsonify({'error': f'Database query failed: {str(e)}'}), 500
-        
-        if not token_doc:
+        # Fail fast so the client can start the OAuth flow
+        if not db.spotify_tokens.find_one({'user_id': ObjectId(user_id)}, {'_id': 1}):
             return jsonify({'error': 'Spotify not connected. Please authenticate first.'}), 401
         
-        access_token = token_doc['access_token']
-        
-        # Check if token is expired and refresh if needed
-        if datetime.utcnow().timestamp() >= token_doc['expires_at']:
-            refresh_token = token_doc['refresh_token']
-            new_token_info = spotify_service.refresh_token(refresh_token)
-            
-            if not new_token_info:
-                return jsonify({'error': 'Failed to refresh Spotify token. Please re-authenticate.'}), 401
-            
-            # Update token in database
-            db.spotify_tokens.update_one(
-                {'user_id': ObjectId(user_id)},
-                {
-                    '$set': {
-                        'access_token': new_token_info['access_token'],
-                        'expires_at': new_token_info['expires_at'],
-                        'updated_at': datetime.utcnow()
-                    }
-                }
-            )
-            access_token = new_token_info['access_token']
-        
-        # Generate playlist tracks using user's access token
-        playlist_data = spotify_service.generate_mood_playlist(mood, intensity, limit, access_token)
-        tracks = playlist_data.get('tracks', [])
-        print(f"Debug - Generated {len(tracks)} tracks from mood playlist")
-        for i, track in enumerate(tracks[:3]):  # Show first 3 tracks
-            print(f"Debug - Generated track {i}: {track.get('name')} by {track.get('artist')} (ID: {track.get('id')})")
+        payload = {'mood': mood, 'intensity': intensity, 'limit': limit}
         
-        # Create playlist in Spotify
-        result = spotify_service.create_spotify_playlist(access_token, mood, intensity, tracks)
-        
-        if not result['success']:
-            return jsonify({'error': f"Failed to create Spotify playlist: {result['error']}"}), 500
-        
-        # Save playlist info to database
-        playlist_entry = {
-            'user_id': ObjectId(user_id),
-            'mood': mood,
-            'intensity': intensity,
-            'spotify_playlist_id': result['playlist_id'],
-            'spotify_playlist_url': result['playlist_url'],
-            'playlist_name': result['playlist_name'],
-            'tracks': tracks,
-            'tracks_count': result['tracks_added'],
-            'timestamp': datetime.utcnow(),
-            'created_in_spotify': True
-        }
+        # Repeated submissions with the same key return the same job
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        if not idempotency_key:
+            window = int(time.time() // PLAYLIST_EXPORT_DEDUPE_SECONDS)
+            fingerprint = json.dumps(payload, sort_keys=True)
+            idempotency_key = hashlib.sha256(f"{fingerprint}:{window}".encode('utf-8')).hexdigest()
         
-        db_result = db.playlists.insert_one(playlist_entry)
+        job = job_queue.enqueue(
+            PLAYLIST_EXPORT_JOB,
+            payload,
+            user_id=ObjectId(user_id),
+            idempotency_key=idempotency_key
+        )
         
         return jsonify({
-            'message': 'Spotify playlist created successfully!',
-            'playlist': {
-                'id': str(db_result.inserted_id),
-                'spotify_id': result['playlist_id'],
-                'name': result['playlist_name'],
-                'url': result['playlist_url'],
-                'tracks_added': result['tracks_added'],
-                'mood': mood,
-                'intensity': intensity
-            }
-        }), 201
+            'message': 'Spotify playlist creation queued',
+            'job_id': str(job['_id']),
+            'status': job['status'],
+            'status_url': f"/api/music/jobs/{job['_id']}"
+        }), 202
         
     except Exception as e:
         print(f"Create playlist error: {e}")
         print(f"Error type: {type(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+        return error_response(e, 'Internal server error')
+
+@music_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    """Get status and progress of a background music job"""
+    try:
+        user_id = get_jwt_identity()
+        
+        if not ObjectId.is_valid(job_id):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        job = job_queue.get_job(ObjectId(job_id), user_id=ObjectId(user_id))
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify({
+            'job': serialize_job(job)
+        }), 200
+        
+    except Exception as e:
+        return error_response(e)
 
 @music_bp.route('/playlists', methods=['GET'])
 @jwt_required()
+@etag_from_data_version()
 def get_user_playlists():
     """Get user's generated playlists"""
     try:
@@ -336,22 +413,15 @@ def get_user_playlists():
         limit = request.args.get('limit', 10, type=int)
         skip = (page - 1) * limit
         
-        # Get playlists
+        # Get playlists as plain dicts: their nested tracks dominate the page, so
+        # converting ids and dates on the server saves nothing measurable here
         playlists = list(db.playlists.find({
             'user_id': ObjectId(user_id)
         }).sort('timestamp', -1).skip(skip).limit(limit))
         
-        # Convert ObjectId to string for JSON serialization
+        # ObjectId and datetime values are encoded by the app's JSON provider
         for playlist in playlists:
-            playlist['id'] = str(playlist['_id'])
-            playlist['timestamp'] = playlist['timestamp'].isoformat()
-            # Convert user_id ObjectId to string if present
-            if 'user_id' in playlist:
-                playlist['user_id'] = str(playlist['user_id'])
-            # Convert any other ObjectIds that might be present
-            if 'mood_entry_id' in playlist:
-                playlist['mood_entry_id'] = str(playlist['mood_entry_id'])
-            del playlist['_id']
+            playlist['id'] = playlist.pop('_id')
         
         # Get total count
         total_count = db.playlists.count_documents({'user_id': ObjectId(user_id)})
@@ -371,10 +441,11 @@ def get_user_playlists():
         print(f"Error type: {type(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({'error': f'Failed to get playlists: {str(e)}'}), 500
+        return error_response(e, 'Failed to get playlists')
 
 @music_bp.route('/playlist/<playlist_id>', methods=['GET'])
 @jwt_required()
+@etag_from_data_version()
 def get_playlist(playlist_id):
     """Get a specific playlist"""
     try:
@@ -390,16 +461,14 @@ def get_playlist(playlist_id):
         if not playlist:
             return jsonify({'error': 'Playlist not found'}), 404
         
-        playlist['id'] = str(playlist['_id'])
-        playlist['timestamp'] = playlist['timestamp'].isoformat()
-        del playlist['_id']
+        playlist['id'] = playlist.pop('_id')
         
         return jsonify({
             'playlist': playlist
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/search', methods=['GET'])
 @jwt_required()
@@ -420,7 +489,7 @@ def search_tracks():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/genres', methods=['GET'])
 @jwt_required()
@@ -434,7 +503,7 @@ def get_available_genres():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/recommendations', methods=['GET'])
 @jwt_required()
@@ -464,10 +533,11 @@ def get_track_recommendations():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/favorites', methods=['GET'])
 @jwt_required()
+@etag_from_data_version()
 def get_user_favorites():
     """Get user's favorite tracks"""
     try:
@@ -479,21 +549,20 @@ def get_user_favorites():
             'user_id': ObjectId(user_id)
         }).sort('added_at', -1))
         
-        # Convert ObjectId to string for JSON serialization
+        # ObjectId and datetime values are encoded by the app's JSON provider
         for favorite in favorites:
-            favorite['id'] = str(favorite['_id'])
-            favorite['added_at'] = favorite['added_at'].isoformat()
-            del favorite['_id']
+            favorite['id'] = favorite.pop('_id')
         
         return jsonify({
             'favorites': favorites
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/favorites', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def add_favorite_track():
     """Add a track to user's favorites"""
     try:
@@ -542,10 +611,11 @@ def add_favorite_track():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/favorites/<track_id>', methods=['DELETE'])
 @jwt_required()
+@bumps_data_version
 def remove_favorite_track(track_id):
     """Remove a track from user's favorites"""
     try:
@@ -566,7 +636,7 @@ def remove_favorite_track(track_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @music_bp.route('/stats', methods=['GET'])
 @jwt_required()
@@ -605,4 +675,4 @@ def get_music_stats():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
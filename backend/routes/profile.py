@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
 from models.user import User
+from services.http_cache import bumps_data_version, etag_from_data_version
+from services.data_export import ExportError, resume_plan, export_ndjson, export_zip
+from services.bulk_import import ImportFormatError, detect_format, iter_rows, import_rows, validate_biometric
+from routes.errors import error_response
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -9,6 +13,7 @@ profile_bp = Blueprint('profile', __name__)
 
 @profile_bp.route('/update', methods=['PUT'])
 @jwt_required()
+@bumps_data_version
 def update_profile():
     """Update user profile information"""
     try:
@@ -47,10 +52,11 @@ def update_profile():
             return jsonify({'error': 'Failed to update profile'}), 500
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @profile_bp.route('/biometrics', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def log_biometrics():
     """Log biometric data"""
     try:
@@ -95,7 +101,48 @@ def log_biometrics():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@profile_bp.route('/biometrics/import', methods=['POST'])
+@jwt_required()
+@bumps_data_version
+def import_biometrics():
+    """Bulk import biometric readings from an NDJSON or CSV upload"""
+    try:
+        user_id = get_jwt_identity()
+        db = get_db()
+        
+        if db is None:
+            return jsonify({'error': 'Importing requires a database connection'}), 503
+        
+        upload_format = detect_format(request.mimetype, request.args.get('format'))
+        
+        # Historical uploads only replace the current biometrics if they are the newest readings
+        previous = db.biometrics.find_one(
+            {'user_id': ObjectId(user_id)}, {'timestamp': 1}, sort=[('timestamp', -1)]
+        )
+        result = import_rows(db.biometrics, iter_rows(request.stream, upload_format), validate_biometric, user_id)
+        
+        if result.rows == 0:
+            return jsonify({'error': 'No rows to import'}), 400
+        
+        latest = result.latest
+        if latest and (previous is None or latest['timestamp'] >= previous['timestamp']):
+            db.users.update_one(
+                {'_id': ObjectId(user_id)},
+                {'$set': {
+                    'biometrics.heart_rate': latest['heart_rate'],
+                    'biometrics.sleep_hours': latest['sleep_hours'],
+                    'biometrics.exercise_minutes': latest['exercise_minutes']
+                }}
+            )
+        
+        return jsonify(result.to_dict()), 201 if result.inserted else 400
+        
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 415
+    except Exception as e:
+        return error_response(e)
 
 @profile_bp.route('/biometrics', methods=['GET'])
 @jwt_required()
@@ -133,10 +180,11 @@ def get_biometrics_history():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @profile_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@etag_from_data_version(refresh_seconds=300)
 def get_user_stats():
     """Get comprehensive user statistics"""
     try:
@@ -259,7 +307,60 @@ def get_user_stats():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
+
+@profile_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_user_data():
+    """Stream the user's full history as NDJSON or a zip archive.
+
+    Resume an interrupted NDJSON download with ?after_collection=<collection>&after_id=<id>
+    taken from the last line received.
+    """
+    try:
+        user_id = get_jwt_identity()
+        db = get_db()
+        
+        if db is None:
+            return jsonify({'error': 'Data export requires a database connection'}), 503
+        
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'zip'):
+            return jsonify({'error': "format must be 'ndjson' or 'zip'"}), 400
+        
+        after_collection = request.args.get('after_collection')
+        plan = resume_plan(after_collection, request.args.get('after_id'))
+        
+        # The profile is only sent on a fresh export
+        profile = None
+        if after_collection is None:
+            user = User.find_by_id(user_id)
+            if not user:
+                return jsonify({'error': 'User not found'}), 404
+            profile = user.to_dict()
+        
+        stamp = datetime.utcnow().strftime('%Y%m%d')
+        if export_format == 'zip':
+            body = export_zip(db, current_app.json, user_id, profile, plan)
+            mimetype, filename = 'application/zip', f'mindful-harmony-export-{stamp}.zip'
+        else:
+            body = export_ndjson(db, current_app.json, user_id, profile, plan)
+            mimetype, filename = 'application/x-ndjson', f'mindful-harmony-export-{stamp}.ndjson'
+        
+        return Response(
+            body,
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except ExportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return error_response(e)
 
 @profile_bp.route('/insights', methods=['GET'])
 @jwt_required()
@@ -303,7 +404,7 @@ def get_user_insights():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 def calculate_biometric_stats(entries):
     """Calculate biometric statistics"""
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.database import get_db
 from models.user import User
+from services.http_cache import bump_data_version, bumps_data_version
+from routes.errors import error_response
 from datetime import datetime, timedelta
 from bson import ObjectId
 
@@ -9,6 +11,7 @@ social_bp = Blueprint('social', __name__)
 
 @social_bp.route('/friend-request', methods=['POST'])
 @jwt_required()
+@bumps_data_version
 def send_friend_request():
     """Send a friend request using friend code"""
     try:
@@ -54,6 +57,7 @@ def send_friend_request():
         }
         
         result = db.friend_connections.insert_one(connection)
+        bump_data_version(friend._id)
         
         return jsonify({
             'message': f'Successfully connected with {friend.name}',
@@ -66,7 +70,7 @@ def send_friend_request():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/friends', methods=['GET'])
 @jwt_required()
@@ -149,14 +153,14 @@ def get_friends_list():
                 )
                 
                 friend_data = {
-                    'id': str(friend._id),
+                    'id': friend._id,
                     'name': friend.name,
                     'username': friend.username,
                     'profile_pic': friend.profile_pic,
                     'current_mood': current_mood.get('mood', 'unknown') if current_mood else 'unknown',
                     'mood_intensity': current_mood.get('intensity', 5) if current_mood else 5,
-                    'last_mood_update': current_mood.get('timestamp', '').isoformat() if current_mood else None,
-                    'connection_date': connection['created_at'].isoformat()
+                    'last_mood_update': current_mood.get('timestamp') if current_mood else None,
+                    'connection_date': connection['created_at']
                 }
                 friends.append(friend_data)
         
@@ -166,7 +170,7 @@ def get_friends_list():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/nudge', methods=['POST'])
 @jwt_required()
@@ -222,7 +226,7 @@ def send_supportive_nudge():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/nudges', methods=['GET'])
 @jwt_required()
@@ -289,14 +293,12 @@ def get_received_nudges():
         for nudge in nudges:
             sender = User.find_by_id(str(nudge['from_user_id']))
             nudge['sender'] = {
-                'id': str(sender._id),
+                'id': sender._id,
                 'name': sender.name,
                 'username': sender.username,
                 'profile_pic': sender.profile_pic
             } if sender else None
-            nudge['id'] = str(nudge['_id'])
-            nudge['timestamp'] = nudge['timestamp'].isoformat()
-            del nudge['_id']
+            nudge['id'] = nudge.pop('_id')
         
         return jsonify({
             'nudges': nudges,
@@ -304,7 +306,7 @@ def get_received_nudges():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/nudge/<nudge_id>/read', methods=['PUT'])
 @jwt_required()
@@ -331,7 +333,7 @@ def mark_nudge_as_read(nudge_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/mood-share', methods=['POST'])
 @jwt_required()
@@ -408,7 +410,7 @@ def share_mood_with_friends():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/shared-moods', methods=['GET'])
 @jwt_required()
@@ -430,14 +432,12 @@ def get_shared_moods():
         for shared_mood in shared_moods:
             sender = User.find_by_id(str(shared_mood['from_user_id']))
             shared_mood['sender'] = {
-                'id': str(sender._id),
+                'id': sender._id,
                 'name': sender.name,
                 'username': sender.username,
                 'profile_pic': sender.profile_pic
             } if sender else None
-            shared_mood['id'] = str(shared_mood['_id'])
-            shared_mood['timestamp'] = shared_mood['timestamp'].isoformat()
-            del shared_mood['_id']
+            shared_mood['id'] = shared_mood.pop('_id')
         
         return jsonify({
             'shared_moods': shared_moods,
@@ -445,10 +445,11 @@ def get_shared_moods():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/friend/<friend_id>/remove', methods=['DELETE'])
 @jwt_required()
+@bumps_data_version
 def remove_friend(friend_id):
     """Remove a friend connection"""
     try:
@@ -466,12 +467,14 @@ def remove_friend(friend_id):
         if result.deleted_count == 0:
             return jsonify({'error': 'Friend connection not found'}), 404
         
+        bump_data_version(friend_id)
+        
         return jsonify({
             'message': 'Friend removed successfully'
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 # Vent Wall Endpoints
 
@@ -553,7 +556,7 @@ def create_vent_post():
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent', methods=['GET'])
 @jwt_required()
@@ -638,7 +641,7 @@ def get_vent_posts():
         if tag_filter:
             query['tags'] = tag_filter
         
-        # Get vent posts
+        # Get vent posts; plain dicts, as each is reshaped into a new dict below
         posts = list(db.vent_posts.find(query)
                     .sort('timestamp', -1)
                     .limit(limit))
@@ -668,11 +671,11 @@ def get_vent_posts():
                 relative_time = "Just now"
             
             processed_posts.append({
-                'id': str(post['_id']),
+                'id': post['_id'],
                 'content': post['content'],
                 'mood': post['mood'],
                 'tags': post['tags'],
-                'timestamp': post['timestamp'].isoformat(),
+                'timestamp': post['timestamp'],
                 'reactions': reactions,
                 'reaction_count': sum(reactions.values()),
                 'user_reaction': user_reaction,
@@ -686,7 +689,7 @@ def get_vent_posts():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/<post_id>/react', methods=['POST'])
 @jwt_required()
@@ -731,7 +734,7 @@ def react_to_vent_post(post_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/<post_id>/react', methods=['DELETE'])
 @jwt_required()
@@ -761,7 +764,7 @@ def remove_vent_reaction(post_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/stats', methods=['GET'])
 @jwt_required()
@@ -834,7 +837,7 @@ def get_vent_stats():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 # Comment Endpoints
 
@@ -900,7 +903,7 @@ def create_comment(post_id):
         }), 201
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/<post_id>/comments', methods=['GET'])
 @jwt_required()
@@ -970,9 +973,9 @@ def get_comments(post_id):
                 relative_time = "Just now"
             
             processed_comments.append({
-                'id': str(comment['_id']),
+                'id': comment['_id'],
                 'content': comment['content'],
-                'timestamp': comment['timestamp'].isoformat(),
+                'timestamp': comment['timestamp'],
                 'relative_time': relative_time,
                 'is_anonymous': True,  # Always anonymous for privacy
                 'can_delete': str(comment['user_id']) == str(user_id)  # User can only delete their own comments
@@ -984,7 +987,7 @@ def get_comments(post_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/comments/<comment_id>', methods=['DELETE'])
 @jwt_required()
@@ -1018,7 +1021,7 @@ def delete_comment(comment_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 @social_bp.route('/vent/<post_id>', methods=['DELETE'])
 @jwt_required()
@@ -1061,7 +1064,7 @@ def delete_vent_post(post_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
 
 # Mood Heatmap Endpoint
 
@@ -1140,4 +1143,4 @@ def get_mood_heatmap():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return error_response(e)
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class InferenceUnavailable(Exception):
+    """Raised when an inference call cannot produce a result; callers fall back"""
+
+
+class InferenceOverloaded(InferenceUnavailable):
+    """Raised when the gateway queue is full and the call is shed"""
+
+
+class InferenceTimeout(InferenceUnavailable):
+    """Raised when an inference call misses its deadline"""
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def prompt_cache_key(prompt):
+    """Hash a prompt after normalizing whitespace so trivially different prompts share a key"""
+    normalized = _WHITESPACE_RE.sub(' ', prompt).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InferenceGateway:
+    """Bounded worker pool in front of the LLM with deadlines, load shedding and caching.
+
+    Request threads never call the model directly: they submit to a small pool and
+    wait at most ``timeout`` seconds. When more than ``max_queue_depth`` calls are
+    already waiting, new calls are rejected immediately so the caller can serve its
+    fallback response instead of tying up a web worker.
+    """
+
+    def __init__(self, generate_fn, max_workers=None, max_queue_depth=None,
+                 timeout=None, cache_size=None, cache_ttl=None, stream_fn=None):
+        self.generate_fn = generate_fn
+        self.stream_fn = stream_fn
+        self.max_workers = max_workers or int(os.getenv('AI_MAX_CONCURRENCY', 4))
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else int(os.getenv('AI_MAX_QUEUE_DEPTH', 8))
+        self.timeout = timeout or float(os.getenv('AI_TIMEOUT_SECONDS', 20))
+        self.cache = ResponseCache(
+            cache_size if cache_size is not None else int(os.getenv('AI_CACHE_SIZE', 512)),
+            cache_ttl or int(os.getenv('AI_CACHE_TTL_SECONDS', 3600))
+        )
+
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._inflight = {}
+        self._stats = {
+            'calls': 0,
+            'cache_hits': 0,
+            'coalesced': 0,
+            'shed': 0,
+            'timeouts': 0,
+            'errors': 0
+        }
+
+    def _get_executor(self):
+        # Executor threads do not survive a fork, so build one per process
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='ai-inference'
+            )
+            self._executor_pid = os.getpid()
+            self._pending = 0
+            self._inflight = {}
+        return self._executor
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _run(self, key, prompt, use_cache):
+        try:
+            text = self.generate_fn(prompt)
+            # Cache here rather than in the caller so results that miss
+            # their deadline still serve the next identical request
+            if use_cache and text:
+                self.cache.set(key, text)
+            return text
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._inflight.pop(key, None)
+
+    def generate(self, prompt, timeout=None, use_cache=True):
+        """Return the model's text for a prompt, or raise InferenceUnavailable"""
+        key = prompt_cache_key(prompt)
+        self._count('calls')
+
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count('cache_hits')
+                return cached
+
+        with self._lock:
+            executor = self._get_executor()
+            future = self._inflight.get(key)
+            if future is not None:
+                # Identical prompt already running: share its result
+                self._stats['coalesced'] += 1
+            elif self._pending >= self.max_workers + self.max_queue_depth:
+                self._stats['shed'] += 1
+                raise InferenceOverloaded('AI inference queue is full')
+            else:
+                self._pending += 1
+                future = executor.submit(self._run, key, prompt, use_cache)
+                self._inflight[key] = future
+
+        try:
+            text = future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise InferenceTimeout('AI inference timed out')
+        except InferenceUnavailable:
+            raise
+        except Exception as e:
+            self._count('errors')
+            raise InferenceUnavailable(str(e)) from e
+
+        return text
+
+    def _run_stream(self, key, prompt, use_cache, chunks, cancelled):
+        try:
+            stream = self.stream_fn(prompt) if self.stream_fn else [self.generate_fn(prompt)]
+            parts = []
+            for text in stream:
+                if cancelled.is_set():
+                    return
+                if text:
+                    parts.append(text)
+                    chunks.put(('chunk', text))
+            if use_cache and parts:
+                self.cache.set(key, ''.join(parts))
+            chunks.put(('done', None))
+        except Exception as e:
+            chunks.put(('error', e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def generate_stream(self, prompt, timeout=None, use_cache=True):
+        """Yield the model's text for a prompt in chunks as they arrive.
+
+        Uses the same worker pool, load shedding and cache as ``generate``. The
+        timeout bounds the wait for the first chunk and each gap between chunks,
+        not the whole stream, so a long but steady response is never cut off.
+        Closing the generator early stops the worker at its next chunk.
+        """
+        key = prompt_cache_key(prompt)
+        self._count('calls')
+
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count('cache_hits')
+                yield cached
+                return
+
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                self._stats['shed'] += 1
+                raise InferenceOverloaded('AI inference queue is full')
+            self._pending += 1
+            chunks = queue.Queue()
+            cancelled = threading.Event()
+            executor.submit(self._run_stream, key, prompt, use_cache, chunks, cancelled)
+
+        chunk_timeout = timeout or self.timeout
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=chunk_timeout)
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise InferenceTimeout('AI inference timed out')
+                if kind == 'done':
+                    return
+                if kind == 'error':
+                    if isinstance(value, InferenceUnavailable):
+                        raise value
+                    self._count('errors')
+                    raise InferenceUnavailable(str(value)) from value
+                yield value
+        finally:
+            cancelled.set()
+
+    def stats(self):
+        """Snapshot of gateway counters and current load"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['cache_entries'] = len(self.cache)
+        stats['max_workers'] = self.max_workers
+        stats['max_queue_depth'] = self.max_queue_depth
+        return stats
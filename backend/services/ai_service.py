@@ -2,30 +2,61 @@ import os
 from datetime import datetime
 import re
 
-# Optional AI import - graceful fallback if not available
-AI_AVAILABLE = False
-model = None
-genai = None
+from services.ai_gateway import InferenceGateway, InferenceUnavailable
+from services.crisis_matcher import KeywordMatcher
+from services.response_cleaner import clean_response, ResponseCleaner
+from services import sentiment_lexicon
+from services.providers import LazyProvider
 
-try:
-    import google.generativeai as genai
-    
-    # Configure Gemini API
+# Optional AI import - graceful fallback if not available
+def _create_model():
+    """Import and configure the Gemini SDK, returning the model or None if AI is unavailable"""
     api_key = os.getenv('GEMINI_API_KEY')
-    if api_key:
+    if not api_key:
+        print("⚠️  GEMINI_API_KEY not provided - AI features will be disabled")
+        return None
+    
+    try:
+        import google.generativeai as genai
+        
+        # Configure Gemini API
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-pro')
-        AI_AVAILABLE = True
         print("✅ AI service initialized successfully")
-    else:
-        print("⚠️  GEMINI_API_KEY not provided - AI features will be disabled")
+        return model
         
-except ImportError as e:
-    print(f"⚠️  google-generativeai not available: {e}")
-    print("⚠️  AI features will be disabled")
-except Exception as e:
-    print(f"⚠️  Failed to initialize AI service: {e}")
-    print("⚠️  AI features will be disabled")
+    except ImportError as e:
+        print(f"⚠️  google-generativeai not available: {e}")
+        print("⚠️  AI features will be disabled")
+    except Exception as e:
+        print(f"⚠️  Failed to initialize AI service: {e}")
+        print("⚠️  AI features will be disabled")
+    return None
+
+# The SDK loads on first use or in the warm-up thread, not when the routes are imported
+gemini_model = LazyProvider('Gemini model', _create_model)
+
+def ai_available():
+    """Whether the model is configured (loads the SDK if it has not been loaded yet)"""
+    return gemini_model.get() is not None
+
+def _generate_text(prompt):
+    """Call the Gemini model and return the response text"""
+    model = gemini_model.get()
+    if model is None:
+        raise InferenceUnavailable('AI model not configured')
+    return model.generate_content(prompt).text
+
+def _stream_text(prompt):
+    """Call the Gemini model with streaming and yield text chunks as they arrive"""
+    model = gemini_model.get()
+    if model is None:
+        raise InferenceUnavailable('AI model not configured')
+    for chunk in model.generate_content(prompt, stream=True):
+        yield chunk.text
+
+# All model calls go through the gateway so a slow LLM cannot tie up web workers
+gateway = InferenceGateway(_generate_text, stream_fn=_stream_text)
 
 # Crisis detection keywords
 CRISIS_KEYWORDS = [
@@ -34,6 +65,9 @@ CRISIS_KEYWORDS = [
     'hopeless', 'helpless', 'worthless', 'burden', 'everyone would be better off'
 ]
 
+# Built once at import; matches all keywords in a single pass over the text
+crisis_matcher = KeywordMatcher(CRISIS_KEYWORDS)
+
 # Crisis hotline information
 CRISIS_RESOURCES = {
     'message': 'If you\'re having thoughts of self-harm or suicide, please know that help is available 24/7:',
@@ -47,13 +81,7 @@ CRISIS_RESOURCES = {
 
 def detect_crisis(content):
     """Detect crisis indicators in text"""
-    content_lower = content.lower()
-    
-    for keyword in CRISIS_KEYWORDS:
-        if keyword in content_lower:
-            return True
-    
-    return False
+    return crisis_matcher.contains_any(content)
 
 def get_ai_response(content, mood='', user_id=None):
     """Generate empathetic AI response for journal entry"""
@@ -68,7 +96,7 @@ def get_ai_response(content, mood='', user_id=None):
             }
         
         # Check if AI is available
-        if not AI_AVAILABLE or model is None:
+        if not ai_available():
             return {
                 'response': "Thank you for sharing your thoughts. While our AI assistant is currently unavailable, please know that your feelings are valid and important. Consider reaching out to a trusted friend, family member, or mental health professional if you need support.",
                 'is_crisis': False,
@@ -80,10 +108,10 @@ def get_ai_response(content, mood='', user_id=None):
         prompt = create_therapy_prompt(content, mood)
         
         # Generate response
-        response = model.generate_content(prompt)
+        response_text = gateway.generate(prompt)
         
         # Clean and format response
-        ai_response = clean_response(response.text)
+        ai_response = clean_response(response_text)
         
         return {
             'response': ai_response,
@@ -100,6 +128,45 @@ def get_ai_response(content, mood='', user_id=None):
             'error': str(e)
         }
 
+def stream_ai_response(content, mood='', user_id=None):
+    """Stream the AI response for a journal entry.
+
+    Yields ``('chunk', text)`` for each cleaned piece of the response and ends
+    with ``('done', response)``, where ``response`` has the same shape as
+    get_ai_response's result and holds the full text.
+    """
+    # Crisis resources and the unavailable message never touch the model
+    if detect_crisis(content) or not ai_available():
+        yield 'done', get_ai_response(content, mood, user_id)
+        return
+
+    cleaner = ResponseCleaner()
+    pieces = []
+    try:
+        for text in gateway.generate_stream(create_therapy_prompt(content, mood)):
+            cleaned = cleaner.feed(text)
+            if cleaned:
+                pieces.append(cleaned)
+                yield 'chunk', cleaned
+        cleaned = cleaner.finish()
+        if cleaned:
+            pieces.append(cleaned)
+            yield 'chunk', cleaned
+    except Exception as e:
+        yield 'done', {
+            'response': "Thank you for sharing your thoughts. I'm here to listen and support you. Remember that your feelings are valid and it's okay to not be okay sometimes.",
+            'is_crisis': False,
+            'timestamp': datetime.utcnow().isoformat(),
+            'error': str(e)
+        }
+        return
+
+    yield 'done', {
+        'response': ''.join(pieces),
+        'is_crisis': False,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
 def create_therapy_prompt(content, mood):
     """Create a therapeutic prompt for the AI"""
     
@@ -128,22 +195,15 @@ Response:"""
 
     return base_prompt
 
-def clean_response(response_text):
-    """Clean and format AI response"""
-    # Remove any markdown formatting
-    cleaned = re.sub(r'\*\*(.*?)\*\*', r'\1', response_text)
-    cleaned = re.sub(r'\*(.*?)\*', r'\1', cleaned)
-    cleaned = re.sub(r'`(.*?)`', r'\1', cleaned)
-    
-    # Remove extra whitespace
-    cleaned = re.sub(r'\n+', ' ', cleaned)
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    cleaned = cleaned.strip()
-    
-    return cleaned
+# Lexicon results at or above this confidence are returned without calling the model
+SENTIMENT_LOCAL_CONFIDENCE = float(os.getenv('SENTIMENT_LOCAL_CONFIDENCE', 0.6))
 
 def analyze_sentiment(content):
-    """Analyze sentiment of text content"""
+    """Analyze sentiment of text content, using the model only when the lexicon is unsure"""
+    local_result = sentiment_lexicon.score(content)
+    if local_result['confidence'] >= SENTIMENT_LOCAL_CONFIDENCE or not ai_available():
+        return local_result
+
     try:
         prompt = f"""
 Analyze the sentiment of this text and provide a brief assessment:
@@ -165,34 +225,94 @@ Format as JSON:
 }}
 """
         
-        response = model.generate_content(prompt)
+        response_text = gateway.generate(prompt)
         
         # Try to parse JSON response
         import json
         try:
-            result = json.loads(response.text)
+            result = json.loads(response_text)
             return result
         except:
-            # Fallback if JSON parsing fails
-            return {
-                'sentiment': 'neutral',
-                'intensity': 5,
-                'emotions': ['neutral'],
-                'explanation': 'Unable to analyze sentiment'
-            }
+            # Fallback to the lexicon result if JSON parsing fails
+            return local_result
             
     except Exception as e:
-        return {
-            'sentiment': 'neutral',
-            'intensity': 5,
-            'emotions': ['neutral'],
-            'explanation': f'Error analyzing sentiment: {str(e)}'
-        }
+        print(f"⚠️  Sentiment model call failed, using lexicon result: {e}")
+        return local_result
+
+SENTIMENT_VALUES = ('positive', 'negative', 'neutral', 'mixed')
+
+def analyze_sentiment_batch(items):
+    """Analyze sentiment of several texts with a single model call.
+    
+    ``items`` is a list of ``(item_id, text)`` pairs. Returns a dict mapping
+    each item_id to its result (same schema as analyze_sentiment); items the
+    model skipped or answered malformed are left out so callers can retry them.
+    Raises InferenceUnavailable if the call itself fails.
+    """
+    import json
+    
+    numbered = "\n".join(
+        f"[{index}] {json.dumps(text)}" for index, (_, text) in enumerate(items)
+    )
+    prompt = f"""
+Analyze the sentiment of each numbered text below. Judge each text independently.
+
+{numbered}
+
+For every text provide:
+1. Overall sentiment (positive, negative, neutral, mixed)
+2. Emotional intensity (1-10 scale)
+3. Key emotions detected
+4. Brief explanation
+
+Respond with only a JSON array containing one object per text:
+[
+    {{
+        "index": 0,
+        "sentiment": "positive/negative/neutral/mixed",
+        "intensity": 1-10,
+        "emotions": ["emotion1", "emotion2"],
+        "explanation": "brief explanation"
+    }}
+]
+"""
+    
+    response_text = gateway.generate(prompt, timeout=60)
+    
+    # Models sometimes wrap JSON in a markdown code fence
+    response_text = re.sub(r'^```(?:json)?\s*|\s*```$', '', response_text.strip())
+    try:
+        parsed = json.loads(response_text)
+    except ValueError:
+        return {}
+    
+    results = {}
+    for result in parsed if isinstance(parsed, list) else []:
+        try:
+            index = int(result['index'])
+            if not 0 <= index < len(items) or result['sentiment'] not in SENTIMENT_VALUES:
+                continue
+            results[items[index][0]] = {
+                'sentiment': result['sentiment'],
+                'intensity': max(1, min(10, int(result['intensity']))),
+                'emotions': [str(emotion) for emotion in result.get('emotions', [])],
+                'explanation': str(result.get('explanation', ''))
+            }
+        except (KeyError, TypeError, ValueError):
+            continue
+    return results
 
 def generate_activity_suggestions(mood, intensity=5):
     """Generate activity suggestions based on mood"""
     try:
-        prompt = f"""
+        return request_activity_suggestions(mood, intensity)
+    except Exception as e:
+        return get_fallback_activities(mood)
+
+def request_activity_suggestions(mood, intensity=5, use_cache=True):
+    """Ask the model for activity suggestions, raising if no usable answer comes back"""
+    prompt = f"""
 Based on the user's mood and intensity, suggest 3-5 short, simple activities that could help:
 
 Mood: {mood}
@@ -216,19 +336,15 @@ Format as JSON:
     ]
 }}
 """
-        
-        response = model.generate_content(prompt)
-        
-        import json
-        try:
-            result = json.loads(response.text)
-            return result.get('activities', [])
-        except:
-            # Fallback suggestions
-            return get_fallback_activities(mood)
-            
-    except Exception as e:
-        return get_fallback_activities(mood)
+    
+    response_text = gateway.generate(prompt, use_cache=use_cache)
+    
+    import json
+    result = json.loads(response_text)
+    activities = result.get('activities', [])
+    if not activities:
+        raise ValueError('Model returned no activities')
+    return activities
 
 def get_fallback_activities(mood):
     """Fallback activity suggestions"""
@@ -0,0 +1,230 @@
+"""
+Bulk import of historical mood and biometric records.
+
+The request body is read line by line as NDJSON (one JSON object per line) or
+CSV with a header row, so a large upload is never held in memory at once.
+Rows are validated and written in chunks with unordered ``insert_many``; a
+row that fails validation or insertion is reported with its row number and
+the rest of the upload still goes in.
+"""
+
+import csv
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 1000))
+IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', 50000))
+# Errors listed in the response; the total is always reported
+IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', 100))
+
+NDJSON_TYPES = {'application/x-ndjson', 'application/jsonl', 'application/json-lines', 'application/jsonlines'}
+CSV_TYPES = {'text/csv', 'application/csv'}
+
+# Timestamps may lag a little behind the server clock, but not lie in the future
+MAX_CLOCK_SKEW = timedelta(days=1)
+
+
+class ImportFormatError(ValueError):
+    """Raised when the upload format cannot be determined"""
+
+
+class RowError(ValueError):
+    """Raised by a validator for a row that cannot be imported"""
+
+
+def detect_format(mimetype, requested=None):
+    """'ndjson' or 'csv' from ?format= or the Content-Type"""
+    if requested:
+        if requested not in ('ndjson', 'csv'):
+            raise ImportFormatError("format must be 'ndjson' or 'csv'")
+        return requested
+    if mimetype in NDJSON_TYPES:
+        return 'ndjson'
+    if mimetype in CSV_TYPES:
+        return 'csv'
+    raise ImportFormatError('Send NDJSON (application/x-ndjson) or CSV (text/csv), or pass ?format=')
+
+
+def iter_rows(stream, upload_format):
+    """(row number, record or RowError) for each data row of the upload"""
+    lines = (line.decode('utf-8-sig') if isinstance(line, bytes) else line for line in stream)
+    if upload_format == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # The header is line 1; a quoted field may span lines, so use the reader's count
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, RowError(f'Invalid JSON: {e}')
+            continue
+        yield number, record if isinstance(record, dict) else RowError('Each line must be a JSON object')
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _number(record, field, low, high, integer=False):
+    value = record.get(field)
+    if _blank(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} must be a number')
+    if math.isnan(number) or not low <= number <= high:
+        raise RowError(f'{field} must be between {low} and {high}')
+    if number.is_integer():
+        return int(number)
+    if integer:
+        raise RowError(f'{field} must be a whole number')
+    return number
+
+
+def _timestamp(record, now):
+    value = record.get('timestamp')
+    if _blank(value):
+        return now
+    try:
+        # fromisoformat before Python 3.11 does not take a trailing Z
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00')) if isinstance(value, str) else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise RowError('timestamp must be an ISO 8601 date')
+    if parsed.tzinfo is not None:
+        # Stored like every other timestamp in the app: naive UTC
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if parsed > now + MAX_CLOCK_SKEW:
+        raise RowError('timestamp is in the future')
+    return parsed
+
+
+def _text(record, field, max_length=2000):
+    value = record.get(field)
+    if _blank(value):
+        return ''
+    if not isinstance(value, str):
+        raise RowError(f'{field} must be text')
+    return value[:max_length]
+
+
+def validate_mood(record, user_id, now):
+    """A mood_entries document, as /api/mood/submit would store it"""
+    mood = record.get('mood')
+    if _blank(mood) or not isinstance(mood, str):
+        raise RowError('mood is required')
+    intensity = _number(record, 'intensity', 1, 10, integer=True)
+    activities = record.get('activities') or []
+    if isinstance(activities, str):
+        # CSV cells list activities separated by semicolons
+        activities = [item.strip() for item in activities.split(';') if item.strip()]
+    if not isinstance(activities, list):
+        raise RowError('activities must be a list')
+    return {
+        'user_id': user_id,
+        'mood': mood.strip().lower(),
+        'intensity': 5 if intensity is None else intensity,
+        'notes': _text(record, 'notes'),
+        'timestamp': _timestamp(record, now),
+        'activities': activities,
+        'weather': _text(record, 'weather', 200),
+        'location': _text(record, 'location', 200),
+        'imported': True
+    }
+
+
+def validate_biometric(record, user_id, now):
+    """A biometrics document, as /api/profile/biometrics would store it"""
+    entry = {
+        'user_id': user_id,
+        'heart_rate': _number(record, 'heart_rate', 20, 250),
+        'sleep_hours': _number(record, 'sleep_hours', 0, 24),
+        'exercise_minutes': _number(record, 'exercise_minutes', 0, 1440),
+        'timestamp': _timestamp(record, now),
+        'notes': _text(record, 'notes'),
+        'imported': True
+    }
+    if entry['heart_rate'] is None and entry['sleep_hours'] is None and entry['exercise_minutes'] is None:
+        raise RowError('At least one biometric measurement is required')
+    return entry
+
+
+class ImportResult:
+    """Counts and per-row errors of one upload"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.truncated = False
+        self.latest = None
+
+    def add_error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'truncated': self.truncated
+        }
+
+
+def _flush(collection, chunk, result):
+    if not chunk:
+        return
+    documents = [document for _, document in chunk]
+    try:
+        result.inserted += len(collection.insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Unordered: every row without a write error was inserted
+        result.inserted += e.details.get('nInserted', 0)
+        for write_error in e.details.get('writeErrors', []):
+            result.add_error(chunk[write_error['index']][0], write_error.get('errmsg', 'Write failed'))
+
+
+def import_rows(collection, rows, validate, user_id, chunk_size=None, max_rows=None):
+    """Validate ``rows`` from iter_rows and insert them in chunks, returning an ImportResult"""
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    max_rows = max_rows or IMPORT_MAX_ROWS
+    user_id = ObjectId(user_id)
+    now = datetime.utcnow()
+    result = ImportResult()
+    chunk = []
+    for number, record in rows:
+        if result.rows >= max_rows:
+            result.truncated = True
+            break
+        result.rows += 1
+        try:
+            if isinstance(record, RowError):
+                raise record
+            document = validate(record, user_id, now)
+        except RowError as e:
+            result.add_error(number, str(e))
+            continue
+        if result.latest is None or document['timestamp'] >= result.latest['timestamp']:
+            result.latest = document
+        chunk.append((number, document))
+        if len(chunk) >= chunk_size:
+            _flush(collection, chunk, result)
+            chunk = []
+    _flush(collection, chunk, result)
+    return result
@@ -0,0 +1,161 @@
+import re
+import string
+import unicodedata
+from collections import deque
+
+# Apostrophes are dropped so "can't" and "cant" normalize the same way
+_APOSTROPHE_RE = re.compile(r"['‘’`]")
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_REPEAT_RE = re.compile(r'(\w)\1+')
+
+# Fast path for ASCII text: one C-level translate instead of regex passes
+_ASCII_TABLE = str.maketrans({
+    **{char: ' ' for char in string.punctuation},
+    "'": None,
+    '`': None
+})
+
+
+def normalize_words(text):
+    """Split text into normalized words for keyword matching.
+
+    Case-folds, treats punctuation as a word break and squeezes repeated
+    letters ("diiiie" -> "die", "hopeless" -> "hopeles"). Keywords go through
+    the same function, so squeezing never causes a missed match.
+    """
+    text = text.casefold()
+    if text.isascii():
+        words = text.translate(_ASCII_TABLE).split()
+    else:
+        text = unicodedata.normalize('NFKC', text)
+        text = _APOSTROPHE_RE.sub('', text)
+        words = _NON_WORD_RE.sub(' ', text).split()
+
+    # Squeeze each distinct word once; long entries repeat most of their words
+    distinct = list(set(words))
+    squeezed = _REPEAT_RE.sub(r'\1', ' '.join(distinct)).split(' ')
+    mapping = dict(zip(distinct, squeezed))
+    return [mapping[word] for word in words]
+
+
+def normalize_text(text):
+    """Normalize text for keyword matching (see normalize_words)"""
+    return ' '.join(normalize_words(text))
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over normalized keyword phrases, built on whole words.
+
+    Phrases and text are normalized and split into words, and the automaton's
+    alphabet is words rather than characters, so the single pass over the text
+    is one step per word. The last word of a phrase also matches as a word
+    prefix, which keeps inflected forms ("hopelessness", "burdens",
+    "self harming") matching as they did under a substring search, while a
+    keyword never fires in the middle of a word. Texts that share no word or
+    prefix with the start of any phrase are rejected before the pass.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for keyword in keywords:
+            words = normalize_words(keyword)
+            if words:
+                self._add(words, keyword)
+        self._build()
+        self._first_words = frozenset(self._goto[0])
+        # Last words of phrases, matched as prefixes of longer text words
+        self._last_words = frozenset(normalize_words(keyword)[-1] for keyword in self.keywords)
+        self._last_word_lengths = sorted({len(word) for word in self._last_words}, reverse=True)
+        # One C-level test per distinct word before the per-length lookups
+        self._last_word_start = re.compile('|'.join(map(re.escape, self._last_words))) if self._last_words else None
+
+    def _add(self, words, keyword):
+        node = 0
+        for word in words:
+            next_node = self._goto[node].get(word)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][word] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] = self._output[node] + (len(self.keywords),)
+        self.keywords.append(keyword)
+
+    def _build(self):
+        # Breadth-first so every failure link points at an already-finished node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _prefixes(self, word):
+        """Phrase last words that ``word`` extends ("burdens" -> "burden"), longest first"""
+        if self._last_word_start is None or not self._last_word_start.match(word):
+            return []
+        return [
+            word[:length] for length in self._last_word_lengths
+            if length < len(word) and word[:length] in self._last_words
+        ]
+
+    def _step(self, node, word):
+        goto = self._goto
+        while node and word not in goto[node]:
+            node = self._fail[node]
+        return goto[node].get(word, 0)
+
+    def _scan(self, text):
+        words = normalize_words(text)
+        prefixes = {}
+        for word in set(words):
+            found = self._prefixes(word)
+            if found:
+                prefixes[word] = found
+        if self._first_words.isdisjoint(words) and not any(
+            not self._first_words.isdisjoint(found) for found in prefixes.values()
+        ):
+            return
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for word in words:
+            if prefixes and word in prefixes:
+                # A phrase ending in a prefix of this word ends here too, but the
+                # automaton carries on with the whole word
+                for prefix in prefixes[word]:
+                    matched = self._step(node, prefix)
+                    if output[matched]:
+                        yield output[matched]
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            if output[node]:
+                yield output[node]
+
+    def contains_any(self, text):
+        """Return True as soon as any phrase matches"""
+        for _ in self._scan(text):
+            return True
+        return False
+
+    def find_all(self, text):
+        """Return the distinct phrases found in the text, in order of first match"""
+        found = {}
+        for matches in self._scan(text):
+            for index in matches:
+                found.setdefault(self.keywords[index], None)
+        return list(found)
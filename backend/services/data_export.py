@@ -0,0 +1,142 @@
+"""
+Streaming export of a user's full history.
+
+Documents are read collection by collection in ``_id`` order with a bounded
+cursor batch and written out as they arrive, so memory stays flat however
+long the history is. Two formats:
+
+  ndjson  one JSON object per line: ``{"collection": ..., "document": {...}}``,
+          ending with ``{"complete": true, "counts": {...}}``. A download that
+          stops before that line can be resumed from the last collection and
+          document id it received.
+  zip     one ``<collection>.ndjson`` file per collection plus
+          ``manifest.json``, deflated as it streams.
+
+Both accept the same resume point: collections before ``after_collection``
+are skipped, and in that collection only documents after ``after_id`` are
+sent.
+"""
+
+import os
+import zipfile
+from datetime import datetime
+
+from bson import ObjectId
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
+
+# Export name -> MongoDB collection, in export order
+EXPORT_COLLECTIONS = [
+    ('moods', 'mood_entries'),
+    ('journals', 'journal_entries'),
+    ('activities', 'activities'),
+    ('biometrics', 'biometrics'),
+    ('playlists', 'playlists'),
+]
+EXPORT_NAMES = [name for name, _ in EXPORT_COLLECTIONS]
+
+# The user's own profile comes first; it is one document, so it is never resumed mid-way
+PROFILE = 'profile'
+
+
+class ExportError(ValueError):
+    """Raised for an invalid resume point"""
+
+
+def resume_plan(after_collection=None, after_id=None):
+    """(name, collection, after ObjectId or None) for each collection still to export"""
+    if after_collection in (None, PROFILE):
+        return [(name, collection, None) for name, collection in EXPORT_COLLECTIONS]
+    if after_collection not in EXPORT_NAMES:
+        raise ExportError(f"Unknown collection '{after_collection}'")
+    if after_id is not None and not ObjectId.is_valid(after_id):
+        raise ExportError('after_id must be a document id')
+
+    start = EXPORT_NAMES.index(after_collection)
+    plan = [(name, collection, None) for name, collection in EXPORT_COLLECTIONS[start:]]
+    if after_id is not None:
+        name, collection, _ = plan[0]
+        plan[0] = (name, collection, ObjectId(after_id))
+    return plan
+
+
+def iter_documents(db, user_id, collection, after_id=None, batch_size=None):
+    """The user's documents in ``_id`` order, fetched ``batch_size`` at a time"""
+    query = {'user_id': ObjectId(user_id)}
+    if after_id is not None:
+        query['_id'] = {'$gt': after_id}
+    cursor = db[collection].find(query, batch_size=batch_size or EXPORT_BATCH_SIZE).sort('_id', 1)
+    try:
+        for document in cursor:
+            document['id'] = document.pop('_id')
+            document.pop('user_id', None)
+            yield document
+    finally:
+        cursor.close()
+
+
+def export_ndjson(db, json, user_id, profile, plan):
+    """NDJSON lines (bytes) for ``plan``; ``profile`` is sent first when not None"""
+    counts = {}
+    if profile is not None:
+        yield _line(json, {'collection': PROFILE, 'document': profile})
+    for name, collection, after_id in plan:
+        counts[name] = 0
+        for document in iter_documents(db, user_id, collection, after_id):
+            counts[name] += 1
+            yield _line(json, {'collection': name, 'document': document})
+    yield _line(json, {'complete': True, 'counts': counts, 'exported_at': datetime.utcnow()})
+
+
+def _line(json, value):
+    return (json.dumps(value) + '\n').encode('utf-8')
+
+
+class _ChunkWriter:
+    """Write-only file for ZipFile that hands out what was written since the last ``take``"""
+
+    def __init__(self):
+        self._chunks = []
+        self._written = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_zip(db, json, user_id, profile, plan):
+    """A zip archive (bytes chunks) with one NDJSON file per collection"""
+    writer = _ChunkWriter()
+    counts = {}
+    # The writer cannot seek, so ZipFile puts sizes in data descriptors after each file
+    with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        if profile is not None:
+            archive.writestr(f'{PROFILE}.json', json.dumps(profile))
+            yield writer.take()
+        for name, collection, after_id in plan:
+            counts[name] = 0
+            with archive.open(f'{name}.ndjson', 'w', force_zip64=True) as member:
+                for document in iter_documents(db, user_id, collection, after_id):
+                    counts[name] += 1
+                    member.write(_line(json, document))
+                    # The compressor holds data back until it has a block to emit
+                    chunk = writer.take()
+                    if chunk:
+                        yield chunk
+            yield writer.take()
+        archive.writestr('manifest.json', json.dumps({
+            'complete': True, 'counts': counts, 'exported_at': datetime.utcnow()
+        }))
+    yield writer.take()
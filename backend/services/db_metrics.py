@@ -0,0 +1,420 @@
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import bson
+from flask import g, has_request_context, request
+from pymongo import monitoring
+
+# Latency bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Bucket upper bounds for Mongo commands issued per request
+COMMAND_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+# Per-route attribution; per command it only counts the reply's documents (no re-encoding)
+ROUTE_METRICS_ENABLED = os.getenv('DB_ROUTE_METRICS', 'true').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 100))
+SLOW_QUERY_SAMPLES = int(os.getenv('DB_SLOW_QUERY_SAMPLES', 50))
+SLOW_QUERY_LOG = os.getenv('DB_SLOW_QUERY_LOG', 'false').lower() == 'true'
+
+# Commands attributed to no Flask request (job workers, startup, CLIs)
+BACKGROUND_ROUTE = '<background>'
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram (latencies in ms unless another unit is given)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS, unit='ms'):
+        self.buckets = buckets
+        self.unit = unit
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def _quantile(self, counts, count, fraction):
+        # Upper bound of the bucket holding the quantile; the overflow bucket reports the max
+        target = fraction * count
+        running = 0
+        for i, bucket_count in enumerate(counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else self._max
+        return self._max
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+            total = self._sum
+            maximum = self._max
+        suffix = f'_{self.unit}' if self.unit else ''
+        return {
+            'count': count,
+            f'sum{suffix}': round(total, 3),
+            f'mean{suffix}': round(total / count, 3) if count else 0,
+            f'max{suffix}': round(maximum, 3),
+            f'p50{suffix}': self._quantile(counts, count, 0.50) if count else 0,
+            f'p95{suffix}': self._quantile(counts, count, 0.95) if count else 0,
+            f'p99{suffix}': self._quantile(counts, count, 0.99) if count else 0,
+            'buckets': {
+                **{f'le_{bound}': counts[i] for i, bound in enumerate(self.buckets)},
+                'le_inf': counts[-1]
+            }
+        }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks pool size, connections in use and how long requests wait for a connection"""
+
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self._servers = {}
+        self._lock = threading.Lock()
+        # Check-out events are published on the requesting thread
+        self._local = threading.local()
+
+    def _server(self, address):
+        key = f'{address[0]}:{address[1]}'
+        server = self._servers.get(key)
+        if server is None:
+            server = {
+                'size': 0,
+                'checked_out': 0,
+                'max_checked_out': 0,
+                'created': 0,
+                'closed': 0,
+                'cleared': 0,
+                'checkout_failures': {}
+            }
+            self._servers[key] = server
+        return server
+
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)['cleared'] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['created'] += 1
+            server['size'] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server['closed'] += 1
+            server['size'] -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.monotonic()
+
+    def _waited_ms(self):
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        return (time.monotonic() - started) * 1000 if started is not None else None
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited_ms()
+        if waited is not None:
+            self.checkout_wait.observe(waited)
+        with self._lock:
+            failures = self._server(event.address)['checkout_failures']
+            failures[event.reason] = failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        waited = self._waited_ms()
+        if waited is not None:
+            self.checkout_wait.observe(waited)
+        with self._lock:
+            server = self._server(event.address)
+            server['checked_out'] += 1
+            server['max_checked_out'] = max(server['max_checked_out'], server['checked_out'])
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event.address)['checked_out'] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            servers = {
+                key: dict(server, checkout_failures=dict(server['checkout_failures']))
+                for key, server in self._servers.items()
+            }
+        return {
+            'servers': servers,
+            'checkout_wait_ms': self.checkout_wait.snapshot()
+        }
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per-command latency histograms and failure counts"""
+
+    def __init__(self):
+        self._commands = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, command_name):
+        histogram = self._commands.get(command_name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._commands.setdefault(command_name, Histogram())
+        return histogram
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._histogram(event.command_name).observe(event.duration_micros / 1000)
+
+    def failed(self, event):
+        self._histogram(event.command_name).observe(event.duration_micros / 1000)
+        with self._lock:
+            self._failures[event.command_name] = self._failures.get(event.command_name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            commands = dict(self._commands)
+            failures = dict(self._failures)
+        return {
+            name: dict(histogram.snapshot(), failures=failures.get(name, 0))
+            for name, histogram in sorted(commands.items())
+        }
+
+
+# Where each command keeps its filter; aggregate pipelines are shaped whole
+_FILTER_FIELDS = {
+    'find': 'filter',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'aggregate': 'pipeline'
+}
+_BULK_FILTER_FIELDS = {'update': ('updates', 'q'), 'delete': ('deletes', 'q')}
+
+
+def query_shape(value, depth=0):
+    """Replace the literal values in a filter with their type names, keeping field names and operators"""
+    if depth > 6:
+        return '...'
+    if isinstance(value, dict):
+        return {key: query_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Arrays of literals ($in lists) collapse to one element; pipelines keep every stage
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item, depth + 1) for item in value]
+        return [query_shape(value[0], depth + 1)] if value else []
+    return f'?{type(value).__name__}'
+
+
+def command_filter_shape(command_name, command):
+    field = _FILTER_FIELDS.get(command_name)
+    if field is not None:
+        return query_shape(command.get(field, {}))
+    bulk = _BULK_FILTER_FIELDS.get(command_name)
+    if bulk is not None:
+        statements = command.get(bulk[0]) or [{}]
+        return query_shape(statements[0].get(bulk[1], {}))
+    return None
+
+
+def reply_document_count(command_name, reply):
+    cursor = reply.get('cursor')
+    if cursor is not None:
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') is not None else 0
+    if command_name == 'distinct':
+        return len(reply.get('values', ()))
+    return reply.get('n', 0)
+
+
+class RouteCommandMetrics(monitoring.CommandListener):
+    """Attributes every Mongo command to the Flask endpoint that issued it.
+
+    Keeps, per route, the number of requests, commands and DB time per request
+    (a route with many commands per request is usually an N+1 loop) and a
+    latency histogram with document totals for each collection and operation.
+    Commands slower than DB_SLOW_QUERY_MS are sampled with their filter shape
+    and reply size and optionally logged as one JSON line each; only those
+    rare replies are re-encoded to measure their size.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._started = {}
+        self._lock = threading.Lock()
+        self.slow_queries = deque(maxlen=SLOW_QUERY_SAMPLES)
+
+    def init_app(self, app):
+        """Record per-request command counts; call once with the Flask app"""
+        app.teardown_request(self._finish_request)
+
+    def _route(self, name):
+        route = self._routes.get(name)
+        if route is None:
+            with self._lock:
+                route = self._routes.setdefault(name, {
+                    'requests': 0,
+                    'commands_per_request': Histogram(COMMAND_COUNT_BUCKETS, unit=''),
+                    'db_time_per_request': Histogram(),
+                    'operations': {},
+                    'lock': threading.Lock()
+                })
+        return route
+
+    def started(self, event):
+        if has_request_context():
+            route = request.endpoint or request.path
+        else:
+            route = BACKGROUND_ROUTE
+        command = event.command
+        # The collection is the command's value, except for getMore
+        collection = command.get('collection' if event.command_name == 'getMore' else event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        self._started[(event.connection_id, event.request_id)] = (
+            route, collection, command_filter_shape(event.command_name, command)
+        )
+
+    def succeeded(self, event):
+        self._record(event, event.reply, failed=False)
+
+    def failed(self, event):
+        self._record(event, None, failed=True)
+
+    def _record(self, event, reply, failed):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        route_name, collection, shape = started
+        duration_ms = event.duration_micros / 1000
+        docs = reply_document_count(event.command_name, reply) if reply else 0
+
+        if route_name != BACKGROUND_ROUTE and has_request_context():
+            totals = g.setdefault('_db_command_totals', [0, 0.0])
+            totals[0] += 1
+            totals[1] += duration_ms
+
+        key = f"{collection or '-'}.{event.command_name}"
+        route = self._route(route_name)
+        with route['lock']:
+            operation = route['operations'].get(key)
+            if operation is None:
+                operation = route['operations'][key] = {
+                    'latency': Histogram(), 'docs': 0, 'failures': 0
+                }
+            operation['docs'] += docs
+            operation['failures'] += failed
+        operation['latency'].observe(duration_ms)
+
+        if duration_ms >= SLOW_QUERY_MS:
+            sample = {
+                'route': route_name,
+                'collection': collection,
+                'operation': event.command_name,
+                'duration_ms': round(duration_ms, 3),
+                'filter_shape': shape,
+                'docs': docs,
+                # Re-encoding is the only way to size a reply; affordable for the few slow ones
+                'bytes': len(bson.encode(reply)) if reply else 0,
+                'failed': failed,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+            self.slow_queries.append(sample)
+            if SLOW_QUERY_LOG:
+                print(json.dumps({'event': 'slow_query', **sample}))
+
+    def _finish_request(self, error=None):
+        if not request.endpoint:
+            return
+        commands, db_time = g.pop('_db_command_totals', (0, 0.0))
+        route = self._route(request.endpoint)
+        with route['lock']:
+            route['requests'] += 1
+        route['commands_per_request'].observe(commands)
+        route['db_time_per_request'].observe(db_time)
+
+    def snapshot(self):
+        """Per-route stats, routes with the most DB time first"""
+        with self._lock:
+            routes = dict(self._routes)
+        result = []
+        for name, route in routes.items():
+            with route['lock']:
+                operations = {key: dict(operation) for key, operation in route['operations'].items()}
+                requests = route['requests']
+            operation_stats = {
+                key: {
+                    'latency': operation['latency'].snapshot(),
+                    'docs': operation['docs'],
+                    'failures': operation['failures']
+                }
+                for key, operation in operations.items()
+            }
+            db_time = sum(stats['latency']['sum_ms'] for stats in operation_stats.values())
+            result.append({
+                'route': name,
+                'requests': requests,
+                'db_time_ms': round(db_time, 3),
+                'commands_per_request': route['commands_per_request'].snapshot(),
+                'db_time_per_request': route['db_time_per_request'].snapshot(),
+                'operations': dict(sorted(
+                    operation_stats.items(), key=lambda item: -item[1]['latency']['sum_ms']
+                ))
+            })
+        result.sort(key=lambda route: -route['db_time_ms'])
+        return result
+
+
+# Registered on every MongoClient created by models.database
+pool_metrics = PoolMetrics()
+command_metrics = CommandMetrics()
+route_metrics = RouteCommandMetrics()
+
+
+def event_listeners():
+    """Listeners to register on a new MongoClient"""
+    listeners = [pool_metrics, command_metrics]
+    if ROUTE_METRICS_ENABLED:
+        listeners.append(route_metrics)
+    return listeners
+
+
+def _reset_after_fork():
+    # A forked worker opens its own pools, so the parent's numbers do not apply
+    pool_metrics.__init__()
+    command_metrics.__init__()
+    route_metrics.__init__()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,172 @@
+"""
+Response compression and conditional GET.
+
+Every buffered 200 response to a GET gets a weak ETag made from a hash of its
+body, and a request whose If-None-Match matches gets an empty 304 instead.
+That saves the transfer but the view still runs.
+
+Views that only show the signed-in user's own data can skip the work as well
+with ``@etag_from_data_version()``. Each user has a data version in Mongo
+(``data_versions`` collection) that goes up after every successful request to
+a view marked ``@bumps_data_version``: the writes to collections those views
+read. The ETag is made from the user, the URL and that version, so an
+unchanged dashboard costs one ``_id`` lookup. Writes that only sometimes
+touch that data, or that change it outside the user's own requests -
+background jobs, another user's friend request - call ``bump_data_version``
+themselves.
+
+Bodies of at least COMPRESS_MIN_BYTES are then sent gzip encoded, or brotli
+encoded when the brotli package is installed and the client accepts it.
+Streamed responses (server-sent events) are left alone.
+"""
+
+import gzip
+import hashlib
+import os
+import time
+from functools import wraps
+
+from bson import ObjectId
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from models.database import get_db
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript', 'text/plain', 'text/html', 'text/css', 'text/csv'}
+
+# Changes every deploy, so a new response format never matches an old ETag
+ETAG_SALT = os.getenv('RAILWAY_GIT_COMMIT_SHA') or os.getenv('APP_VERSION', '')
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def bump_data_version(user_id):
+    """Invalidate the data-version ETags of ``user_id``"""
+    db = get_db()
+    if db is None:
+        return
+    try:
+        db.data_versions.update_one({'_id': ObjectId(user_id)}, {'$inc': {'version': 1}}, upsert=True)
+    except Exception as e:
+        print(f"⚠️  Failed to bump data version for {user_id}: {e}")
+
+
+def get_data_version(user_id):
+    db = get_db()
+    document = db.data_versions.find_one({'_id': ObjectId(user_id)}, {'version': 1})
+    return document['version'] if document else 0
+
+
+def _current_user():
+    # Only set when the view was behind @jwt_required()
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def _set_cache_headers(response):
+    # Cached per browser and revalidated on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+
+
+def etag_from_data_version(refresh_seconds=None):
+    """Answer 304 from the user's data version without running the view.
+
+    Place below ``@jwt_required()``. Views whose output also changes with the
+    clock (e.g. "the last 30 days") pass ``refresh_seconds`` so their ETag
+    changes at least that often.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = _current_user()
+            if request.method != 'GET' or user_id is None or get_db() is None:
+                return view(*args, **kwargs)
+            try:
+                # Read before the view queries, so a write in between gives a stale tag, never stale data
+                version = get_data_version(user_id)
+            except Exception as e:
+                print(f"⚠️  Data version lookup failed: {e}")
+                return view(*args, **kwargs)
+
+            window = int(time.time() // refresh_seconds) if refresh_seconds else 0
+            key = f'{user_id}:{version}:{window}:{request.full_path}:{ETAG_SALT}'
+            etag = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            _set_cache_headers(response)
+            return response
+        return wrapper
+    return decorator
+
+
+def bumps_data_version(view):
+    """Bump the user's data version after a successful (2xx) response.
+
+    Place below ``@jwt_required()`` on views that write data an
+    ``etag_from_data_version`` view shows.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        user_id = _current_user()
+        if 200 <= response.status_code < 300 and user_id is not None:
+            bump_data_version(user_id)
+        return response
+    return wrapper
+
+
+def _conditional(response):
+    if (request.method != 'GET' or response.status_code != 200 or response.is_streamed
+            or response.direct_passthrough or 'ETag' in response.headers):
+        return response
+    response.add_etag(weak=True)
+    _set_cache_headers(response)
+    return response.make_conditional(request)
+
+
+def _compress(response):
+    if (response.status_code < 200 or response.status_code in (204, 206, 304) or response.is_streamed
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.content_length is None or response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _after_request(response):
+    # The ETag is taken from the uncompressed body, so it is the same for every encoding
+    return _compress(_conditional(response))
+
+
+def init_app(app):
+    app.after_request(_after_request)
@@ -0,0 +1,79 @@
+"""
+Import-time profile for the startup diagnostics.
+
+Gives the same self/cumulative breakdown as ``python -X importtime`` from inside
+the running process. ``start()`` wraps importlib's ``_find_and_load`` - the
+function the interpreter calls for every module not yet in sys.modules - so
+it must run before the imports being measured. Enabled with IMPORT_PROFILE=true.
+"""
+
+import importlib._bootstrap as _bootstrap
+import os
+import threading
+import time
+
+_original_find_and_load = None
+_timings = []
+_local = threading.local()
+
+
+def _timed_find_and_load(name, import_):
+    # Each frame on the stack collects the cumulative time of its direct children
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_find_and_load(name, import_)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        _timings.append((name, elapsed - children, elapsed, len(stack)))
+
+
+def start():
+    """Start recording module import times"""
+    global _original_find_and_load
+    if _original_find_and_load is None:
+        _original_find_and_load = _bootstrap._find_and_load
+        _bootstrap._find_and_load = _timed_find_and_load
+
+
+def stop():
+    global _original_find_and_load
+    if _original_find_and_load is not None:
+        _bootstrap._find_and_load = _original_find_and_load
+        _original_find_and_load = None
+
+
+def start_if_enabled():
+    if os.getenv('IMPORT_PROFILE', 'false').lower() == 'true':
+        start()
+
+
+def report(limit=15):
+    """Modules sorted by cumulative import time, plus the top-level total"""
+    timings = list(_timings)
+    return {
+        'total_ms': round(sum(cumulative for _, _, cumulative, depth in timings if depth == 0) * 1000, 1),
+        'modules': len(timings),
+        'slowest': [
+            {'module': name, 'self_ms': round(own * 1000, 1), 'cumulative_ms': round(cumulative * 1000, 1)}
+            for name, own, cumulative, _ in sorted(timings, key=lambda item: item[2], reverse=True)[:limit]
+        ]
+    }
+
+
+def print_report(limit=15):
+    """Print the slowest imports in ``-X importtime`` layout and stop recording"""
+    if _original_find_and_load is None:
+        return
+    stop()
+    summary = report(limit)
+    print(f"Import profile: {summary['modules']} modules in {summary['total_ms']:.0f} ms")
+    print("  self [ms] | cumulative [ms] | module")
+    for entry in summary['slowest']:
+        print(f"  {entry['self_ms']:9.1f} | {entry['cumulative_ms']:15.1f} | {entry['module']}")
@@ -0,0 +1,329 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models.database import get_db, ensure_indexes
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+ACTIVE_JOB_STATES = [JOB_QUEUED, JOB_RUNNING]
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler when the job should be retried later (e.g. upstream 429)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobContext:
+    """Handle passed to job handlers for reporting progress and saving resumable state"""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+        self.state = dict(job.get('state') or {})
+
+    @property
+    def payload(self):
+        return self.job.get('payload', {})
+
+    def report_progress(self, step, percent=None):
+        """Record the current step (and optional percentage) on the job document"""
+        progress = {'step': step, 'updated_at': datetime.utcnow()}
+        if percent is not None:
+            progress['percent'] = max(0, min(100, int(percent)))
+        self.queue._update_job(self.job['_id'], {'progress': progress})
+
+    def save_state(self, **values):
+        """Persist handler state so a retried job can skip work it already did"""
+        self.state.update(values)
+        self.queue._update_job(self.job['_id'], {'state': self.state})
+
+
+class JobQueue:
+    """Mongo-backed job queue processed by local worker threads"""
+
+    def __init__(self, collection_name='jobs', workers=None, poll_interval=None,
+                 lease_seconds=None, max_attempts=None, retry_base_seconds=None):
+        self.collection_name = collection_name
+        self.workers = workers or int(os.getenv('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL', 1.0))
+        self.lease_seconds = lease_seconds or int(os.getenv('JOB_LEASE_SECONDS', 300))
+        self.max_attempts = max_attempts or int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+        self.retry_base_seconds = retry_base_seconds or float(os.getenv('JOB_RETRY_BASE_SECONDS', 2))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._handlers = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._indexes_ready = False
+
+    def _collection(self):
+        db = get_db()
+        if db is None:
+            return None
+        return db[self.collection_name]
+
+    def _ensure_indexes(self, collection):
+        if self._indexes_ready:
+            return
+        ensure_indexes(collection, [
+            ([('type', 1), ('user_id', 1), ('idempotency_key', 1)], {'unique': True}),
+            ([('status', 1), ('run_after', 1)], {}),
+            ([('status', 1), ('locked_until', 1)], {})
+        ])
+        self._indexes_ready = True
+
+    def register_handler(self, job_type, handler, max_attempts=None, on_failure=None):
+        """Register the function that processes jobs of the given type.
+
+        ``on_failure(job, error)`` is called once a job has permanently failed.
+        """
+        self._handlers[job_type] = {
+            'handler': handler,
+            'max_attempts': max_attempts or self.max_attempts,
+            'on_failure': on_failure
+        }
+
+    def start(self):
+        """Start worker threads for this process (safe to call more than once)"""
+        with self._lock:
+            # Threads do not survive a fork, so restart them in each worker process
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._stopping.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"job-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            print(f"✅ Job queue started with {self.workers} worker(s)")
+
+    def stop(self):
+        """Signal worker threads to exit"""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def enqueue(self, job_type, payload, user_id=None, idempotency_key=None, job_id=None):
+        """Queue a job, returning the existing job if the idempotency key was already used.
+
+        A job with the same key that has permanently failed is queued again, so
+        retrying a failed request makes a new attempt. ``job_id`` lets the caller
+        choose the new job's id before it exists.
+        """
+        collection = self._collection()
+        if collection is None:
+            return None
+        self._ensure_indexes(collection)
+
+        now = datetime.utcnow()
+        job_filter = {
+            'type': job_type,
+            'user_id': user_id,
+            'idempotency_key': idempotency_key
+        }
+        new_job = {
+            'payload': payload,
+            'status': JOB_QUEUED,
+            'attempts': 0,
+            'max_attempts': self._handlers.get(job_type, {}).get('max_attempts', self.max_attempts),
+            'progress': {'step': 'queued', 'percent': 0, 'updated_at': now},
+            'state': {},
+            'result': None,
+            'error': None,
+            'run_after': now,
+            'locked_by': None,
+            'locked_until': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        if job_id is not None:
+            new_job['_id'] = job_id
+
+        try:
+            job = collection.find_one_and_update(
+                job_filter,
+                {'$setOnInsert': new_job},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race with an identical request
+            job = collection.find_one(job_filter)
+
+        if job is not None and job['status'] == JOB_FAILED:
+            # Saved handler state is kept, so the new attempt resumes where the last one stopped
+            retry = {key: value for key, value in new_job.items() if key not in ('_id', 'state', 'created_at')}
+            job = collection.find_one_and_update(
+                {'_id': job['_id'], 'status': JOB_FAILED},
+                {'$set': retry, '$unset': {'completed_at': ''}},
+                return_document=ReturnDocument.AFTER
+            ) or collection.find_one({'_id': job['_id']})
+
+        self.start()
+        self._wakeup.set()
+        return job
+
+    def get_job(self, job_id, user_id=None):
+        """Fetch a job by id, optionally scoped to its owner"""
+        collection = self._collection()
+        if collection is None:
+            return None
+        query = {'_id': job_id}
+        if user_id is not None:
+            query['user_id'] = user_id
+        return collection.find_one(query)
+
+    def _update_job(self, job_id, fields):
+        collection = self._collection()
+        if collection is None:
+            return
+        fields['updated_at'] = datetime.utcnow()
+        collection.update_one({'_id': job_id}, {'$set': fields})
+
+    def _claim_next(self, collection):
+        now = datetime.utcnow()
+        return collection.find_one_and_update(
+            {
+                'type': {'$in': list(self._handlers.keys())},
+                '$or': [
+                    {'status': JOB_QUEUED, 'run_after': {'$lte': now}},
+                    # Recover jobs whose worker died mid-run
+                    {'status': JOB_RUNNING, 'locked_until': {'$lt': now}}
+                ]
+            },
+            {
+                '$set': {
+                    'status': JOB_RUNNING,
+                    'locked_by': self.worker_id,
+                    'locked_until': now + timedelta(seconds=self.lease_seconds),
+                    'updated_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('run_after', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                collection = self._collection()
+                job = self._claim_next(collection) if collection is not None else None
+            except Exception as e:
+                print(f"⚠️  Job queue poll failed: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            self._run_job(job)
+
+    def _run_job(self, job):
+        registration = self._handlers.get(job['type'])
+        if registration is None:
+            self._update_job(job['_id'], {
+                'status': JOB_FAILED,
+                'error': f"No handler registered for job type '{job['type']}'",
+                'locked_by': None,
+                'locked_until': None
+            })
+            return
+
+        # A job reclaimed after its worker died still counts against its attempts
+        if job['attempts'] > job.get('max_attempts', self.max_attempts):
+            self._fail_job(job, job.get('error') or 'Retries exhausted')
+            return
+
+        context = JobContext(self, job)
+        try:
+            result = registration['handler'](context)
+            self._update_job(job['_id'], {
+                'status': JOB_SUCCEEDED,
+                'result': result,
+                'error': None,
+                'progress': {'step': 'completed', 'percent': 100, 'updated_at': datetime.utcnow()},
+                'locked_by': None,
+                'locked_until': None,
+                'completed_at': datetime.utcnow()
+            })
+        except RetryableJobError as e:
+            if job['attempts'] >= job.get('max_attempts', self.max_attempts):
+                self._fail_job(job, f"Retries exhausted: {e}")
+                return
+            # Honour the upstream Retry-After, otherwise back off exponentially
+            delay = e.retry_after if e.retry_after else min(self.retry_base_seconds * 2 ** (job['attempts'] - 1), 300)
+            print(f"⚠️  Job {job['_id']} will retry in {delay}s: {e}")
+            self._update_job(job['_id'], {
+                'status': JOB_QUEUED,
+                'error': str(e),
+                'run_after': datetime.utcnow() + timedelta(seconds=delay),
+                'progress': {'step': 'waiting_to_retry', 'updated_at': datetime.utcnow()},
+                'locked_by': None,
+                'locked_until': None
+            })
+        except Exception as e:
+            traceback.print_exc()
+            self._fail_job(job, str(e))
+
+    def _fail_job(self, job, error):
+        print(f"❌ Job {job['_id']} failed: {error}")
+        self._update_job(job['_id'], {
+            'status': JOB_FAILED,
+            'error': error,
+            'locked_by': None,
+            'locked_until': None,
+            'completed_at': datetime.utcnow()
+        })
+
+        on_failure = self._handlers.get(job['type'], {}).get('on_failure')
+        if on_failure:
+            try:
+                on_failure(job, error)
+            except Exception as e:
+                print(f"⚠️  Failure hook for job {job['_id']} raised: {e}")
+
+
+def serialize_job(job):
+    """Convert a job document into the public status payload"""
+    progress = dict(job.get('progress') or {})
+    if isinstance(progress.get('updated_at'), datetime):
+        progress['updated_at'] = progress['updated_at'].isoformat()
+
+    return {
+        'job_id': str(job['_id']),
+        'type': job['type'],
+        'status': job['status'],
+        'attempts': job.get('attempts', 0),
+        'progress': progress,
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': job['created_at'].isoformat(),
+        'updated_at': job['updated_at'].isoformat()
+    }
+
+
+# Shared queue used by all blueprints
+job_queue = JobQueue()
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from models.database import get_db
+from services.ai_service import get_ai_response
+from services.http_cache import bump_data_version
+from services.job_queue import JobQueue, RetryableJobError, ACTIVE_JOB_STATES
+
+JOURNAL_AI_JOB = 'journal_ai_response'
+
+# AI response states stored on journal entries
+AI_RESPONSE_PENDING = 'pending'
+AI_RESPONSE_READY = 'ready'
+AI_RESPONSE_FAILED = 'failed'
+
+# Pending entries older than this are re-queued at startup
+STALE_PENDING_SECONDS = int(os.getenv('JOURNAL_AI_STALE_SECONDS', 120))
+
+# Dedicated queue so slow model calls never starve other background jobs
+journal_ai_queue = JobQueue(
+    workers=int(os.getenv('JOURNAL_AI_WORKERS', 2)),
+    max_attempts=int(os.getenv('JOURNAL_AI_MAX_ATTEMPTS', 3)),
+    retry_base_seconds=float(os.getenv('JOURNAL_AI_RETRY_BASE_SECONDS', 5))
+)
+
+
+class ResponseNotifier:
+    """Wakes in-process listeners (e.g. SSE streams) when an entry's AI response is stored"""
+
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, entry_id):
+        with self._lock:
+            event, listeners = self._events.get(entry_id, (threading.Event(), 0))
+            self._events[entry_id] = (event, listeners + 1)
+            return event
+
+    def unsubscribe(self, entry_id):
+        with self._lock:
+            event, listeners = self._events.get(entry_id, (None, 0))
+            if listeners <= 1:
+                self._events.pop(entry_id, None)
+            else:
+                self._events[entry_id] = (event, listeners - 1)
+
+    def publish(self, entry_id):
+        with self._lock:
+            event, _ = self._events.get(entry_id, (None, 0))
+        if event is not None:
+            event.set()
+
+
+notifier = ResponseNotifier()
+
+
+def request_ai_response(entry_id, user_id, mood=''):
+    """Mark the entry as pending and queue generation of its AI response"""
+    return _queue_for_entry({'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)}, entry_id, user_id, mood)
+
+
+def _queue_for_entry(entry_query, entry_id, user_id, mood):
+    """Point the entry matching ``entry_query`` at a new job and queue it, or return None if none matches"""
+    db = get_db()
+    job_id = ObjectId()
+    requested_at = datetime.utcnow()
+    # Marked pending before the job exists, so a worker that finishes it quickly
+    # is never overwritten by this update
+    result = db.journal_entries.update_one(entry_query, {'$set': {
+        'ai_response_status': AI_RESPONSE_PENDING,
+        'ai_response_job_id': job_id,
+        'ai_response_requested_at': requested_at
+    }})
+    if result.matched_count == 0:
+        return None
+    return journal_ai_queue.enqueue(
+        JOURNAL_AI_JOB,
+        {'entry_id': str(entry_id), 'mood': mood},
+        user_id=ObjectId(user_id),
+        idempotency_key=f"{entry_id}:{requested_at.timestamp()}",
+        job_id=job_id
+    )
+
+
+def _run_journal_ai_job(job):
+    """Job handler: generate the AI response for a journal entry and store it"""
+    db = get_db()
+    entry_id = ObjectId(job.payload['entry_id'])
+    entry = db.journal_entries.find_one({'_id': entry_id, 'user_id': job.job['user_id']})
+    if not entry:
+        # Entry was deleted while the job was queued
+        return {'skipped': True}
+
+    ai_response = get_ai_response(entry['content'], job.payload.get('mood') or entry.get('mood', ''), str(job.job['user_id']))
+
+    # get_ai_response swallows model errors and returns a fallback; retry those
+    if ai_response.get('error'):
+        raise RetryableJobError(ai_response['error'])
+
+    db.journal_entries.update_one(
+        {'_id': entry_id},
+        {'$set': {
+            'ai_response': ai_response,
+            'ai_response_status': AI_RESPONSE_READY,
+            'ai_response_completed_at': datetime.utcnow()
+        }}
+    )
+    bump_data_version(job.job['user_id'])
+    notifier.publish(str(entry_id))
+    return {'entry_id': str(entry_id)}
+
+
+def _on_journal_ai_failure(job, error):
+    db = get_db()
+    entry_id = ObjectId(job['payload']['entry_id'])
+    db.journal_entries.update_one(
+        {'_id': entry_id, 'ai_response_job_id': job['_id']},
+        {'$set': {
+            'ai_response_status': AI_RESPONSE_FAILED,
+            'ai_response_error': error
+        }}
+    )
+    bump_data_version(job['user_id'])
+    notifier.publish(str(entry_id))
+
+
+journal_ai_queue.register_handler(JOURNAL_AI_JOB, _run_journal_ai_job, on_failure=_on_journal_ai_failure)
+
+
+def recover_pending_responses():
+    """Re-queue entries left pending by a crashed or restarted worker"""
+    db = get_db()
+    if db is None:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_PENDING_SECONDS)
+    recovered = 0
+    stale_entries = db.journal_entries.find(
+        {'ai_response_status': AI_RESPONSE_PENDING, 'ai_response_requested_at': {'$lt': cutoff}},
+        {'user_id': 1, 'mood': 1, 'ai_response_job_id': 1}
+    )
+    for entry in stale_entries:
+        job = journal_ai_queue.get_job(entry.get('ai_response_job_id'))
+        # Active jobs are picked up again by the queue once their lease expires
+        if job is not None and job['status'] in ACTIVE_JOB_STATES:
+            continue
+        # Every worker process runs this scan; only the one that swaps the entry
+        # off its old job id queues the new job
+        claim = {
+            '_id': entry['_id'],
+            'ai_response_status': AI_RESPONSE_PENDING,
+            'ai_response_job_id': entry.get('ai_response_job_id')
+        }
+        if _queue_for_entry(claim, entry['_id'], entry['user_id'], entry.get('mood', '')) is not None:
+            recovered += 1
+
+    if recovered:
+        print(f"✅ Re-queued {recovered} pending journal AI response(s)")
+    return recovered
+
+
+def wait_for_ai_response(entry_id, user_id, timeout):
+    """Block until the entry's AI response leaves the pending state or the timeout expires"""
+    db = get_db()
+    query = {'_id': ObjectId(entry_id), 'user_id': ObjectId(user_id)}
+    projection = {'ai_response': 1, 'ai_response_status': 1, 'ai_response_error': 1}
+    deadline = time.monotonic() + timeout
+
+    event = notifier.subscribe(entry_id)
+    try:
+        while True:
+            entry = db.journal_entries.find_one(query, projection)
+            if entry is None or entry.get('ai_response_status') != AI_RESPONSE_PENDING:
+                return entry
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return entry
+            # The job may finish in another process, so fall back to polling
+            event.wait(min(remaining, 2.0))
+            event.clear()
+    finally:
+        notifier.unsubscribe(entry_id)
@@ -0,0 +1,177 @@
+"""
+Journal search.
+
+Queries run against the ``journal_text_search`` text index on
+journal_entries (see INDEXES in models.database), which is prefixed with
+``user_id``: MongoDB only walks the searching user's postings, so query time
+grows with the matching entries rather than with every journal in the
+database. The index is kept current by MongoDB on every insert, update and
+delete.
+
+The query string uses MongoDB's text search syntax: words match any of them
+(stemmed, stop words ignored), ``"quoted phrases"`` must all appear, and
+``-word`` excludes entries. Results are ranked by text score (title matches
+weigh most, then tags, then content), newest first on ties.
+
+Each result carries a snippet of the content around the first match, with
+the character ranges to highlight; the client decides how to mark them up.
+"""
+
+import re
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+MAX_QUERY_LENGTH = 200
+SNIPPET_CHARS = 160
+
+# MongoDB's error code for a $text query without a text index (e.g. while it is being built)
+INDEX_NOT_FOUND = 27
+
+_TOKEN = re.compile(r'"([^"]*)"|(-?)([^\s"]+)')
+_SUFFIXES = ('ing', 'ed', 'es', 's', 'ly')
+
+
+class SearchError(ValueError):
+    """Raised for a query or filter the search cannot run"""
+
+
+def parse_query(query):
+    """(terms, phrases, excluded) of a text search query"""
+    terms, phrases, excluded = [], [], []
+    for phrase, negated, word in _TOKEN.findall(query):
+        if phrase.strip():
+            phrases.append(phrase.strip().lower())
+        elif word:
+            (excluded if negated else terms).append(word.lower())
+    return terms, phrases, excluded
+
+
+def _stem(term):
+    # Close enough to MongoDB's stemmer to find what it matched in the text
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def highlight_pattern(terms, phrases):
+    """Regex matching the words and phrases of a query in entry text, or None"""
+    parts = [re.escape(phrase) for phrase in phrases]
+    parts += [r'\b' + re.escape(_stem(term)) + r'\w*' for term in terms if len(term) > 1]
+    if not parts:
+        return None
+    # Longest alternatives first, so a phrase wins over the words inside it
+    parts.sort(key=len, reverse=True)
+    return re.compile('|'.join(parts), re.IGNORECASE)
+
+
+def snippet(text, pattern, length=SNIPPET_CHARS):
+    """(snippet, [[start, end], ...]) for the first match of ``pattern`` in ``text``"""
+    text = text or ''
+    match = pattern.search(text) if pattern is not None else None
+    if match is None:
+        cut = text[:length]
+        return (cut + '…' if len(text) > length else cut), []
+
+    # Start a little before the match, on a word boundary
+    start = max(match.start() - length // 4, 0)
+    if start:
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < match.start() else start
+    end = min(start + length, len(text))
+    prefix = '…' if start else ''
+    suffix = '…' if end < len(text) else ''
+
+    window = text[start:end]
+    highlights = [[m.start() + len(prefix), m.end() + len(prefix)] for m in pattern.finditer(window)]
+    return prefix + window + suffix, highlights
+
+
+def parse_date(value, name):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise SearchError(f'{name} must be an ISO 8601 date')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_filter(user_id, tag=None, mood=None, date_from=None, date_to=None):
+    """The non-text part of the query: the user plus any filters"""
+    query = {'user_id': ObjectId(user_id)}
+    if tag:
+        query['tags'] = tag
+    if mood:
+        query['mood'] = mood
+    if date_from or date_to:
+        query['timestamp'] = {}
+        if date_from:
+            query['timestamp']['$gte'] = date_from
+        if date_to:
+            query['timestamp']['$lte'] = date_to
+    return query
+
+
+def _result(entry, pattern):
+    text, highlights = snippet(entry.get('content'), pattern)
+    return {
+        'id': entry['_id'],
+        'title': entry.get('title', ''),
+        'mood': entry.get('mood', ''),
+        'tags': entry.get('tags', []),
+        'timestamp': entry.get('timestamp'),
+        'score': round(entry['score'], 4) if 'score' in entry else None,
+        'snippet': text,
+        'highlights': highlights
+    }
+
+
+def _search_by_scan(collection, base_filter, terms, phrases, excluded, skip, limit):
+    # Without the text index: match every word/phrase with regexes over this user's entries
+    conditions = []
+    for part in [re.escape(phrase) for phrase in phrases] + [r'\b' + re.escape(_stem(t)) for t in terms]:
+        regex = {'$regex': part, '$options': 'i'}
+        conditions.append({'$or': [{'title': regex}, {'content': regex}, {'tags': regex}]})
+    for term in excluded:
+        conditions.append({'content': {'$not': re.compile(r'\b' + re.escape(term), re.IGNORECASE)}})
+    query = dict(base_filter, **({'$and': conditions} if conditions else {}))
+    total = collection.count_documents(query)
+    cursor = collection.find(query, {'title': 1, 'content': 1, 'mood': 1, 'tags': 1, 'timestamp': 1})
+    return total, list(cursor.sort('timestamp', -1).skip(skip).limit(limit))
+
+
+def search_entries(db, user_id, query, tag=None, mood=None, date_from=None, date_to=None, skip=0, limit=20):
+    """(total, results, ranked) for ``query`` over the user's journal entries"""
+    query = (query or '').strip()
+    if not query:
+        raise SearchError('Search query is required')
+    if len(query) > MAX_QUERY_LENGTH:
+        raise SearchError(f'Search query must be at most {MAX_QUERY_LENGTH} characters')
+
+    terms, phrases, excluded = parse_query(query)
+    pattern = highlight_pattern(terms, phrases)
+    base_filter = build_filter(user_id, tag, mood, date_from, date_to)
+    text_filter = dict(base_filter, **{'$text': {'$search': query}})
+    collection = db.journal_entries
+
+    try:
+        total = collection.count_documents(text_filter)
+        cursor = collection.find(text_filter, {
+            'score': {'$meta': 'textScore'},
+            'title': 1, 'content': 1, 'mood': 1, 'tags': 1, 'timestamp': 1
+        }).sort([('score', {'$meta': 'textScore'}), ('timestamp', -1)]).skip(skip).limit(limit)
+        entries = list(cursor)
+        ranked = True
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+        print(f"⚠️  Journal text index unavailable, searching by scan: {e}")
+        total, entries = _search_by_scan(collection, base_filter, terms, phrases, excluded, skip, limit)
+        ranked = False
+
+    return total, [_result(entry, pattern) for entry in entries], ranked
@@ -0,0 +1,78 @@
+"""
+Flask JSON provider backed by orjson.
+
+Routes can hand MongoDB documents to ``jsonify`` as they come back from the
+driver: ObjectId becomes its hex string, datetime its ISO 8601 form (the same
+text ``.isoformat()`` gives for the naive UTC datetimes pymongo returns), and
+the other bson scalars their string or numeric value. Keys keep their
+insertion order instead of being sorted.
+
+Without orjson installed the standard library encoder is used with the same
+conversions.
+"""
+
+import datetime
+import uuid
+from decimal import Decimal
+
+from bson import Decimal128, ObjectId, Timestamp
+from bson.regex import Regex
+from flask.json.provider import DefaultJSONProvider
+
+from models.entries import Document
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def _default(value):
+    """Encode the types orjson (or json) does not handle natively"""
+    if isinstance(value, Document):
+        return value.to_dict()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    if isinstance(value, Timestamp):
+        return value.as_datetime().isoformat()
+    if isinstance(value, Regex):
+        return value.pattern
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes bson types and skips the Python json module when orjson is available"""
+
+    sort_keys = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._options = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', _default)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._options).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        # Hand orjson's bytes straight to the response instead of decoding and re-encoding
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_default, option=self._options)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,162 @@
+"""
+Bounded worker pool for bcrypt.
+
+bcrypt releases the GIL while it hashes, so a small thread pool lets logins
+and registrations use every core instead of serializing on the request thread.
+When more than ``max_queue_depth`` hashes are already waiting, new ones are
+rejected with PasswordHasherOverloaded and the route answers 503.
+
+Under gevent the pool uses real OS threads (gevent's threadpool), since a
+greenlet running bcrypt would block the whole worker.
+
+Run ``python -m services.password_hasher`` to time each cost on this machine.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+
+class PasswordHasherOverloaded(Exception):
+    """Raised when the hashing queue is full or a hash misses its deadline"""
+
+
+def _executor_class():
+    if 'gevent.monkey' in sys.modules:
+        from gevent.monkey import is_module_patched
+        if is_module_patched('threading'):
+            from gevent.threadpool import ThreadPoolExecutor
+            return ThreadPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor
+
+
+def hash_cost(password_hash):
+    """Cost factor of a bcrypt hash ($2b$12$... -> 12), or None if it cannot be read"""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    try:
+        return int(password_hash.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a bounded thread pool"""
+
+    def __init__(self, rounds=None, max_workers=None, max_queue_depth=None, timeout=None):
+        self.rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+        self.max_workers = max_workers or int(os.getenv('PASSWORD_HASH_WORKERS') or 0) or os.cpu_count() or 1
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else int(
+            os.getenv('PASSWORD_HASH_MAX_QUEUE') or self.max_workers * 4)
+        self.timeout = timeout or float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'hashes': 0, 'verifies': 0, 'rehashes': 0, 'shed': 0, 'timeouts': 0}
+
+    def _get_executor(self):
+        # Executor threads do not survive a fork, so build one per process
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = _executor_class()(
+                max_workers=self.max_workers,
+                thread_name_prefix='password-hash'
+            )
+            self._executor_pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def _run(self, fn, *args):
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _submit(self, stat, fn, *args):
+        with self._lock:
+            executor = self._get_executor()
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                self._stats['shed'] += 1
+                raise PasswordHasherOverloaded('Password hashing queue is full')
+            self._pending += 1
+            self._stats[stat] += 1
+            return executor.submit(self._run, fn, *args)
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PasswordHasherOverloaded('Password hashing timed out')
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` at the configured cost"""
+        salt = bcrypt.gensalt(self.rounds)
+        return self._wait(self._submit('hashes', bcrypt.hashpw, password.encode('utf-8'), salt))
+
+    def verify(self, password, password_hash):
+        """Whether ``password`` matches ``password_hash`` (at whatever cost it was made with)"""
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        return self._wait(self._submit('verifies', bcrypt.checkpw, password.encode('utf-8'), password_hash))
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def rehash_async(self, password, on_hashed):
+        """Hash ``password`` at the configured cost in the background and pass it to ``on_hashed``.
+
+        Returns False without queueing when the pool is busy; the next login tries again.
+        """
+        salt = bcrypt.gensalt(self.rounds)
+        try:
+            future = self._submit('rehashes', bcrypt.hashpw, password.encode('utf-8'), salt)
+        except PasswordHasherOverloaded:
+            return False
+
+        def done(finished):
+            try:
+                on_hashed(finished.result())
+            except Exception as e:
+                print(f"⚠️  Password rehash failed: {e}")
+
+        future.add_done_callback(done)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending, rounds=self.rounds, workers=self.max_workers)
+
+
+password_hasher = PasswordHasher()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time bcrypt at each cost factor on this machine')
+    parser.add_argument('--min-rounds', type=int, default=10)
+    parser.add_argument('--max-rounds', type=int, default=14)
+    parser.add_argument('--target-ms', type=float, default=250, help='Largest acceptable time per hash')
+    args = parser.parse_args()
+
+    suggested = args.min_rounds
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration-password', bcrypt.gensalt(rounds))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"  cost {rounds:2d}: {elapsed_ms:8.1f} ms")
+        if elapsed_ms <= args.target_ms:
+            suggested = rounds
+    print(f"Suggested BCRYPT_ROUNDS={suggested} (at most {args.target_ms:.0f} ms per hash)")
+
+
+if __name__ == '__main__':
+    main()
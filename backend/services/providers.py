@@ -0,0 +1,99 @@
+"""
+Lazily created services.
+
+Heavy SDKs (spotipy, google-generativeai) are imported by a provider's factory
+instead of at module import, so the app starts serving - and answers health
+checks - before they load. ``warm_up_providers`` loads them in a background
+thread once the worker is running; a request that needs one first just waits
+for it.
+"""
+
+import os
+import threading
+import time
+
+# Every provider, so warm-up and the fork hook can reach them
+_providers = []
+
+
+class LazyProvider:
+    """Create a service with ``factory`` on first use, once per process.
+
+    Attribute access is forwarded to the service, so a provider can stand in
+    for the object it creates. The factory may return None (e.g. missing
+    credentials); that result is cached like any other.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        _providers.append(self)
+
+    @property
+    def loaded(self):
+        return self._pid == os.getpid()
+
+    def get(self):
+        # A service created before a fork (e.g. a gRPC channel) belongs to the parent
+        if self._pid == os.getpid():
+            return self._value
+        with self._lock:
+            if self._pid != os.getpid():
+                start = time.perf_counter()
+                self._value = self._factory()
+                self.load_seconds = time.perf_counter() - start
+                self._pid = os.getpid()
+                if self._value is None:
+                    print(f"⚠️  {self.name} unavailable (pid {os.getpid()})")
+                else:
+                    print(f"✅ {self.name} loaded in {self.load_seconds * 1000:.0f} ms (pid {os.getpid()})")
+        return self._value
+
+    def __getattr__(self, attr):
+        # Private names are never forwarded (copy and pickle probe them before __init__)
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # A warm-up thread may have held a lock at fork time; the child gets fresh ones
+    for provider in _providers:
+        provider._reset_lock()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _warm_up():
+    for provider in list(_providers):
+        try:
+            provider.get()
+        except Exception as e:
+            print(f"⚠️  Failed to warm up {provider.name}: {e}")
+
+
+def warm_up_providers():
+    """Load every provider in a background thread (set LAZY_WARM_UP=false to load on first use only)"""
+    if os.getenv('LAZY_WARM_UP', 'true').lower() != 'true':
+        return None
+    thread = threading.Thread(target=_warm_up, name='provider-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def provider_status():
+    """Load state of each provider in this process"""
+    return {
+        provider.name: {
+            'loaded': provider.loaded,
+            'load_ms': round(provider.load_seconds * 1000, 1) if provider.loaded else None
+        }
+        for provider in _providers
+    }
@@ -0,0 +1,396 @@
+"""
+Request metrics in Prometheus text format.
+
+Every OS thread records into its own accumulator (plain dicts, no locks on the
+request path); a scrape sums all accumulators. An accumulator is only ever
+written by the thread that owns it, and a thread id reused after its thread
+exits just keeps adding to the same totals. Under gevent, greenlets share
+their OS thread's accumulator: they cannot interleave inside the recording
+code, which never yields.
+
+With several gunicorn workers a scrape is answered by one of them, so each
+worker also flushes a snapshot of its totals to METRICS_DIR every
+METRICS_FLUSH_SECONDS (gunicorn.conf.py sets the directory up). A scrape sums
+every worker's snapshot, so counters are totals for the whole server and do
+not jump between workers. Counters of workers that have exited stay in the
+sum; their gauges (in-flight requests, pool connections) are dropped. Without
+METRICS_DIR, e.g. under the Flask dev server, a scrape reports this process.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from flask import g, request
+
+from services.db_metrics import LATENCY_BUCKETS_MS, pool_metrics, command_metrics
+
+if 'gevent.monkey' in sys.modules:
+    from gevent.monkey import get_original
+    _thread_id = get_original('_thread', 'get_ident')
+else:
+    _thread_id = threading.get_ident
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Requests that matched no route share one label set instead of one per path
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+SNAPSHOT_PREFIX = 'metrics-'
+
+
+class _Accumulator:
+    """One thread's counters, keyed by label tuples"""
+
+    __slots__ = ('requests', 'errors', 'exceptions', 'durations', 'sizes', 'started', 'finished')
+
+    def __init__(self):
+        self.requests = {}
+        self.errors = {}
+        self.exceptions = {}
+        self.durations = {}
+        self.sizes = {}
+        self.started = {}
+        self.finished = {}
+
+
+def _observe(histograms, key, buckets, value):
+    # Per-bucket counts, then the +Inf count, then the sum
+    counts = histograms.get(key)
+    if counts is None:
+        counts = histograms[key] = [0] * (len(buckets) + 2)
+    index = 0
+    for bound in buckets:
+        if value <= bound:
+            break
+        index += 1
+    counts[index] += 1
+    counts[-1] += value
+
+
+def _merge_counts(target, source):
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+
+
+def _merge_histograms(target, source):
+    for key, counts in source.items():
+        merged = target.get(key)
+        if merged is None:
+            target[key] = list(counts)
+        else:
+            for i, count in enumerate(counts):
+                merged[i] += count
+
+
+def _pairs(values):
+    # JSON has no tuple keys
+    return [[list(key), value] for key, value in values.items()]
+
+
+def _from_pairs(pairs):
+    return {tuple(key): value for key, value in pairs}
+
+
+def _merge_ms_histogram(target, snapshot):
+    for bucket, count in snapshot['buckets'].items():
+        target['buckets'][bucket] = target['buckets'].get(bucket, 0) + count
+    target['sum_ms'] += snapshot['sum_ms']
+
+
+def _empty_ms_histogram():
+    return {'buckets': {}, 'sum_ms': 0.0}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _View:
+    """Metrics summed over one or more process snapshots, as render() reads them"""
+
+    def __init__(self):
+        self.counts = _Accumulator()
+        self.pool_servers = {}
+        self.checkout_wait = _empty_ms_histogram()
+        self.commands = {}
+
+    def add(self, snapshot, live=True):
+        counts = self.counts
+        _merge_counts(counts.requests, _from_pairs(snapshot['requests']))
+        _merge_counts(counts.errors, _from_pairs(snapshot['errors']))
+        _merge_counts(counts.exceptions, _from_pairs(snapshot['exceptions']))
+        _merge_histograms(counts.durations, _from_pairs(snapshot['durations']))
+        _merge_histograms(counts.sizes, _from_pairs(snapshot['sizes']))
+        _merge_ms_histogram(self.checkout_wait, snapshot['checkout_wait'])
+        for command, histogram in snapshot['commands'].items():
+            _merge_ms_histogram(self.commands.setdefault(command, _empty_ms_histogram()), histogram)
+        if not live:
+            # An exited worker holds no requests or connections
+            return
+        _merge_counts(counts.started, _from_pairs(snapshot['started']))
+        _merge_counts(counts.finished, _from_pairs(snapshot['finished']))
+        for server, (size, checked_out) in snapshot['pool_servers'].items():
+            totals = self.pool_servers.setdefault(server, [0, 0])
+            totals[0] += size
+            totals[1] += checked_out
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _le(bound):
+    return 'le="+Inf"' if bound is None else 'le="%g"' % bound
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class RequestMetrics:
+    """Per-endpoint request counters, latency and size histograms and in-flight gauges"""
+
+    ENDPOINT_LABELS = ('blueprint', 'endpoint', 'method')
+
+    def __init__(self):
+        self._accumulators = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _local(self):
+        ident = _thread_id()
+        accumulator = self._accumulators.get(ident)
+        if accumulator is None:
+            # Only the first request on each thread takes the lock
+            with self._lock:
+                accumulator = self._accumulators.setdefault(ident, _Accumulator())
+        return accumulator
+
+    def _endpoint_key(self):
+        return (request.blueprint or '', request.endpoint or UNMATCHED_ENDPOINT, request.method)
+
+    def _before_request(self):
+        key = self._endpoint_key()
+        g._metrics_request = (key, time.perf_counter())
+        started = self._local().started
+        started[key] = started.get(key, 0) + 1
+
+    def _after_request(self, response):
+        g._metrics_response = (response.status_code, response.content_length)
+        return response
+
+    def _teardown_request(self, error=None):
+        started_request = g.pop('_metrics_request', None)
+        if started_request is None:
+            return
+        key, started_at = started_request
+        duration = time.perf_counter() - started_at
+        status, size = g.pop('_metrics_response', (500, None))
+
+        accumulator = self._local()
+        status_key = key + (str(status),)
+        accumulator.requests[status_key] = accumulator.requests.get(status_key, 0) + 1
+        accumulator.finished[key] = accumulator.finished.get(key, 0) + 1
+        _observe(accumulator.durations, key, DURATION_BUCKETS, duration)
+        # Streamed responses have no length up front
+        if size is not None:
+            _observe(accumulator.sizes, key[:2], SIZE_BUCKETS, size)
+        if status >= 400:
+            error_key = key[:2] + (f'{status // 100}xx',)
+            accumulator.errors[error_key] = accumulator.errors.get(error_key, 0) + 1
+        if error is not None:
+            exception_key = key[:2] + (type(error).__name__,)
+            accumulator.exceptions[exception_key] = accumulator.exceptions.get(exception_key, 0) + 1
+
+    def _merged(self):
+        merged = _Accumulator()
+        for accumulator in list(self._accumulators.values()):
+            # dict() copies in one step, so a thread adding a key cannot break the merge
+            _merge_counts(merged.requests, dict(accumulator.requests))
+            _merge_counts(merged.errors, dict(accumulator.errors))
+            _merge_counts(merged.exceptions, dict(accumulator.exceptions))
+            _merge_counts(merged.started, dict(accumulator.started))
+            _merge_counts(merged.finished, dict(accumulator.finished))
+            _merge_histograms(merged.durations, dict(accumulator.durations))
+            _merge_histograms(merged.sizes, dict(accumulator.sizes))
+        return merged
+
+    def snapshot(self):
+        """This process's totals as a JSON-serializable dict"""
+        merged = self._merged()
+        pool = pool_metrics.snapshot()
+        return {
+            'pid': os.getpid(),
+            'requests': _pairs(merged.requests),
+            'errors': _pairs(merged.errors),
+            'exceptions': _pairs(merged.exceptions),
+            'started': _pairs(merged.started),
+            'finished': _pairs(merged.finished),
+            'durations': _pairs(merged.durations),
+            'sizes': _pairs(merged.sizes),
+            'pool_servers': {
+                server: [stats['size'], stats['checked_out']] for server, stats in pool['servers'].items()
+            },
+            'checkout_wait': {
+                'buckets': pool['checkout_wait_ms']['buckets'], 'sum_ms': pool['checkout_wait_ms']['sum_ms']
+            },
+            'commands': {
+                command: {'buckets': stats['buckets'], 'sum_ms': stats['sum_ms']}
+                for command, stats in command_metrics.snapshot().items()
+            }
+        }
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (no-op when unset)"""
+        if not METRICS_DIR:
+            return
+        path = os.path.join(METRICS_DIR, f'{SNAPSHOT_PREFIX}{os.getpid()}.json')
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            with open(path + '.tmp', 'w') as snapshot_file:
+                json.dump(self.snapshot(), snapshot_file)
+            # Readers never see a half-written file
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"⚠️  Failed to write metrics snapshot: {e}")
+
+    def start_flusher(self):
+        """Flush this process's snapshot every METRICS_FLUSH_SECONDS (safe to call more than once)"""
+        with self._lock:
+            # Threads do not survive a fork, so start one in each worker process
+            if not METRICS_DIR or self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            self.flush()
+
+    def _view(self):
+        view = _View()
+        own = self.snapshot()
+        view.add(own)
+        if not METRICS_DIR:
+            return view
+        try:
+            names = os.listdir(METRICS_DIR)
+        except OSError:
+            names = []
+        for name in names:
+            if not (name.startswith(SNAPSHOT_PREFIX) and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            # This process is counted live, not from its last flush
+            if snapshot['pid'] != own['pid']:
+                view.add(snapshot, live=_pid_alive(snapshot['pid']))
+        return view
+
+    def render(self):
+        """All metrics in Prometheus text exposition format, summed over every worker"""
+        view = self._view()
+        merged = view.counts
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def counters(name, label_names, values):
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{_labels(label_names, key)} {_format_number(value)}')
+
+        def histograms(name, label_names, buckets, values):
+            for key, counts in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(label_names, key, _le(bound))} {cumulative}')
+                cumulative += counts[len(buckets)]
+                lines.append(f'{name}_bucket{_labels(label_names, key, _le(None))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, key)} {_format_number(counts[-1])}')
+                lines.append(f'{name}_count{_labels(label_names, key)} {cumulative}')
+
+        header('http_requests_total', 'counter', 'HTTP requests by endpoint and status.')
+        counters('http_requests_total', self.ENDPOINT_LABELS + ('status',), merged.requests)
+
+        header('http_request_errors_total', 'counter', 'HTTP responses with a 4xx or 5xx status.')
+        counters('http_request_errors_total', ('blueprint', 'endpoint', 'class'), merged.errors)
+
+        header('http_request_exceptions_total', 'counter', 'Requests that ended with an unhandled exception.')
+        counters('http_request_exceptions_total', ('blueprint', 'endpoint', 'exception'), merged.exceptions)
+
+        header('http_requests_in_flight', 'gauge', 'Requests currently being served.')
+        in_flight = {key: count - merged.finished.get(key, 0) for key, count in merged.started.items()}
+        counters('http_requests_in_flight', self.ENDPOINT_LABELS, in_flight)
+
+        header('http_request_duration_seconds', 'histogram', 'Time from routing to the end of the response.')
+        histograms('http_request_duration_seconds', self.ENDPOINT_LABELS, DURATION_BUCKETS, merged.durations)
+
+        header('http_response_size_bytes', 'histogram', 'Response body size.')
+        histograms('http_response_size_bytes', ('blueprint', 'endpoint'), SIZE_BUCKETS, merged.sizes)
+
+        self._render_mongo(view, lines, header, counters)
+        return '\n'.join(lines) + '\n'
+
+    def _render_mongo(self, view, lines, header, counters):
+        header('mongodb_pool_connections', 'gauge', 'Open connections in the MongoDB pool.')
+        counters('mongodb_pool_connections', ('server',),
+                 {(server,): totals[0] for server, totals in view.pool_servers.items()})
+        header('mongodb_pool_checked_out', 'gauge', 'MongoDB connections currently in use.')
+        counters('mongodb_pool_checked_out', ('server',),
+                 {(server,): totals[1] for server, totals in view.pool_servers.items()})
+
+        header('mongodb_pool_checkout_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection.')
+        self._render_ms_histogram(lines, 'mongodb_pool_checkout_wait_seconds', '', view.checkout_wait)
+
+        header('mongodb_command_duration_seconds', 'histogram', 'MongoDB command latency by command name.')
+        for command, stats in sorted(view.commands.items()):
+            self._render_ms_histogram(lines, 'mongodb_command_duration_seconds', f'command="{_escape(command)}"', stats)
+
+    def _render_ms_histogram(self, lines, name, labels, snapshot):
+        # db_metrics histograms are in milliseconds with non-cumulative buckets
+        prefix = labels + ',' if labels else ''
+        cumulative = 0
+        for bound in LATENCY_BUCKETS_MS:
+            cumulative += snapshot['buckets'].get(f'le_{bound}', 0)
+            lines.append(f'{name}_bucket{{{prefix}{_le(bound / 1000)}}} {cumulative}')
+        cumulative += snapshot['buckets'].get('le_inf', 0)
+        lines.append(f'{name}_bucket{{{prefix}{_le(None)}}} {cumulative}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {_format_number(snapshot["sum_ms"] / 1000)}')
+        lines.append(f'{name}_count{suffix} {cumulative}')
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,166 @@
+"""
+Markdown stripping for model responses.
+
+``clean_response`` gives the same output as the original five ``re.sub``
+passes (bold, italic and code markers removed, whitespace collapsed) without
+rescanning the text for each pattern. Because none of those patterns cross a
+newline, the passes reduce to a per-line rule over the marker runs:
+
+* ``**`` markers pair up left to right; an odd one out is left for the
+  single-star pass.
+* The stars that remain pair up left to right, so at most one survives:
+  the last remaining star, when their count is odd.
+* Backticks pair up the same way; an odd last backtick survives.
+
+``ResponseCleaner`` applies the same rule to a stream of chunks, emitting text
+as soon as no later chunk can change it.
+"""
+
+import re
+
+_STAR_RUN_OR_TICK_RE = re.compile(r'\*+|`')
+_DELETE_MARKERS = str.maketrans('', '', '*`')
+
+
+class _LineMarkers:
+    """Running counts of the markers seen so far on one line"""
+
+    def __init__(self):
+        self.singles = 0
+        self.last_single = -1
+        self.doubles = 0
+        self.last_double = -1
+        self.ticks = 0
+        self.last_tick = -1
+
+    def scan(self, line, start, end):
+        for match in _STAR_RUN_OR_TICK_RE.finditer(line, start, end):
+            position = match.start()
+            length = match.end() - position
+            if line[position] == '`':
+                self.ticks += 1
+                self.last_tick = position
+                continue
+            if length > 1:
+                self.doubles += length // 2
+                self.last_double = position + (length // 2 - 1) * 2
+            if length % 2:
+                self.singles += 1
+                self.last_single = match.end() - 1
+
+    def kept(self):
+        """Positions of the markers that survive once the line is complete"""
+        kept = []
+        if self.singles % 2:
+            star = self.last_single
+            if self.doubles % 2:
+                star = max(star, self.last_double + 1)
+            kept.append(star)
+        if self.ticks % 2:
+            kept.append(self.last_tick)
+        kept.sort()
+        return kept
+
+    def undecided_from(self, end):
+        """First position whose output may still depend on the rest of the line"""
+        positions = [end]
+        if self.singles % 2:
+            positions.append(self.last_single)
+        if self.doubles % 2:
+            positions.append(self.last_double)
+        if self.ticks % 2:
+            positions.append(self.last_tick)
+        return min(positions)
+
+
+def _render(line, start, end, kept):
+    """Copy line[start:end] with every marker removed except those in ``kept``"""
+    pieces = []
+    position = start
+    for index in kept:
+        if start <= index < end:
+            pieces.append(line[position:index].translate(_DELETE_MARKERS))
+            pieces.append(line[index])
+            position = index + 1
+    pieces.append(line[position:end].translate(_DELETE_MARKERS))
+    return ''.join(pieces)
+
+
+def _strip_line(line):
+    # Stars pair off two at a time in both passes, so an even count means none survive
+    if not line.count('*') % 2 and not line.count('`') % 2:
+        return line.translate(_DELETE_MARKERS)
+    markers = _LineMarkers()
+    markers.scan(line, 0, len(line))
+    return _render(line, 0, len(line), markers.kept())
+
+
+def clean_response(response_text):
+    """Clean and format AI response"""
+    if '*' in response_text or '`' in response_text:
+        response_text = '\n'.join(_strip_line(line) for line in response_text.split('\n'))
+    # str.split() breaks on the same characters as \s, and drops them at both ends like strip()
+    return ' '.join(response_text.split())
+
+
+class ResponseCleaner:
+    """Incremental clean_response for streamed responses.
+
+    ``feed`` returns the cleaned text that is final so far and ``finish``
+    returns the rest; joined together they equal ``clean_response`` of the
+    whole response. Text after an unpaired marker is held back until the
+    marker is closed or its line ends.
+    """
+
+    def __init__(self):
+        self._line = ''
+        self._scanned = 0
+        self._emitted = 0
+        self._markers = _LineMarkers()
+        self._started = False
+        self._pending_space = False
+
+    def feed(self, chunk):
+        self._line += chunk
+        pieces = []
+
+        newline = self._line.find('\n', self._scanned)
+        while newline != -1:
+            self._markers.scan(self._line, self._scanned, newline)
+            pieces.append(_render(self._line, self._emitted, newline, self._markers.kept()))
+            pieces.append('\n')
+            self._line = self._line[newline + 1:]
+            self._scanned = self._emitted = 0
+            self._markers = _LineMarkers()
+            newline = self._line.find('\n')
+
+        # A star run at the end of the buffer may continue in the next chunk
+        end = len(self._line.rstrip('*'))
+        self._markers.scan(self._line, self._scanned, end)
+        self._scanned = end
+        safe = self._markers.undecided_from(end)
+        if safe > self._emitted:
+            pieces.append(_render(self._line, self._emitted, safe, ()))
+            self._emitted = safe
+
+        return self._collapse(''.join(pieces))
+
+    def finish(self):
+        self._markers.scan(self._line, self._scanned, len(self._line))
+        text = _render(self._line, self._emitted, len(self._line), self._markers.kept())
+        cleaned = self._collapse(text)
+        self.__init__()
+        return cleaned
+
+    def _collapse(self, text):
+        """Collapse whitespace across chunk boundaries, dropping it at either end"""
+        if not text:
+            return ''
+        core = ' '.join(text.split())
+        if not core:
+            self._pending_space = True
+            return ''
+        separator = ' ' if self._started and (self._pending_space or text[0].isspace()) else ''
+        self._started = True
+        self._pending_space = text[-1].isspace()
+        return separator + core
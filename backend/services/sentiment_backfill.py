@@ -0,0 +1,252 @@
+"""
+Sentiment backfill for historical journal entries and vent posts.
+
+Streams documents that have no ``sentiment`` yet in ``_id`` order, packs as
+many texts as fit a token budget into each prompt, and bulk-writes the
+per-item results back. Texts the local lexicon scores confidently are written
+directly and never reach the model. Progress is checkpointed by last ``_id`` so an
+interrupted run resumes where it stopped. Items the model skipped are
+retried (up to SENTIMENT_BACKFILL_MAX_ATTEMPTS) when a run is started
+with --reset.
+
+When the model is unavailable, times out or the gateway sheds the call, the
+same batch is retried with exponential backoff; after
+SENTIMENT_BACKFILL_MAX_RETRIES failures in a row the run stops, and the next
+run resumes from the checkpoint, which never passes an unanalyzed batch.
+
+Run from the backend directory:
+    python -m services.sentiment_backfill --collection journal_entries
+    python -m services.sentiment_backfill --collection vent_posts --reset
+"""
+
+import os
+import time
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from models.database import get_db
+from services import sentiment_lexicon
+from services.ai_gateway import InferenceUnavailable
+from services.ai_service import analyze_sentiment_batch, SENTIMENT_LOCAL_CONFIDENCE
+
+# Collections that can be backfilled, with the field holding their text
+BACKFILL_COLLECTIONS = {
+    'journal_entries': 'content',
+    'vent_posts': 'content'
+}
+
+# Rough prompt budget; ~4 characters per token is close enough for packing
+TOKEN_BUDGET = int(os.getenv('SENTIMENT_BATCH_TOKEN_BUDGET', 3000))
+MAX_ITEMS_PER_CALL = int(os.getenv('SENTIMENT_BATCH_MAX_ITEMS', 25))
+CALLS_PER_MINUTE = float(os.getenv('SENTIMENT_BACKFILL_CALLS_PER_MINUTE', 30))
+MAX_ATTEMPTS_PER_ITEM = int(os.getenv('SENTIMENT_BACKFILL_MAX_ATTEMPTS', 3))
+RETRY_SECONDS = float(os.getenv('SENTIMENT_BACKFILL_RETRY_SECONDS', 30))
+MAX_RETRY_SECONDS = 600
+MAX_RETRIES = int(os.getenv('SENTIMENT_BACKFILL_MAX_RETRIES', 6))
+FETCH_BATCH_SIZE = 200
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 200
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(docs, text_field, token_budget=TOKEN_BUDGET, max_items=MAX_ITEMS_PER_CALL):
+    """Group documents into prompt-sized batches of (id, text) pairs"""
+    item_budget = token_budget - PROMPT_OVERHEAD_TOKENS
+    batch, used = [], 0
+    for doc in docs:
+        # Overlong texts are truncated rather than sent alone past the budget
+        text = (doc.get(text_field) or '')[:item_budget * CHARS_PER_TOKEN]
+        cost = estimate_tokens(text)
+        if batch and (used + cost > item_budget or len(batch) >= max_items):
+            yield batch
+            batch, used = [], 0
+        batch.append((doc['_id'], text))
+        used += cost
+    if batch:
+        yield batch
+
+
+class RateLimiter:
+    """Spaces calls evenly to stay under a calls-per-minute limit"""
+
+    def __init__(self, calls_per_minute):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute > 0 else 0
+        self._next_call = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next_call > now:
+            time.sleep(self._next_call - now)
+        self._next_call = max(now, self._next_call) + self.interval
+
+
+class SentimentBackfill:
+    """Resumable sentiment backfill over one collection"""
+
+    def __init__(self, db, collection_name, calls_per_minute=CALLS_PER_MINUTE,
+                 on_progress=None):
+        if collection_name not in BACKFILL_COLLECTIONS:
+            raise ValueError(f"Unsupported collection '{collection_name}'")
+        self.db = db
+        self.collection = db[collection_name]
+        self.text_field = BACKFILL_COLLECTIONS[collection_name]
+        self.checkpoint_id = f"sentiment:{collection_name}"
+        self.rate_limiter = RateLimiter(calls_per_minute)
+        self.on_progress = on_progress
+        self.stats = {'analyzed': 0, 'local': 0, 'failed': 0, 'calls': 0, 'retries': 0}
+
+    def load_checkpoint(self):
+        checkpoint = self.db.backfill_checkpoints.find_one({'_id': self.checkpoint_id})
+        return checkpoint.get('last_id') if checkpoint else None
+
+    def save_checkpoint(self, last_id):
+        self.db.backfill_checkpoints.update_one(
+            {'_id': self.checkpoint_id},
+            {'$set': {'last_id': last_id, 'stats': self.stats, 'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+
+    def reset(self):
+        self.db.backfill_checkpoints.delete_one({'_id': self.checkpoint_id})
+
+    def _pending_docs(self, after_id):
+        """Yield unanalyzed documents in _id order, re-querying per page"""
+        query = {
+            'sentiment': {'$exists': False},
+            'sentiment_attempts': {'$not': {'$gte': MAX_ATTEMPTS_PER_ITEM}},
+            self.text_field: {'$nin': [None, '']}
+        }
+        while True:
+            page_query = dict(query)
+            if after_id is not None:
+                page_query['_id'] = {'$gt': after_id}
+            # Short pages keep cursors from idling out during rate-limit sleeps
+            page = list(self.collection.find(page_query, {self.text_field: 1})
+                        .sort('_id', 1)
+                        .limit(FETCH_BATCH_SIZE))
+            if not page:
+                return
+            for doc in page:
+                yield doc
+            after_id = page[-1]['_id']
+
+    def _resolve_locally(self, docs):
+        """Store lexicon results for confident documents and yield the rest for the model"""
+        page = []
+        for doc in docs:
+            page.append(doc)
+            if len(page) >= FETCH_BATCH_SIZE:
+                yield from self._score_page(page)
+                page = []
+        if page:
+            yield from self._score_page(page)
+
+    def _score_page(self, page):
+        results = sentiment_lexicon.score_batch([doc.get(self.text_field) for doc in page])
+        now = datetime.utcnow()
+        operations = []
+        unresolved = []
+        for doc, result in zip(page, results):
+            if result['confidence'] >= SENTIMENT_LOCAL_CONFIDENCE:
+                operations.append(UpdateOne(
+                    {'_id': doc['_id']},
+                    {'$set': {'sentiment': result, 'sentiment_analyzed_at': now}}
+                ))
+            else:
+                unresolved.append(doc)
+        # Written before any document of the page is handed on: run() checkpoints
+        # past the ids it receives, so a later id must never be saved ahead of these
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+            self.stats['local'] += len(operations)
+        yield from unresolved
+
+    def _analyze(self, batch):
+        """Model results for ``batch``, backing off while inference is unavailable; None if it stays so"""
+        delay = RETRY_SECONDS
+        for retry in range(MAX_RETRIES + 1):
+            self.rate_limiter.wait()
+            self.stats['calls'] += 1
+            try:
+                return analyze_sentiment_batch(batch)
+            except InferenceUnavailable as e:
+                if retry == MAX_RETRIES:
+                    print(f"❌ Sentiment model still unavailable after {MAX_RETRIES} retries, stopping: {e}")
+                    return None
+                print(f"⚠️  Sentiment model unavailable ({e}), retrying batch in {delay:.0f}s")
+                self.stats['retries'] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+    def run(self, max_calls=None):
+        """Process pending documents until done (or ``max_calls`` model calls)"""
+        last_id = self.load_checkpoint()
+        pending = self._resolve_locally(self._pending_docs(last_id))
+        for batch in pack_batches(pending, self.text_field):
+            if max_calls is not None and self.stats['calls'] >= max_calls:
+                break
+
+            results = self._analyze(batch)
+            if results is None:
+                # The checkpoint still points before this batch, so the next run retries it
+                break
+
+            now = datetime.utcnow()
+            operations = []
+            for item_id, _ in batch:
+                result = results.get(item_id)
+                if result is not None:
+                    operations.append(UpdateOne(
+                        {'_id': item_id},
+                        {'$set': {'sentiment': result, 'sentiment_analyzed_at': now}}
+                    ))
+                else:
+                    # Counted so a --reset run retries it, up to MAX_ATTEMPTS_PER_ITEM
+                    operations.append(UpdateOne({'_id': item_id}, {'$inc': {'sentiment_attempts': 1}}))
+            self.collection.bulk_write(operations, ordered=False)
+
+            self.stats['analyzed'] += len(results)
+            self.stats['failed'] += len(batch) - len(results)
+            last_id = batch[-1][0]
+            self.save_checkpoint(last_id)
+            if self.on_progress:
+                self.on_progress(self.stats, last_id)
+
+        return self.stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from dotenv import load_dotenv
+    from flask import Flask
+
+    from models.database import init_db
+
+    parser = argparse.ArgumentParser(description='Backfill sentiment on historical entries')
+    parser.add_argument('--collection', choices=sorted(BACKFILL_COLLECTIONS), default='journal_entries')
+    parser.add_argument('--reset', action='store_true', help='Ignore the saved checkpoint and start over')
+    parser.add_argument('--max-calls', type=int, default=None, help='Stop after this many model calls')
+    args = parser.parse_args()
+
+    load_dotenv()
+    app = Flask(__name__)
+    app.config['MONGODB_URI'] = os.getenv('MONGODB_URI')
+    init_db(app)
+    if get_db() is None:
+        raise SystemExit('Database not available')
+
+    backfill = SentimentBackfill(
+        get_db(),
+        args.collection,
+        on_progress=lambda stats, last_id: print(
+            f"analyzed={stats['analyzed']} local={stats['local']} failed={stats['failed']} calls={stats['calls']} retries={stats['retries']} last_id={last_id}"
+        )
+    )
+    if args.reset:
+        backfill.reset()
+    print(backfill.run(max_calls=args.max_calls))
@@ -0,0 +1,278 @@
+"""
+Local lexicon-based sentiment scorer, in the style of VADER.
+
+Scores text against a precompiled word -> valence map with negation,
+booster/dampener, "but" and emphasis (caps, exclamation) rules, and returns
+the same schema as ai_service.analyze_sentiment plus a ``confidence`` used to
+decide whether the LLM is worth calling. Batch scoring looks words up with
+``map`` over the vocabulary dict and reduces per-text sums with NumPy when it
+is installed.
+"""
+
+import math
+import re
+import string
+
+# Optional NumPy import - graceful fallback to pure Python if not available
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Word valences on VADER's -4..+4 scale
+LEXICON = {
+    # Positive
+    'good': 1.9, 'great': 3.1, 'amazing': 2.8, 'awesome': 3.1, 'wonderful': 2.7,
+    'fantastic': 2.6, 'excellent': 2.7, 'happy': 2.7, 'happier': 2.4, 'happiness': 2.6,
+    'joy': 2.8, 'joyful': 2.9, 'glad': 2.0, 'love': 3.2, 'loved': 2.9, 'loving': 2.9,
+    'lovely': 2.8, 'like': 1.5, 'liked': 1.8, 'enjoy': 2.2, 'enjoyed': 2.3, 'fun': 2.3,
+    'excited': 2.8, 'exciting': 2.2, 'calm': 1.3, 'calmer': 1.5, 'peaceful': 2.2,
+    'relaxed': 2.2, 'relaxing': 2.2, 'relieved': 1.8, 'relief': 1.7, 'grateful': 2.4,
+    'thankful': 2.2, 'gratitude': 2.3, 'hope': 1.9, 'hopeful': 2.3, 'proud': 2.1,
+    'confident': 2.2, 'strong': 1.5, 'better': 1.9, 'best': 3.2, 'nice': 1.8,
+    'beautiful': 2.9, 'blessed': 2.9, 'content': 1.5, 'satisfied': 1.8, 'comfortable': 1.5,
+    'energized': 2.1, 'motivated': 2.0, 'productive': 1.8, 'accomplished': 2.2,
+    'success': 2.7, 'successful': 2.8, 'win': 2.8, 'won': 2.7, 'laugh': 2.6,
+    'laughed': 2.5, 'smile': 1.5, 'smiled': 1.8, 'cheerful': 2.5, 'optimistic': 2.1,
+    'safe': 1.9, 'supported': 2.0, 'inspired': 2.2, 'refreshed': 2.0,
+    'rested': 1.4, 'fine': 0.8, 'okay': 0.9, 'ok': 0.9, 'positive': 2.3, 'kind': 2.4,
+    'friend': 2.2, 'friends': 2.1, 'fresh': 1.3, 'support': 1.7, 'helpful': 1.8,
+    'healing': 1.5, 'heal': 1.4, 'progress': 1.5, 'improve': 1.9, 'improved': 2.1,
+    'celebrate': 2.7, 'delighted': 2.9, 'thrilled': 2.9, 'pleased': 1.9,
+    # Negative
+    'bad': -2.5, 'terrible': -2.9, 'awful': -2.8, 'horrible': -2.9, 'worse': -2.1,
+    'worst': -3.1, 'sad': -2.1, 'sadness': -1.9, 'unhappy': -1.8, 'depressed': -2.3,
+    'depression': -2.7, 'down': -0.9, 'low': -1.1, 'lonely': -1.5, 'alone': -1.0,
+    'cry': -2.1, 'cried': -1.6, 'crying': -2.1, 'tears': -0.9, 'hurt': -2.4,
+    'pain': -2.3, 'painful': -2.4, 'angry': -2.3, 'anger': -2.7, 'mad': -2.2,
+    'furious': -2.7, 'annoyed': -1.6, 'irritated': -1.8, 'frustrated': -2.4,
+    'frustrating': -1.9, 'hate': -2.7, 'hated': -3.2, 'anxious': -1.0, 'anxiety': -0.7,
+    'worried': -1.2, 'worry': -1.9, 'nervous': -1.1, 'scared': -2.2, 'afraid': -2.2,
+    'fear': -2.2, 'panic': -2.3, 'stressed': -1.4, 'stress': -1.8, 'stressful': -2.0,
+    'overwhelmed': -1.5, 'exhausted': -1.5, 'tired': -1.9, 'drained': -1.5,
+    'hopeless': -2.0, 'helpless': -2.0, 'worthless': -1.9, 'useless': -1.8,
+    'empty': -0.8, 'numb': -1.3, 'guilty': -1.8, 'guilt': -1.1, 'ashamed': -2.1,
+    'shame': -2.1, 'disappointed': -1.9, 'disappointing': -2.2, 'upset': -1.6,
+    'miserable': -2.2, 'broken': -2.1, 'lost': -1.3, 'confused': -1.3, 'failed': -2.3,
+    'failure': -2.3, 'fail': -2.5, 'sick': -2.3, 'ill': -1.8, 'struggle': -1.6,
+    'struggling': -1.6, 'difficult': -1.5, 'hard': -0.4, 'problem': -1.7, 'problems': -1.7,
+    'wrong': -2.1, 'bored': -1.1, 'boring': -1.3, 'jealous': -2.0, 'insecure': -1.8,
+    'rejected': -2.2, 'ignored': -1.4, 'grief': -2.2, 'grieving': -2.3, 'loss': -1.3,
+    'miss': -0.6, 'missed': -1.2, 'regret': -1.8, 'sorry': -0.3, 'dread': -2.2,
+    'terrified': -3.0, 'suffering': -2.1, 'trauma': -2.3, 'burden': -1.9,
+    'disaster': -3.1, 'unfair': -2.1, 'crisis': -3.1, 'die': -2.9,
+    'dead': -3.3, 'kill': -3.7, 'suicide': -3.5, 'insomnia': -1.6, 'restless': -1.1,
+}
+
+# Words that scale the valence of the word after them
+BOOSTERS = {
+    'very': 0.293, 'really': 0.293, 'so': 0.293, 'extremely': 0.293, 'incredibly': 0.293,
+    'absolutely': 0.293, 'totally': 0.293, 'completely': 0.293, 'super': 0.293,
+    'especially': 0.293, 'truly': 0.293, 'deeply': 0.293, 'too': 0.293, 'most': 0.293,
+    'kinda': -0.293, 'slightly': -0.293, 'somewhat': -0.293,
+    'barely': -0.293, 'little': -0.293, 'bit': -0.293, 'almost': -0.293,
+    'hardly': -0.293, 'sort': -0.293, 'sorta': -0.293, 'marginally': -0.293,
+}
+
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'nothing', 'nobody', 'none', 'neither', 'nor', 'nowhere',
+    'cannot', 'cant', 'dont', 'doesnt', 'didnt', 'isnt', 'arent', 'wasnt', 'werent',
+    'wont', 'wouldnt', 'shouldnt', 'couldnt', 'havent', 'hasnt', 'hadnt', 'aint', 'without',
+])
+
+# Emotion categories reported in the ``emotions`` field
+EMOTIONS = {
+    'joy': ['happy', 'happier', 'happiness', 'joy', 'joyful', 'glad', 'fun', 'laugh',
+            'laughed', 'smile', 'smiled', 'cheerful', 'delighted', 'thrilled', 'excited',
+            'celebrate', 'amazing', 'awesome', 'great', 'wonderful', 'fantastic'],
+    'love': ['love', 'loved', 'loving', 'lovely', 'friend', 'friends', 'kind'],
+    'gratitude': ['grateful', 'thankful', 'gratitude', 'blessed'],
+    'calm': ['calm', 'calmer', 'peaceful', 'relaxed', 'relaxing', 'relieved', 'relief',
+             'rested', 'refreshed', 'content', 'comfortable', 'safe'],
+    'hope': ['hope', 'hopeful', 'optimistic', 'inspired', 'motivated', 'progress',
+             'improve', 'improved', 'healing', 'heal'],
+    'pride': ['proud', 'confident', 'accomplished', 'success', 'successful', 'win', 'won',
+              'productive', 'strong'],
+    'sadness': ['sad', 'sadness', 'unhappy', 'depressed', 'depression', 'down', 'low',
+                'cry', 'cried', 'crying', 'tears', 'miserable', 'broken', 'grief',
+                'grieving', 'loss', 'miss', 'missed', 'empty', 'numb', 'hopeless'],
+    'loneliness': ['lonely', 'alone', 'rejected', 'ignored'],
+    'anger': ['angry', 'anger', 'mad', 'furious', 'annoyed', 'irritated', 'frustrated',
+              'frustrating', 'hate', 'hated', 'unfair', 'jealous'],
+    'fear': ['anxious', 'anxiety', 'worried', 'worry', 'nervous', 'scared', 'afraid',
+             'fear', 'panic', 'dread', 'terrified', 'insecure'],
+    'stress': ['stressed', 'stress', 'stressful', 'overwhelmed', 'exhausted', 'tired',
+               'drained', 'struggle', 'struggling', 'difficult', 'burden', 'restless',
+               'insomnia'],
+    'guilt': ['guilty', 'guilt', 'ashamed', 'shame', 'regret', 'sorry', 'worthless',
+              'useless', 'failed', 'failure', 'fail'],
+}
+
+# VADER constants
+NEGATION_SCALAR = -0.74
+CAPS_INCREMENT = 0.733
+EXCLAMATION_INCREMENT = 0.292
+NORMALIZATION_ALPHA = 15
+NEGATION_WINDOW = 3
+
+_ASCII_TABLE = str.maketrans({
+    **{char: ' ' for char in string.punctuation},
+    "'": None,
+    '’': None
+})
+_NON_WORD_RE = re.compile(r'[\W_]+')
+_ELONGATED_RE = re.compile(r'(\w)\1{2,}')
+_REPEAT_RE = re.compile(r'(\w)\1+')
+
+# Precompiled vocabulary: word -> index into the valence/emotion tables.
+# Elongated spellings ("sooo", "happyyyy") resolve through the squeezed map.
+VOCABULARY = {word: index for index, word in enumerate(LEXICON)}
+VOCABULARY_WORDS = list(VOCABULARY)
+VALENCES = [LEXICON[word] for word in VOCABULARY_WORDS]
+_SQUEEZED_VOCABULARY = {_REPEAT_RE.sub(r'\1', word): index for word, index in VOCABULARY.items()}
+_EMOTIONS_BY_WORD = {}
+for _emotion, _words in EMOTIONS.items():
+    for _word in _words:
+        _EMOTIONS_BY_WORD.setdefault(_word, []).append(_emotion)
+
+
+def tokenize(text):
+    """Split text into words, keeping the original case for emphasis detection"""
+    if text.isascii():
+        return text.translate(_ASCII_TABLE).split()
+    return _NON_WORD_RE.sub(' ', text.replace("'", '').replace('’', '')).split()
+
+
+def _lookup_elongated(word):
+    # Only words with a letter repeated 3+ times, so "god" never reads as "good"
+    if _ELONGATED_RE.search(word):
+        return _SQUEEZED_VOCABULARY.get(_REPEAT_RE.sub(r'\1', word))
+    return None
+
+
+def _token_scores(text):
+    """Return (valences, emotion counts) for the sentiment-bearing words of a text"""
+    tokens = tokenize(text)
+    lowered = [token.casefold() for token in tokens]
+    indices = list(map(VOCABULARY.get, lowered))
+
+    # Emphasis from ALL CAPS only counts when the text is not shouted throughout
+    has_mixed_case = any(not token.isupper() for token in tokens)
+    but_position = None
+    for position, word in enumerate(lowered):
+        if word in ('but', 'however'):
+            but_position = position
+
+    valences = []
+    emotions = {}
+    for position, index in enumerate(indices):
+        word = lowered[position]
+        if index is None:
+            index = _lookup_elongated(word)
+            if index is None:
+                continue
+        valence = VALENCES[index]
+
+        if has_mixed_case and tokens[position].isupper() and len(word) > 1:
+            valence += CAPS_INCREMENT if valence > 0 else -CAPS_INCREMENT
+
+        negated = False
+        for distance in range(1, NEGATION_WINDOW + 1):
+            if position < distance:
+                break
+            previous = lowered[position - distance]
+            boost = BOOSTERS.get(previous) or BOOSTERS.get(_REPEAT_RE.sub(r'\1', previous))
+            if boost is not None:
+                # Boosters fade with distance, as in VADER
+                boost *= (1.0, 0.95, 0.9)[distance - 1]
+                valence += boost if valence > 0 else -boost
+            if previous in NEGATIONS:
+                valence *= NEGATION_SCALAR
+                negated = True
+                break
+
+        # Clauses after "but" dominate the ones before it
+        if but_position is not None:
+            valence *= 1.5 if position > but_position else 0.5
+
+        valences.append(valence)
+        if negated:
+            continue
+        for emotion in _EMOTIONS_BY_WORD.get(VOCABULARY_WORDS[index], ()):
+            emotions[emotion] = emotions.get(emotion, 0) + 1
+
+    return valences, emotions, len(tokens)
+
+
+
+def _result_from_sums(total, positive, negative, hits, token_count, emotions, text):
+    exclamations = min(text.count('!'), 4)
+    if total:
+        total += exclamations * EXCLAMATION_INCREMENT * (1 if total > 0 else -1)
+    compound = total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+
+    magnitude = positive + abs(negative)
+    if magnitude and min(positive, abs(negative)) / magnitude >= 0.3 and magnitude >= 2:
+        sentiment = 'mixed'
+    elif compound >= 0.05:
+        sentiment = 'positive'
+    elif compound <= -0.05:
+        sentiment = 'negative'
+    else:
+        sentiment = 'neutral'
+
+    # Confidence grows with the number of scored words and how one-sided they are
+    coverage = min(1.0, hits / max(1.0, min(4.0, token_count / 4.0)))
+    polarity = min(1.0, abs(compound) / 0.5)
+    if sentiment == 'mixed':
+        polarity *= 0.5
+    confidence = round(coverage * (0.5 + 0.5 * polarity), 3)
+
+    top_emotions = sorted(emotions, key=lambda emotion: -emotions[emotion])[:3]
+    return {
+        'sentiment': sentiment,
+        'intensity': max(1, min(10, int(round(1 + 9 * abs(compound))))),
+        'emotions': top_emotions or ['neutral'],
+        'explanation': f'Lexicon score {compound:+.2f} from {hits} of {token_count} words',
+        'compound': round(compound, 4),
+        'confidence': confidence,
+        'source': 'lexicon'
+    }
+
+
+def score(text):
+    """Score a single text"""
+    valences, emotions, token_count = _token_scores(text or '')
+    positive = sum(valence for valence in valences if valence > 0)
+    negative = sum(valence for valence in valences if valence < 0)
+    return _result_from_sums(positive + negative, positive, negative, len(valences),
+                             token_count, emotions, text or '')
+
+
+def score_batch(texts):
+    """Score many texts, reducing per-text sums in one vectorized pass when NumPy is available"""
+    texts = [text or '' for text in texts]
+    if np is None:
+        return [score(text) for text in texts]
+    scored = [_token_scores(text) for text in texts]
+
+    counts = np.fromiter((len(valences) for valences, _, _ in scored), dtype=np.int64, count=len(scored))
+    flat = np.fromiter(
+        (valence for valences, _, _ in scored for valence in valences),
+        dtype=np.float64, count=int(counts.sum())
+    )
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(counts) else counts
+    nonempty = counts > 0
+
+    positive = np.zeros(len(scored))
+    negative = np.zeros(len(scored))
+    if flat.size:
+        starts = offsets[nonempty]
+        positive[nonempty] = np.add.reduceat(np.where(flat > 0, flat, 0.0), starts)
+        negative[nonempty] = np.add.reduceat(np.where(flat < 0, flat, 0.0), starts)
+
+    return [
+        _result_from_sums(float(positive[i] + negative[i]), float(positive[i]), float(negative[i]),
+                          int(counts[i]), scored[i][2], scored[i][1], texts[i])
+        for i in range(len(texts))
+    ]
@@ -1,12 +1,21 @@
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
 import os
 import random
 from datetime import datetime
 
+class SpotifyRateLimitError(Exception):
+    """Raised when Spotify rejects a request with 429 Too Many Requests"""
+    
+    def __init__(self, retry_after=None):
+        super().__init__(f"Spotify rate limit hit (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
 class SpotifyService:
     def __init__(self):
         """Initialize Spotify service with client credentials"""
+        # spotipy (and the redis client it imports) loads with the first SpotifyService
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+        
         self.client_id = os.getenv('SPOTIFY_CLIENT_ID')
         self.client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
         self.redirect_uri = os.getenv('SPOTIFY_REDIRECT_URI', 'http://127.0.0.1:5001/api/music/spotify/callback')
@@ -112,6 +121,8 @@ class SpotifyService:
     
     def generate_mood_playlist(self, mood, intensity=5, limit=20, access_token=None):
         """Generate a playlist based on mood and intensity using Search API (since Recommendations API is blocked)"""
+        import spotipy
+        
         if not self.spotify_available:
             return self._get_fallback_playlist(mood, intensity, limit)
             
@@ -439,6 +450,8 @@ class SpotifyService:
     
     def get_oauth_url(self, state=None):
         """Get Spotify OAuth authorization URL"""
+        from spotipy.oauth2 import SpotifyOAuth
+        
         if not self.client_id or not self.client_secret:
             print("Missing Spotify credentials for OAuth")
             return None
@@ -463,6 +476,8 @@ class SpotifyService:
     
     def handle_oauth_callback(self, code, state=None):
         """Handle OAuth callback and get access token"""
+        from spotipy.oauth2 import SpotifyOAuth
+        
         if not self.client_id or not self.client_secret:
             return None
             
@@ -483,70 +498,93 @@ class SpotifyService:
     
     def create_spotify_playlist(self, access_token, mood, intensity, tracks):
         """Create a playlist in the user's Spotify account"""
+        try:
+            result = self.export_playlist(access_token, mood, intensity, tracks)
+            result['success'] = True
+            return result
+            
+        except Exception as e:
+            print(f"Error creating Spotify playlist: {e}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def export_playlist(self, access_token, mood, intensity, tracks, state=None, on_progress=None):
+        """Create a playlist in the user's Spotify account, resuming from previously saved state.
+        
+        ``state`` carries the Spotify user id, the created playlist and the number of
+        batches already added, so a retried export never creates a duplicate playlist.
+        ``on_progress(step, percent, **state_updates)`` is called after each upstream call.
+        Raises SpotifyRateLimitError when Spotify answers 429.
+        """
+        import spotipy
+        from spotipy.exceptions import SpotifyException
+        
+        state = dict(state or {})
+        
+        def progress(step, percent, **updates):
+            state.update(updates)
+            if on_progress:
+                on_progress(step, percent, **updates)
+        
         try:
             # Create authenticated Spotify client
             sp_user = spotipy.Spotify(auth=access_token)
             
             # Get user's Spotify ID
-            user_info = sp_user.me()
-            user_id = user_info['id']
-            
-            # Create playlist name with timestamp
-            date_str = datetime.now().strftime("%Y-%m-%d")
-            playlist_name = f"My {mood.title()} Mood Playlist - {date_str}"
-            playlist_description = f"Generated based on {mood} mood with intensity {intensity}/10 from Mindful Harmony"
-            
-            # Create the playlist
-            playlist = sp_user.user_playlist_create(
-                user=user_id,
-                name=playlist_name,
-                public=False,  # Private by default
-                description=playlist_description
-            )
-            
-            # Add tracks to playlist if we have any
-            print(f"Debug - Total tracks received: {len(tracks) if tracks else 0}")
-            if tracks:
-                track_uris = []
-                for i, track in enumerate(tracks):
-                    print(f"Debug - Track {i}: ID={track.get('id')}, Name={track.get('name')}")
-                    if track.get('id') and not track['id'].startswith('fallback_'):
-                        track_uri = f"spotify:track:{track['id']}"
-                        track_uris.append(track_uri)
-                        print(f"Debug - Added URI: {track_uri}")
-                    else:
-                        print(f"Debug - Skipped track: {track.get('id')} (fallback or no ID)")
+            if not state.get('spotify_user_id'):
+                user_info = sp_user.me()
+                progress('fetched_user', 20, spotify_user_id=user_info['id'])
+            
+            # Create the playlist (only once, even across retries)
+            if not state.get('playlist'):
+                date_str = datetime.now().strftime("%Y-%m-%d")
+                playlist_name = f"My {mood.title()} Mood Playlist - {date_str}"
+                playlist_description = f"Generated based on {mood} mood with intensity {intensity}/10 from Mindful Harmony"
                 
-                print(f"Debug - Final track URIs count: {len(track_uris)}")
-                if track_uris:
-                    # Add tracks in batches of 100 (Spotify limit)
-                    for i in range(0, len(track_uris), 100):
-                        batch = track_uris[i:i+100]
-                        print(f"Debug - Adding batch of {len(batch)} tracks")
-                        result = sp_user.playlist_add_items(playlist['id'], batch)
-                        print(f"Debug - Batch add result: {result}")
-                else:
-                    print("Debug - No valid track URIs to add")
-            else:
-                print("Debug - No tracks provided to add")
+                playlist = sp_user.user_playlist_create(
+                    user=state['spotify_user_id'],
+                    name=playlist_name,
+                    public=False,  # Private by default
+                    description=playlist_description
+                )
+                progress('created_playlist', 40, playlist={
+                    'id': playlist['id'],
+                    'url': playlist['external_urls']['spotify'],
+                    'name': playlist_name
+                })
+            
+            # Skip fallback tracks, which have no Spotify ID
+            track_uris = [
+                f"spotify:track:{track['id']}"
+                for track in (tracks or [])
+                if track.get('id') and not track['id'].startswith('fallback_')
+            ]
             
-            return {
-                'success': True,
-                'playlist_id': playlist['id'],
-                'playlist_url': playlist['external_urls']['spotify'],
-                'playlist_name': playlist_name,
-                'tracks_added': len(track_uris) if tracks else 0
-            }
+            # Add tracks in batches of 100 (Spotify limit)
+            batches = [track_uris[i:i+100] for i in range(0, len(track_uris), 100)]
+            for index in range(state.get('batches_added', 0), len(batches)):
+                sp_user.playlist_add_items(state['playlist']['id'], batches[index])
+                progress('adding_tracks', 40 + 60 * (index + 1) // len(batches), batches_added=index + 1)
             
-        except Exception as e:
-            print(f"Error creating Spotify playlist: {e}")
             return {
-                'success': False,
-                'error': str(e)
+                'playlist_id': state['playlist']['id'],
+                'playlist_url': state['playlist']['url'],
+                'playlist_name': state['playlist']['name'],
+                'tracks_added': len(track_uris)
             }
+            
+        except SpotifyException as e:
+            if e.http_status == 429:
+                retry_after = (e.headers or {}).get('Retry-After')
+                raise SpotifyRateLimitError(int(retry_after) if retry_after else None) from e
+            raise
     
     def refresh_token(self, refresh_token):
         """Refresh an expired access token"""
+        from spotipy.oauth2 import SpotifyOAuth
+        
         try:
             oauth = SpotifyOAuth(
                 client_id=self.client_id,
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models.database import get_db
+from services.ai_service import request_activity_suggestions, get_fallback_activities
+
+# Wait this long before retrying a key whose regeneration failed
+REFRESH_RETRY_SECONDS = 60
+
+# Moods the app offers; anything else shares one key, so a caller cannot mint
+# new cache documents (and model calls) by varying the mood string
+KNOWN_MOODS = frozenset([
+    'happy', 'sad', 'anxious', 'calm', 'energetic', 'romantic', 'angry', 'excited',
+    'stressed', 'frustrated', 'grateful', 'neutral', 'worried', 'tired', 'lonely'
+])
+OTHER_MOOD = 'other'
+# The mood the model is asked about for OTHER_MOOD
+OTHER_MOOD_PROMPT = 'mixed or unspecified'
+
+
+class SuggestionCache:
+    """Two-level cache of AI activity suggestions keyed by (mood, intensity).
+
+    The prompt only depends on the mood string and a 1-10 intensity, so each key
+    stores several generated variants in Mongo and requests rotate through them.
+    A short-lived in-process layer sits in front of Mongo. Stale or missing keys
+    are regenerated on a background thread; the request itself never waits on the
+    model and serves the fallback activities until the first variants land.
+    """
+
+    def __init__(self, collection_name='activity_suggestion_cache', variants=None,
+                 max_age_seconds=None, local_ttl_seconds=None, workers=None):
+        self.collection_name = collection_name
+        self.variants = variants or int(os.getenv('SUGGESTION_CACHE_VARIANTS', 3))
+        self.max_age = timedelta(seconds=max_age_seconds or int(os.getenv('SUGGESTION_CACHE_MAX_AGE_SECONDS', 86400)))
+        self.local_ttl = local_ttl_seconds or int(os.getenv('SUGGESTION_CACHE_LOCAL_TTL_SECONDS', 300))
+        self.workers = workers or int(os.getenv('SUGGESTION_CACHE_WORKERS', 1))
+        # Upper bound on in-process entries per map; keys are already bounded by KNOWN_MOODS
+        self.max_keys = int(os.getenv('SUGGESTION_CACHE_MAX_KEYS', 256))
+
+        self._local = {}
+        self._cursors = {}
+        self._refreshing = set()
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+
+    @staticmethod
+    def make_key(mood, intensity):
+        """Normalize a (mood, intensity) pair into a cache key"""
+        mood = (mood or '').strip().lower()
+        if mood not in KNOWN_MOODS:
+            mood = OTHER_MOOD
+        try:
+            intensity = int(intensity)
+        except (TypeError, ValueError):
+            intensity = 5
+        intensity = max(1, min(10, intensity))
+        return mood, intensity, f"{mood}:{intensity}"
+
+    def _collection(self):
+        db = get_db()
+        if db is None:
+            return None
+        return db[self.collection_name]
+
+    def get(self, mood, intensity):
+        """Return one cached variant for the key, rotating between calls"""
+        mood, intensity, key = self.make_key(mood, intensity)
+        entry = self._get_entry(key)
+
+        if entry is None or datetime.utcnow() - entry['refreshed_at'] > self.max_age:
+            self._schedule_refresh(mood, intensity, key)
+
+        if entry is None or not entry['variants']:
+            return get_fallback_activities(mood)
+
+        with self._lock:
+            cursor = self._cursors.get(key, 0)
+            self._bounded_set(self._cursors, key, cursor + 1)
+        variants = entry['variants']
+        return variants[cursor % len(variants)]
+
+    def _get_entry(self, key):
+        with self._lock:
+            local = self._local.get(key)
+        if local is not None and local[1] > time.monotonic():
+            return local[0]
+
+        entry = None
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = collection.find_one({'_id': key}, {'variants': 1, 'refreshed_at': 1})
+                if doc:
+                    entry = {'variants': doc.get('variants', []), 'refreshed_at': doc['refreshed_at']}
+            except Exception as e:
+                print(f"⚠️  Suggestion cache read failed: {e}")
+        elif local is not None:
+            # Demo mode: the in-process layer is the only store
+            entry = local[0]
+
+        if entry is not None:
+            self._store_local(key, entry)
+        return entry
+
+    def _store_local(self, key, entry):
+        with self._lock:
+            self._bounded_set(self._local, key, (entry, time.monotonic() + self.local_ttl))
+
+    def _bounded_set(self, mapping, key, value):
+        # Called with the lock held; evicts the oldest insertion once the map is full
+        if key not in mapping and len(mapping) >= self.max_keys:
+            mapping.pop(next(iter(mapping)))
+        mapping[key] = value
+
+    def _get_executor(self):
+        # Executor threads do not survive a fork, so build one per process
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='suggestion-refresh'
+            )
+            self._executor_pid = os.getpid()
+            self._refreshing = set()
+        return self._executor
+
+    def _schedule_refresh(self, mood, intensity, key):
+        with self._lock:
+            executor = self._get_executor()
+            if key in self._refreshing or self._retry_at.get(key, 0) > time.monotonic():
+                return
+            self._refreshing.add(key)
+        executor.submit(self._refresh, mood, intensity, key)
+
+    def _refresh(self, mood, intensity, key):
+        try:
+            variants = []
+            for _ in range(self.variants):
+                try:
+                    # Bypass the gateway's prompt cache so each variant is distinct
+                    prompt_mood = OTHER_MOOD_PROMPT if mood == OTHER_MOOD else mood
+                    variants.append(request_activity_suggestions(prompt_mood, intensity, use_cache=False))
+                except Exception as e:
+                    print(f"⚠️  Activity suggestion generation failed for '{key}': {e}")
+                    break
+
+            # Keep serving the old variants if the model is unavailable
+            if not variants:
+                with self._lock:
+                    self._bounded_set(self._retry_at, key, time.monotonic() + REFRESH_RETRY_SECONDS)
+                return
+
+            entry = {'variants': variants, 'refreshed_at': datetime.utcnow()}
+            collection = self._collection()
+            if collection is not None:
+                collection.update_one(
+                    {'_id': key},
+                    {'$set': {
+                        'mood': mood,
+                        'intensity': intensity,
+                        'variants': variants,
+                        'refreshed_at': entry['refreshed_at']
+                    }},
+                    upsert=True
+                )
+            self._store_local(key, entry)
+        except Exception as e:
+            print(f"⚠️  Suggestion cache refresh failed for '{key}': {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+# Shared cache used by the activities blueprint
+suggestion_cache = SuggestionCache()
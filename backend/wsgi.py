@@ -1,6 +1,21 @@
 """
 WSGI entry point for production deployment
 """
+import os
+
+if os.getenv('SERVER_MODE') == 'gevent':
+    # Patch before pymongo, requests and threading are imported. The gunicorn
+    # gevent worker has usually patched already, which makes this a no-op.
+    from gevent import monkey
+    monkey.patch_all()
+
+    # The Gemini client talks gRPC, which needs its own gevent integration
+    try:
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except ImportError:
+        pass
+
 from app import app
 
 if __name__ == "__main__":
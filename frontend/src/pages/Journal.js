@@ -77,7 +77,16 @@ const Journal = () => {
 
     setAiLoading(true);
     try {
-      const response = await journalAPI.getAIResponse(currentEntry, selectedMood);
+      // Show the response as it streams in; fall back to the one-shot endpoint
+      let response;
+      try {
+        setAiResponse('');
+        response = await journalAPI.streamAIResponse(currentEntry, selectedMood, (text) => {
+          setAiResponse(prev => prev + text);
+        });
+      } catch (streamError) {
+        response = await journalAPI.getAIResponse(currentEntry, selectedMood);
+      }
       // Handle different response formats
       let responseText = '';
       if (typeof response === 'string') {
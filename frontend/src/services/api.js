@@ -101,6 +101,53 @@ export const journalAPI = {
   getAIResponse: (content, mood = '') => 
     api.post('/journal/ai-response', { content, mood }).then(res => res.data),
   
+  // Streams the response as server-sent events; onChunk receives each piece of text
+  streamAIResponse: async (content, mood = '', onChunk = () => {}) => {
+    const token = localStorage.getItem('token');
+    const res = await fetch(`${API_BASE_URL}/journal/ai-response/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ content, mood }),
+    });
+    if (!res.ok || !res.body) {
+      throw new Error(`AI response stream failed with status ${res.status}`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const message = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const event = (message.match(/^event: (.*)$/m) || [])[1];
+        const data = (message.match(/^data: (.*)$/m) || [])[1];
+        if (!event || !data) continue;
+        const payload = JSON.parse(data);
+        if (event === 'chunk') {
+          onChunk(payload.text);
+        } else if (event === 'ai_response') {
+          result = payload;
+        }
+      }
+    }
+    if (!result) {
+      throw new Error('AI response stream ended early');
+    }
+    return result;
+  },
+  
   getStats: () => 
     api.get('/journal/stats').then(res => res.data),
 };
@@ -180,13 +227,53 @@ export const socialAPI = {
     api.get('/social/mood-heatmap').then(res => res.data),
 };
 
+// Spotify playlist export job polling
+const PLAYLIST_JOB_POLL_MS = 1500;
+const PLAYLIST_JOB_TIMEOUT_MS = 3 * 60 * 1000;
+const PLAYLIST_JOB_MAX_FAILED_POLLS = 5;
+
 // Music API
 export const musicAPI = {
   generatePlaylist: (moodData) => 
     api.post('/music/generate', moodData).then(res => res.data),
   
-  createSpotifyPlaylist: (moodData) => 
-    api.post('/music/create-spotify-playlist', moodData).then(res => res.data),
+  createSpotifyPlaylist: async (moodData) => {
+    const res = await api.post('/music/create-spotify-playlist', moodData);
+    if (res.status !== 202) {
+      return res.data;
+    }
+
+    // Playlist export runs as a background job - poll until it finishes or we give up
+    const jobId = res.data.job_id;
+    const deadline = Date.now() + PLAYLIST_JOB_TIMEOUT_MS;
+    let failedPolls = 0;
+    for (;;) {
+      if (Date.now() > deadline) {
+        throw new Error('Creating the Spotify playlist is taking too long. Please check Spotify or try again later.');
+      }
+      await new Promise(resolve => setTimeout(resolve, PLAYLIST_JOB_POLL_MS));
+      let job;
+      try {
+        ({ job } = await musicAPI.getJobStatus(jobId));
+        failedPolls = 0;
+      } catch (error) {
+        failedPolls += 1;
+        if (failedPolls >= PLAYLIST_JOB_MAX_FAILED_POLLS) {
+          throw error;
+        }
+        continue;
+      }
+      if (job.status === 'succeeded') {
+        return { message: 'Spotify playlist created successfully!', ...job.result };
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to create Spotify playlist');
+      }
+    }
+  },
+  
+  getJobStatus: (jobId) => 
+    api.get(`/music/jobs/${jobId}`).then(res => res.data),
   
   getSpotifyAuth: () => 
     api.get('/music/spotify/auth').then(res => res.data),